@@ -0,0 +1,75 @@
+"""
+Async CRUD
+Awaitable counterparts of app.crud for async routes.
+
+Each function runs the synchronous implementation from app.crud through
+AsyncSession.run_sync: the query logic stays in one place, while the I/O
+goes through the async driver (asyncpg/aiosqlite) without blocking the
+event loop.
+"""
+from typing import Any, List, Optional, Sequence
+from sqlmodel.ext.asyncio.session import AsyncSession
+from . import crud, pagination, schemas
+
+# ----------------- Mood -----------------------------
+async def create_mood(user_id: int, session: AsyncSession, mood: schemas.MoodCreate):
+    return await session.run_sync(lambda s: crud.create_mood(user_id, s, mood))
+
+async def create_moods_bulk(session: AsyncSession, user_id: int, moods: List[schemas.MoodBatchItem]) -> List[int]:
+    return await session.run_sync(lambda s: crud.create_moods_bulk(s, user_id, moods))
+
+async def get_all_moods_by_user(session: AsyncSession, user_id: int, filters: Optional[schemas.MoodFilters] = None):
+    return await session.run_sync(lambda s: crud.get_all_moods_by_user(s, user_id, filters))
+
+async def get_moods_page(session: AsyncSession, user_id: int, page: pagination.PageParams, filters: Optional[schemas.MoodFilters] = None, columns: Optional[Sequence[Any]] = None, include_journals: bool = False) -> pagination.Page:
+    return await session.run_sync(lambda s: crud.get_moods_page(s, user_id, page, filters, columns, include_journals))
+
+async def get_moods_change_token(session: AsyncSession, user_id: int, include_journals: bool = False) -> tuple:
+    return await session.run_sync(lambda s: crud.get_moods_change_token(s, user_id, include_journals))
+
+async def get_mood(session: AsyncSession, user_id: int, id: int):
+    return await session.run_sync(lambda s: crud.get_mood(s, user_id, id))
+
+async def update_mood(session: AsyncSession, user_id: int, id: int, mood_update: schemas.MoodCreate):
+    return await session.run_sync(lambda s: crud.update_mood(s, user_id, id, mood_update))
+
+async def delete_mood(session: AsyncSession, user_id: int, id: int):
+    return await session.run_sync(lambda s: crud.delete_mood(s, user_id, id))
+
+# ----------------------- Journal -----------------------------
+async def create_journal(user_id: int, mood_id: int, session: AsyncSession, journal: schemas.JournalCreate):
+    return await session.run_sync(lambda s: crud.create_journal(user_id, mood_id, s, journal))
+
+async def import_journal_chunk(session: AsyncSession, user_id: int, entries: List[schemas.JournalImportRow]) -> int:
+    return await session.run_sync(lambda s: crud.import_journal_chunk(s, user_id, entries))
+
+async def get_all_journals_by_mood(session: AsyncSession, user_id: int, mood_id: int):
+    return await session.run_sync(lambda s: crud.get_all_journals_by_mood(s, user_id, mood_id))
+
+async def get_journals_page(session: AsyncSession, user_id: int, mood_id: int, page: pagination.PageParams, columns: Optional[Sequence[Any]] = None) -> pagination.Page:
+    return await session.run_sync(lambda s: crud.get_journals_page(s, user_id, mood_id, page, columns))
+
+async def get_journals_change_token(session: AsyncSession, user_id: int, mood_id: int) -> tuple:
+    return await session.run_sync(lambda s: crud.get_journals_change_token(s, user_id, mood_id))
+
+async def get_journal(session: AsyncSession, user_id: int, mood_id: int, id: int):
+    return await session.run_sync(lambda s: crud.get_journal(s, user_id, mood_id, id))
+
+async def update_journal(session: AsyncSession, user_id: int, mood_id: int, id: int, journal_update: schemas.JournalCreate):
+    return await session.run_sync(lambda s: crud.update_journal(s, user_id, mood_id, id, journal_update))
+
+async def delete_journal(session: AsyncSession, user_id: int, mood_id: int, id: int):
+    return await session.run_sync(lambda s: crud.delete_journal(s, user_id, mood_id, id))
+
+# ----------------------- Game Sessions -----------------------------
+async def create_game_session(user_id: int, session: AsyncSession, game_session: schemas.GameSessionCreate):
+    return await session.run_sync(lambda s: crud.create_game_session(user_id, s, game_session))
+
+async def get_all_game_sessions_by_user(session: AsyncSession, user_id: int, filters: Optional[schemas.GameSessionFilters] = None):
+    return await session.run_sync(lambda s: crud.get_all_game_sessions_by_user(s, user_id, filters))
+
+async def get_game_sessions_page(session: AsyncSession, user_id: int, page: pagination.PageParams, filters: Optional[schemas.GameSessionFilters] = None, columns: Optional[Sequence[Any]] = None) -> pagination.Page:
+    return await session.run_sync(lambda s: crud.get_game_sessions_page(s, user_id, page, filters, columns))
+
+async def get_game_session(session: AsyncSession, user_id: int, game_id: int):
+    return await session.run_sync(lambda s: crud.get_game_session(s, user_id, game_id))
@@ -1,27 +1,48 @@
 import os
+import hmac
+import hashlib
+import secrets
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from passlib.context import CryptContext
 from jose import JWTError, jwt
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from sqlalchemy import delete, or_, update
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app import models, schemas, database
+from app.cache import TTLCache
+from app.services import password_service
 from typing import Optional
 
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
 SECRET_KEY = os.environ.get("SECRET_KEY", "changeme")
 ALGORITHM = os.environ.get("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get("REFRESH_TOKEN_EXPIRE_DAYS", 30))
+TOKEN_VERSION_CACHE_MAX_SIZE = int(os.environ.get("TOKEN_VERSION_CACHE_MAX_SIZE", 10000))
+TOKEN_VERSION_CACHE_TTL_SECONDS = int(os.environ.get("TOKEN_VERSION_CACHE_TTL_SECONDS", 60))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# user_id -> (token_version, email); tokens whose claims don't match are revoked.
+# The TTL bounds how long another worker can keep accepting a revoked token.
+token_versions = TTLCache(max_size=TOKEN_VERSION_CACHE_MAX_SIZE, ttl_seconds=TOKEN_VERSION_CACHE_TTL_SECONDS)
+TOKEN_REVOKED = (-1, None)
+
+@dataclass(frozen=True)
+class Principal:
+	"""Authenticated caller, built from token claims without loading the User row."""
+	id: int
+	email: str
+	token_version: int = 0
+
 def get_password_hash(password: str) -> str:
-	return pwd_context.hash(password)
+	return password_service.hash_password(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-	return pwd_context.verify(plain_password, hashed_password)
+	return password_service.verify_password(plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 	to_encode = data.copy()
@@ -30,12 +51,108 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 	encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 	return encoded_jwt
 
+def create_user_access_token(user: models.User, expires_delta: Optional[timedelta] = None):
+	"""Token carrying the user id and token version, so requests can be authorized from claims alone."""
+	return create_access_token(
+		data={"sub": user.email, "uid": user.id, "ver": user.token_version},
+		expires_delta=expires_delta,
+	)
+
+def _hash_refresh_secret(secret: str) -> str:
+	return hmac.new(SECRET_KEY.encode(), secret.encode(), hashlib.sha256).hexdigest()
+
+def create_refresh_token(db: Session, user_id: int, token_version: int) -> str:
+	"""
+	Issue an opaque refresh token of the form "<row id>.<secret>".
+	Only an HMAC of the secret is stored, so checking it costs microseconds rather than a bcrypt round.
+	The user's expired rows and rows of older token versions are deleted in the same commit. Revoked rows stay
+	until they expire, since rotate_refresh_token needs them to detect reuse.
+	"""
+	now = datetime.utcnow()
+	db.exec(
+		delete(models.RefreshToken).where(
+			models.RefreshToken.user_id == user_id,
+			or_(models.RefreshToken.expires_at <= now, models.RefreshToken.token_version != token_version),
+		)
+	)
+	secret = secrets.token_urlsafe(32)
+	row = models.RefreshToken(
+		user_id=user_id,
+		token_hash=_hash_refresh_secret(secret),
+		token_version=token_version,
+		expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+	)
+	db.add(row)
+	db.flush()
+	token_id = row.id  # read before commit expires the row
+	db.commit()
+	return f"{token_id}.{secret}"
+
+def rotate_refresh_token(db: Session, refresh_token: str) -> Optional[tuple]:
+	"""
+	Exchange a refresh token for a new (access_token, refresh_token) pair.
+	The presented token is revoked; presenting an already revoked token revokes the user's whole token family.
+	Returns None if the token is invalid, expired or revoked.
+	"""
+	token_id, _, secret = refresh_token.partition(".")
+	# ASCII digits only and at most 18 of them, so int() can't fail and the id fits a 64-bit key column
+	if not (token_id.isascii() and token_id.isdigit() and len(token_id) <= 18) or not secret:
+		return None
+	row = db.get(models.RefreshToken, int(token_id))
+	if row is None or not hmac.compare_digest(row.token_hash, _hash_refresh_secret(secret)):
+		return None
+	if row.revoked:
+		# Reuse of a rotated token means it leaked; cut off every session of this user
+		db.exec(update(models.RefreshToken).where(models.RefreshToken.user_id == row.user_id).values(revoked=True))
+		db.commit()
+		return None
+	if row.expires_at <= datetime.utcnow():
+		return None
+	token_version, email = get_token_version(db, row.user_id)
+	if token_version != row.token_version:
+		return None
+	# Conditional revoke so two concurrent refreshes of the same token can't both succeed
+	claimed = db.exec(
+		update(models.RefreshToken)
+		.where(models.RefreshToken.id == row.id, models.RefreshToken.revoked == False)  # noqa: E712
+		.values(revoked=True)
+	)
+	if claimed.rowcount != 1:
+		db.rollback()
+		return None
+	new_refresh_token = create_refresh_token(db, row.user_id, token_version)
+	access_token = create_access_token(data={"sub": email, "uid": row.user_id, "ver": token_version})
+	return access_token, new_refresh_token
+
 def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
 	statement = select(models.User).where(models.User.email == email)
 	return db.exec(statement).first()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_session)) -> models.User:
-	"""Verify JWT token and return current user."""
+def set_token_version(user_id: int, token_version: int, email: str) -> None:
+	"""Record a user's current token version, e.g. after registration or a password change."""
+	token_versions.set(user_id, (token_version, email))
+
+def revoke_user_tokens(user_id: int) -> None:
+	"""Reject every outstanding token of a deleted user."""
+	token_versions.set(user_id, TOKEN_REVOKED)
+
+def get_token_version(db: Session, user_id: int):
+	"""Return (token_version, email) for a user, reading the database only on a cache miss."""
+	current = token_versions.get(user_id)
+	if current is None:
+		row = db.exec(
+			select(models.User.token_version, models.User.email, models.User.is_active).where(models.User.id == user_id)
+		).first()
+		current = (row[0], row[1]) if row and row[2] else TOKEN_REVOKED
+		token_versions.set(user_id, current)
+	return current
+
+def get_token_version_cache_stats() -> dict:
+	"""Hit/miss counters of the token version map."""
+	return token_versions.stats()
+
+def _authenticate(db: Session, token: str) -> Principal:
+	"""Verify a JWT and return its principal; the session is only queried on token version cache misses."""
 	credentials_exception = HTTPException(
 		status_code=status.HTTP_401_UNAUTHORIZED,
 		detail="Could not validate credentials",
@@ -48,8 +165,25 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
 			raise credentials_exception
 	except JWTError:
 		raise credentials_exception
-	
-	user = get_user_by_email(db, email)
-	if user is None:
+
+	user_id = payload.get("uid")
+	if user_id is None:
+		raise credentials_exception
+	token_version, current_email = get_token_version(db, user_id)
+	if payload.get("ver") != token_version or email != current_email:
 		raise credentials_exception
-	return user
+	return Principal(id=user_id, email=email, token_version=token_version)
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_session)) -> Principal:
+	"""Verify JWT token and return the authenticated principal."""
+	return _authenticate(db, token)
+
+async def get_current_user_async(
+	token: str = Depends(oauth2_scheme),
+	session: AsyncSession = Depends(database.get_async_session),
+) -> Principal:
+	"""
+	get_current_user for async routes.
+	Shares the route's AsyncSession, so a request holds one async connection and no sync one.
+	"""
+	return await session.run_sync(_authenticate, token)
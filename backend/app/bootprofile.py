@@ -0,0 +1,126 @@
+"""
+Boot Profile
+Breaks a worker's cold start down into per-module import time and
+per-step init time.
+
+Modules are imported one at a time in dependency order, so each row shows
+the incremental cost of that module (including any third-party packages
+it pulls in first). Run it in a fresh interpreter:
+
+Usage (from backend/):
+    python -m app.bootprofile               # imports + startup (migrations, seeding)
+    python -m app.bootprofile --no-init     # imports only
+    python -m app.bootprofile --deferred    # also time lazily loaded dependencies
+"""
+import argparse
+import importlib
+import sys
+import time
+from typing import Callable, List, Tuple
+
+BOOT_MODULES = [
+    "fastapi",
+    "sqlalchemy",
+    "sqlmodel",
+    "jose",
+    "passlib.context",
+    "app.cache",
+    "app.pagination",
+    "app.conditional",
+    "app.fast_json",
+    "app.models",
+    "app.schemas",
+    "app.migrations",
+    "app.database",
+    "app.services.password_service",
+    "app.auth",
+    "app.crud",
+    "app.async_crud",
+    "app.resources_logic",
+    "app.services.mood_rollup",
+    "app.services.data_aggregator",
+    "app.services.ai_service",
+    "app.services.insights_generator",
+    "app.services.journal_import",
+    "app.services.data_export",
+    "app.services.user_purge",
+    "app.routes.auth",
+    "app.routes.users",
+    "app.routes.moods",
+    "app.routes.journals",
+    "app.routes.resources",
+    "app.routes.insights",
+    "app.routes.games",
+    "app.routes.internal",
+    "app.main",
+]
+
+# Imported on first use rather than at boot
+DEFERRED_MODULES = [
+    "google.generativeai",
+]
+
+
+def profile_imports(modules: List[str]) -> List[Tuple[str, float]]:
+    """Import each module in order and return (module, seconds) for the incremental cost."""
+    timings = []
+    for name in modules:
+        already_loaded = name in sys.modules
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            timings.append((f"{name} (not installed)", time.perf_counter() - start))
+            continue
+        elapsed = time.perf_counter() - start
+        timings.append((f"{name} (already loaded)" if already_loaded else name, elapsed))
+    return timings
+
+
+def profile_init() -> List[Tuple[str, float]]:
+    """Run the lifespan startup steps individually and time each one."""
+    from sqlmodel import Session
+    from app.database import engine, init_session
+    from app.resources_logic import seed_resources
+
+    def seed():
+        with Session(engine) as session:
+            seed_resources(session)
+
+    steps: List[Tuple[str, Callable[[], None]]] = [
+        ("migrations (init_session)", init_session),
+        ("seed resources", seed),
+    ]
+    timings = []
+    for name, step in steps:
+        start = time.perf_counter()
+        step()
+        timings.append((name, time.perf_counter() - start))
+    return timings
+
+
+def _print_section(title: str, timings: List[Tuple[str, float]]) -> None:
+    total = sum(seconds for _, seconds in timings)
+    print(f"\n{title}")
+    print(f"{'step':<48} {'ms':>9} {'share':>7}")
+    for name, seconds in timings:
+        share = seconds / total * 100 if total else 0.0
+        print(f"{name:<48} {seconds * 1000:>9.1f} {share:>6.1f}%")
+    print(f"{'total':<48} {total * 1000:>9.1f}")
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.bootprofile", description=__doc__.splitlines()[1])
+    parser.add_argument("--no-init", action="store_true", help="only profile imports")
+    parser.add_argument("--deferred", action="store_true", help="also time lazily imported dependencies")
+    args = parser.parse_args(argv)
+
+    _print_section("Imports", profile_imports(BOOT_MODULES))
+    if not args.no_init:
+        _print_section("Startup", profile_init())
+    if args.deferred:
+        _print_section("Deferred (first use)", profile_imports(DEFERRED_MODULES))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,44 @@
+"""
+Conditional Requests
+ETag / If-None-Match support for endpoints that clients poll.
+
+An ETag is a hash of a cheap change token for the data behind a response
+(e.g. a list's row count, max id and max updated_at, read from an index)
+plus anything else that shapes the body, such as the query string. When
+the client's If-None-Match still matches, the route answers 304 Not
+Modified before loading or serializing any rows.
+"""
+import hashlib
+from typing import Any
+from fastapi import Request, Response
+
+ETAG_HEADER = "ETag"
+IF_NONE_MATCH_HEADER = "If-None-Match"
+# Clients may keep the body but must revalidate it before reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag for the given change token parts."""
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match covers etag (weak comparison, as RFC 9110 requires)."""
+    header = request.headers.get(IF_NONE_MATCH_HEADER)
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers[ETAG_HEADER] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
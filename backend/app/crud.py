@@ -1,14 +1,80 @@
-from sqlmodel import Session, select
-from . import models, schemas
-from passlib.context import CryptContext
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Sequence
+from sqlalchemy import func, insert, literal, update
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select, delete
+from . import models, schemas, auth, pagination
+from .services import mood_rollup
+from .services.password_service import hash_password
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Keyset pagination orders (see app.pagination)
+USER_PAGE_KEY = (models.User.id,)
+MOOD_PAGE_KEY = (models.Mood.date, models.Mood.id)
+JOURNAL_PAGE_KEY = (models.Journal.date, models.Journal.id)
+GAME_SESSION_PAGE_KEY = (models.GameSession.date, models.GameSession.id)
+
+# Writes don't refresh after commit: the INSERT brings back the id (RETURNING or lastrowid),
+# dates default client-side and request sessions use expire_on_commit=False.
+
+def _update_returning(session: Session, model, where: list, values: dict, before_commit=None):
+    """
+    UPDATE the matching row and read it back in one statement where the backend supports RETURNING.
+    before_commit, if given, is called with the updated row inside the same transaction.
+    """
+    if session.get_bind().dialect.update_returning:
+        statement = update(model).where(*where).values(**values).returning(model)
+        row = session.exec(statement).scalars().first()
+    else:
+        row = session.exec(select(model).where(*where)).first()
+        if row is not None:
+            for name, value in values.items():
+                setattr(row, name, value)
+            session.add(row)
+    if row is None:
+        return None
+    if before_commit is not None:
+        before_commit(row)
+    session.commit()
+    return row
+
+def _delete_returning(session: Session, model, where: list):
+    """DELETE the matching row and return it, in one statement where the backend supports RETURNING."""
+    if session.get_bind().dialect.delete_returning:
+        row = session.exec(delete(model).where(*where).returning(model)).scalars().first()
+    else:
+        row = session.exec(select(model).where(*where)).first()
+        if row is not None:
+            session.delete(row)
+    if row is None:
+        return None
+    session.commit()
+    return row
+
+def _project(statement, columns: Optional[Sequence[Any]]):
+    # A column projection returns plain rows instead of hydrated ORM objects (see app.fast_json).
+    # Built as a new select: with_only_columns would keep sqlmodel's scalar-result select type.
+    if not columns:
+        return statement
+    projected = select(*columns).select_from(*statement.get_final_froms())
+    return projected if statement.whereclause is None else projected.where(statement.whereclause)
+
+def _change_token(session: Session, model, statement) -> tuple:
+    """
+    (row count, max id, max updated_at) of the rows a select of model matches: any create,
+    update or delete among them changes it, so it can stand in for the rows in an ETag.
+    """
+    statement = _project(statement, [func.count(), func.max(model.id), func.max(model.updated_at)])
+    count, max_id, max_updated_at = session.exec(statement).one()
+    return count, max_id, max_updated_at.isoformat() if max_updated_at else None
 
 # ------------------ User ------------------------------
 def get_users(session: Session):
     statement = select(models.User)
     return session.exec(statement).all()
 
+def get_users_page(session: Session, page: pagination.PageParams) -> pagination.Page:
+    return pagination.fetch_page(session, select(models.User), USER_PAGE_KEY, page)
+
 def get_user(session: Session, user_id: int):
     return session.get(models.User, user_id)
 
@@ -17,11 +83,10 @@ def get_user_by_username(session: Session, name: str):
     return session.exec(statement).first()
 
 def create_user(session: Session, user: schemas.UserCreate):
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = hash_password(user.password)
     db_user = models.User(name=user.name, email=user.email, password=hashed_password)
     session.add(db_user)
     session.commit()
-    session.refresh(db_user)
     return db_user
 
 def update_user(session: Session, user_id: int, user_update: schemas.UserCreate):
@@ -30,21 +95,68 @@ def update_user(session: Session, user_id: int, user_update: schemas.UserCreate)
         return None
     user.name = user_update.name
     user.email = user_update.email
-    user.password = pwd_context.hash(user_update.password)
+    user.password = hash_password(user_update.password)
+    user.token_version = (user.token_version or 0) + 1
     session.add(user)
     session.commit()
-    session.refresh(user)
+    auth.set_token_version(user.id, user.token_version, user.email)
     return user
 
+# Everything a user owns, children first: journals hang off the user's moods
+USER_OWNED_MODELS = (
+    models.Journal, models.Mood, models.DailyMoodRollup, models.GameSession, models.AIInsights, models.RefreshToken,
+)
+
+def _owned_by(model, user_id: int):
+    if model is models.Journal:
+        return models.Journal.mood_id.in_(select(models.Mood.id).where(models.Mood.user_id == user_id))
+    return model.user_id == user_id
+
 def delete_user(session: Session, user_id: int):
+    """Delete a user and their whole history with set-based DELETEs in one transaction."""
+    user = session.get(models.User, user_id)
+    if user is None:
+        return None
+    # Statement per table rather than session.delete(user), which would load the history to unlink it
+    for model in USER_OWNED_MODELS:
+        session.exec(delete(model).where(_owned_by(model, user_id)))
+    session.exec(delete(models.User).where(models.User.id == user_id))
+    session.commit()
+    auth.revoke_user_tokens(user_id)
+    return user
+
+def deactivate_user(session: Session, user_id: int):
+    """Lock a user out ahead of a background purge: no logins, refresh tokens or access tokens."""
     user = session.get(models.User, user_id)
     if user is None:
         return None
-    session.delete(user)
+    user.is_active = False
+    session.add(user)
+    session.exec(delete(models.RefreshToken).where(models.RefreshToken.user_id == user_id))
     session.commit()
+    auth.revoke_user_tokens(user_id)
     return user
 
+def purge_user(session: Session, user_id: int, batch_size: int) -> int:
+    """
+    Delete a user's history batch_size rows at a time, committing each batch so no transaction
+    holds locks for long, then the user row. Returns the number of rows deleted.
+    """
+    deleted = 0
+    for model in USER_OWNED_MODELS:
+        batch = select(model.id).where(_owned_by(model, user_id)).limit(batch_size)
+        while True:
+            count = session.exec(delete(model).where(model.id.in_(batch))).rowcount
+            session.commit()
+            deleted += count
+            if count < batch_size:
+                break
+    deleted += session.exec(delete(models.User).where(models.User.id == user_id)).rowcount
+    session.commit()
+    return deleted
+
 # ----------------- Mood -----------------------------
+# Every mood write also updates daily_mood_rollup before its commit (see app.services.mood_rollup)
 def create_mood(user_id: int, session: Session, mood: schemas.MoodCreate):
     session_mood = models.Mood(
         mood=mood.mood,
@@ -52,29 +164,100 @@ def create_mood(user_id: int, session: Session, mood: schemas.MoodCreate):
         user_id=user_id
     )
     session.add(session_mood)
+    session.flush()
+    mood_rollup.add_moods(session, [{"user_id": user_id, "date": session_mood.date, "mood": session_mood.mood}])
     session.commit()
-    session.refresh(session_mood)
     return session_mood
 
-def get_all_moods_by_user(session: Session, user_id: int):
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _insert_moods(session: Session, rows: List[dict]) -> List[int]:
+    """Insert mood rows with one multi-row INSERT, plus their rollup days (no commit); returns ids in input order."""
+    dialect = session.get_bind().dialect
+    if dialect.name == "sqlite":
+        # SQLite has no insert sentinel, so an ordered RETURNING would fall back to one row per
+        # statement; rowids within a single INSERT are assigned in VALUES order, so sort instead
+        statement = insert(models.Mood).returning(models.Mood.id)
+        ids = sorted(session.exec(statement, params=rows).scalars())
+    elif dialect.insert_executemany_returning_sort_by_parameter_order:
+        statement = insert(models.Mood).returning(models.Mood.id, sort_by_parameter_order=True)
+        ids = list(session.exec(statement, params=rows).scalars())
+    else:
+        db_moods = [models.Mood(**row) for row in rows]
+        session.add_all(db_moods)
+        session.flush()
+        ids = [mood.id for mood in db_moods]
+    # After the INSERT: without an upsert the rollup recomputes these days from the mood rows
+    mood_rollup.add_moods(session, rows)
+    return ids
+
+def create_moods_bulk(session: Session, user_id: int, moods: List[schemas.MoodBatchItem]) -> List[int]:
+    """Insert many moods with one multi-row INSERT and one commit; returns ids in input order."""
+    now = datetime.utcnow()
+    rows = [
+        {
+            "mood": mood.mood,
+            "commentary": mood.commentary,
+            "user_id": user_id,
+            "date": _naive_utc(mood.date) if mood.date else now,
+            "updated_at": now,
+        }
+        for mood in moods
+    ]
+    ids = _insert_moods(session, rows)
+    session.commit()
+    return ids
+
+def _date_range(statement, column, filters: schemas.DateRangeFilter):
+    if filters.since is not None:
+        statement = statement.where(column >= _naive_utc(filters.since))
+    if filters.until is not None:
+        statement = statement.where(column < _naive_utc(filters.until))
+    return statement
+
+def _moods_statement(user_id: int, filters: Optional[schemas.MoodFilters]):
+    # Dates narrow the (user_id, date) index range; mood values are checked on the rows in it
     statement = select(models.Mood).where(models.Mood.user_id == user_id)
-    return session.exec(statement).all()
+    if filters is None:
+        return statement
+    statement = _date_range(statement, models.Mood.date, filters)
+    if filters.min_mood is not None:
+        statement = statement.where(models.Mood.mood >= filters.min_mood)
+    if filters.max_mood is not None:
+        statement = statement.where(models.Mood.mood <= filters.max_mood)
+    return statement
+
+def get_all_moods_by_user(session: Session, user_id: int, filters: Optional[schemas.MoodFilters] = None):
+    return session.exec(_moods_statement(user_id, filters)).all()
+
+def get_moods_page(session: Session, user_id: int, page: pagination.PageParams, filters: Optional[schemas.MoodFilters] = None, columns: Optional[Sequence[Any]] = None, include_journals: bool = False) -> pagination.Page:
+    statement = _project(_moods_statement(user_id, filters), columns)
+    if include_journals:
+        # One extra SELECT ... WHERE mood_id IN (page ids) for the whole page, not one per mood
+        statement = statement.options(selectinload(models.Mood.journals))
+    return pagination.fetch_page(session, statement, MOOD_PAGE_KEY, page)
+
+def get_moods_change_token(session: Session, user_id: int, include_journals: bool = False) -> tuple:
+    # Read from the (user_id, updated_at) index alone
+    token = _change_token(session, models.Mood, select(models.Mood).where(models.Mood.user_id == user_id))
+    if include_journals:
+        token += _change_token(session, models.Journal, _owned_journals(user_id))
+    return token
 
 def get_mood(session: Session, user_id: int, id: int):
     statement = select(models.Mood).where(models.Mood.user_id == user_id, models.Mood.id == id)
     return session.exec(statement).first()
 
 def update_mood(session: Session, user_id: int, id: int, mood_update: schemas.MoodCreate):
-    statement = select(models.Mood).where(models.Mood.id == id, models.Mood.user_id == user_id)
-    mood = session.exec(statement).first()
-    if mood is None:
-        return None
-    mood.mood = mood_update.mood
-    mood.commentary = mood_update.commentary
-    session.add(mood)
-    session.commit()
-    session.refresh(mood)
-    return mood
+    return _update_returning(
+        session, models.Mood,
+        [models.Mood.id == id, models.Mood.user_id == user_id],
+        {"mood": mood_update.mood, "commentary": mood_update.commentary, "updated_at": datetime.utcnow()},
+        before_commit=lambda mood: mood_rollup.rebuild_days(session, user_id, [mood.date.date()]),
+    )
 
 def delete_mood(session: Session, user_id: int, id: int):
     statement = select(models.Mood).where(models.Mood.id == id, models.Mood.user_id == user_id)
@@ -82,49 +265,84 @@ def delete_mood(session: Session, user_id: int, id: int):
     if mood is None:
         return None
     session.delete(mood)
+    mood_rollup.rebuild_days(session, user_id, [mood.date.date()])
     session.commit()
     return mood
 
 # ----------------------- Journal -----------------------------
-def create_journal(mood_id: int, session: Session, journal: schemas.JournalCreate):
-    session_journal = models.Journal(
-        title=journal.title,
-        content=journal.content,
-        mood_id=mood_id
+# Journal routes are nested under a mood: every query checks the mood is the user's in the
+# same statement (a join for reads, a subquery for writes), so foreign moods read as missing.
+
+def _owned_journals(user_id: int, mood_id: Optional[int] = None):
+    statement = select(models.Journal).join(models.Mood, models.Journal.mood_id == models.Mood.id).where(models.Mood.user_id == user_id)
+    if mood_id is not None:
+        statement = statement.where(models.Mood.id == mood_id)
+    return statement
+
+def _owned_mood_id(user_id: int, mood_id: int):
+    return select(models.Mood.id).where(models.Mood.id == mood_id, models.Mood.user_id == user_id)
+
+def create_journal(user_id: int, mood_id: int, session: Session, journal: schemas.JournalCreate):
+    """Create a journal on one of the user's moods; None if the mood isn't theirs."""
+    now = datetime.utcnow()
+    if not session.get_bind().dialect.insert_returning:
+        if session.exec(_owned_mood_id(user_id, mood_id)).first() is None:
+            return None
+        session_journal = models.Journal(title=journal.title, content=journal.content, mood_id=mood_id, date=now, updated_at=now)
+        session.add(session_journal)
+        session.commit()
+        return session_journal
+    # INSERT ... SELECT: the row is only written if the mood is the user's
+    source = select(literal(journal.title), literal(journal.content), models.Mood.id, literal(now), literal(now)).where(
+        models.Mood.id == mood_id, models.Mood.user_id == user_id
     )
-    session.add(session_journal)
+    statement = insert(models.Journal).from_select(["title", "content", "mood_id", "date", "updated_at"], source)
+    session_journal = session.exec(statement.returning(models.Journal)).scalars().first()
+    if session_journal is None:
+        return None
     session.commit()
-    session.refresh(session_journal)
     return session_journal
 
-def get_all_journals_by_mood(session: Session, mood_id: int):
-    statement = select(models.Journal).where(models.Journal.mood_id == mood_id)
-    return session.exec(statement).all()
+def import_journal_chunk(session: Session, user_id: int, entries: List[schemas.JournalImportRow]) -> int:
+    """Create a mood and its journal for each imported entry, in one transaction."""
+    now = datetime.utcnow()
+    dates = [_naive_utc(entry.date) if entry.date else now for entry in entries]
+    mood_ids = _insert_moods(session, [
+        {"mood": entry.mood, "commentary": entry.commentary, "user_id": user_id, "date": date, "updated_at": now}
+        for entry, date in zip(entries, dates)
+    ])
+    session.exec(insert(models.Journal), params=[
+        {"title": entry.title, "content": entry.content, "mood_id": mood_id, "date": date, "updated_at": now}
+        for entry, mood_id, date in zip(entries, mood_ids, dates)
+    ])
+    session.commit()
+    return len(entries)
+
+def get_all_journals_by_mood(session: Session, user_id: int, mood_id: int):
+    return session.exec(_owned_journals(user_id, mood_id)).all()
+
+def get_journals_page(session: Session, user_id: int, mood_id: int, page: pagination.PageParams, columns: Optional[Sequence[Any]] = None) -> pagination.Page:
+    return pagination.fetch_page(session, _project(_owned_journals(user_id, mood_id), columns), JOURNAL_PAGE_KEY, page)
+
+def get_journals_change_token(session: Session, user_id: int, mood_id: int) -> tuple:
+    return _change_token(session, models.Journal, _owned_journals(user_id, mood_id))
 
-def get_journal(session: Session, mood_id: int, id: int):
-    statement = select(models.Journal).where(models.Journal.mood_id == mood_id, models.Journal.id == id)
+def get_journal(session: Session, user_id: int, mood_id: int, id: int):
+    statement = _owned_journals(user_id, mood_id).where(models.Journal.id == id)
     return session.exec(statement).first()
 
-def update_journal(session: Session, mood_id: int, id: int, journal_update: schemas.JournalCreate):
-    statement = select(models.Journal).where(models.Journal.id == id, models.Journal.mood_id == mood_id)
-    journal = session.exec(statement).first()
-    if journal is None:
-        return None
-    journal.title = journal_update.title
-    journal.content = journal_update.content
-    session.add(journal)
-    session.commit()
-    session.refresh(journal)
-    return journal
+def update_journal(session: Session, user_id: int, mood_id: int, id: int, journal_update: schemas.JournalCreate):
+    return _update_returning(
+        session, models.Journal,
+        [models.Journal.id == id, models.Journal.mood_id.in_(_owned_mood_id(user_id, mood_id))],
+        {"title": journal_update.title, "content": journal_update.content, "updated_at": datetime.utcnow()},
+    )
 
-def delete_journal(session: Session, mood_id: int, id: int):
-    statement = select(models.Journal).where(models.Journal.id == id, models.Journal.mood_id == mood_id)
-    journal = session.exec(statement).first()
-    if journal is None:
-        return None
-    session.delete(journal)
-    session.commit()
-    return journal
+def delete_journal(session: Session, user_id: int, mood_id: int, id: int):
+    return _delete_returning(
+        session, models.Journal,
+        [models.Journal.id == id, models.Journal.mood_id.in_(_owned_mood_id(user_id, mood_id))],
+    )
 
 # ----------------------- Game Sessions -----------------------------
 def create_game_session(user_id: int, session: Session, game_session: schemas.GameSessionCreate):
@@ -137,12 +355,22 @@ def create_game_session(user_id: int, session: Session, game_session: schemas.Ga
     )
     session.add(session_game)
     session.commit()
-    session.refresh(session_game)
     return session_game
 
-def get_all_game_sessions_by_user(session: Session, user_id: int):
+def _game_sessions_statement(user_id: int, filters: Optional[schemas.GameSessionFilters]):
+    # Served by the (user_id, game_type, date) index when a game type is given, else (user_id, date)
     statement = select(models.GameSession).where(models.GameSession.user_id == user_id)
-    return session.exec(statement).all()
+    if filters is None:
+        return statement
+    if filters.game_type is not None:
+        statement = statement.where(models.GameSession.game_type == filters.game_type)
+    return _date_range(statement, models.GameSession.date, filters)
+
+def get_all_game_sessions_by_user(session: Session, user_id: int, filters: Optional[schemas.GameSessionFilters] = None):
+    return session.exec(_game_sessions_statement(user_id, filters)).all()
+
+def get_game_sessions_page(session: Session, user_id: int, page: pagination.PageParams, filters: Optional[schemas.GameSessionFilters] = None, columns: Optional[Sequence[Any]] = None) -> pagination.Page:
+    return pagination.fetch_page(session, _project(_game_sessions_statement(user_id, filters), columns), GAME_SESSION_PAGE_KEY, page)
 
 def get_game_session(session: Session, user_id: int, game_id: int):
     statement = select(models.GameSession).where(
@@ -1,16 +1,332 @@
-
-
+import itertools
+import logging
 import os
+import threading
+import time
+from typing import List, Optional
 from dotenv import load_dotenv
-from sqlmodel import SQLModel, create_engine, Session
+from fastapi import HTTPException, Request, status
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app import migrations
+from app.cache import TTLCache
 
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
 DATABASE_URL = os.environ.get("DATABASE_URL")
-engine = create_engine(DATABASE_URL, echo=True)
+
+logger = logging.getLogger(__name__)
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+# Engine runtime profile
+DB_ECHO = _env_bool("DB_ECHO", False)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 0))
+
+# Read replicas (comma-separated URLs); GET endpoints read from them when configured
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_HEALTH_CHECK_INTERVAL = float(os.environ.get("REPLICA_HEALTH_CHECK_INTERVAL", 5))
+REPLICA_STICKY_SECONDS = float(os.environ.get("REPLICA_STICKY_SECONDS", 5))
+
+
+class CheckoutStatsMixin:
+    """Pool mixin that records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+
+
+class InstrumentedQueuePool(CheckoutStatsMixin, QueuePool):
+    """QueuePool of the sync engine, with checkout wait statistics."""
+
+
+class InstrumentedAsyncQueuePool(CheckoutStatsMixin, AsyncAdaptedQueuePool):
+    """Queue pool of the async engine, with checkout wait statistics."""
+
+
+class InstrumentedNullPool(CheckoutStatsMixin, NullPool):
+    """NullPool with checkout statistics; every checkout opens a connection, so the wait is the connect time."""
+
+
+def engine_options(url: str) -> dict:
+    """Build create_engine() keyword arguments for the configured runtime profile."""
+    options = {
+        "echo": DB_ECHO,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    backend = make_url(url).get_backend_name()
+    database = make_url(url).database
+    if backend == "sqlite" and database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection; keep SQLAlchemy's default pool
+        return options
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    if DB_STATEMENT_TIMEOUT_MS and backend == "postgresql":
+        options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+# Async drivers used for the same database: asyncpg for PostgreSQL, aiosqlite for local/test SQLite
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str) -> str:
+    """Rewrite a sync database URL to use the matching async driver."""
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if drivername is None:
+        raise ValueError(f"No async driver configured for '{parsed.get_backend_name()}'")
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+def async_engine_options(url: str) -> dict:
+    """create_async_engine() keyword arguments mirroring the sync runtime profile."""
+    options = {
+        "echo": DB_ECHO,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        # aiosqlite connections are cheap and bound to the event loop that opened them
+        options["poolclass"] = InstrumentedNullPool
+        return options
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    if DB_STATEMENT_TIMEOUT_MS and backend == "postgresql":
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+    return options
+
+
+def create_async_engine_for(url: str):
+    """
+    Async engine for a database URL, or None if its backend has no async driver.
+    The sync engine keeps working either way; only the async routes become unavailable.
+    """
+    try:
+        async_url = async_database_url(url)
+    except ValueError as e:
+        logger.warning("%s; async routes are disabled for %s", e, make_url(url).render_as_string(hide_password=True))
+        return None
+    return create_async_engine(async_url, **async_engine_options(url))
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+async_engine = create_async_engine_for(DATABASE_URL)
+
+
+
+class Replica:
+    """A read replica with sync and async engines and its last health check result."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = create_engine(url, **engine_options(url))
+        self.async_engine = create_async_engine_for(url)
+        self.healthy = True
+        self.checked_at: Optional[float] = None
+
+
+class ReplicaRouter:
+    """
+    Round-robin over read replicas, skipping replicas that failed their last health check.
+    Each replica is pinged with SELECT 1 at most once per health check interval.
+    """
+
+    def __init__(self, urls: List[str], health_check_interval: float = REPLICA_HEALTH_CHECK_INTERVAL):
+        self.replicas = [Replica(url) for url in urls]
+        self.health_check_interval = health_check_interval
+        self._counter = itertools.count()
+
+    def _rotation(self) -> List[Replica]:
+        start = next(self._counter) % len(self.replicas)
+        return self.replicas[start:] + self.replicas[:start]
+
+    def _check_due(self, replica: Replica) -> bool:
+        return replica.checked_at is None or time.monotonic() - replica.checked_at >= self.health_check_interval
+
+    def _record(self, replica: Replica, healthy: bool) -> None:
+        replica.healthy = healthy
+        replica.checked_at = time.monotonic()
+
+    def pick(self) -> Optional[Replica]:
+        """Next healthy replica, or None if there are none."""
+        if not self.replicas:
+            return None
+        for replica in self._rotation():
+            if self._check_due(replica):
+                try:
+                    with replica.engine.connect() as conn:
+                        conn.execute(text("SELECT 1"))
+                    self._record(replica, True)
+                except Exception:
+                    self._record(replica, False)
+            if replica.healthy:
+                return replica
+        return None
+
+    async def pick_async(self) -> Optional[Replica]:
+        """Next healthy replica, checked through the async engine."""
+        if not self.replicas:
+            return None
+        for replica in self._rotation():
+            if replica.async_engine is None:
+                continue
+            if self._check_due(replica):
+                try:
+                    async with replica.async_engine.connect() as conn:
+                        await conn.execute(text("SELECT 1"))
+                    self._record(replica, True)
+                except Exception:
+                    self._record(replica, False)
+            if replica.healthy:
+                return replica
+        return None
+
+    def status(self) -> List[dict]:
+        return [
+            {
+                "url": make_url(replica.url).render_as_string(hide_password=True),
+                "healthy": replica.healthy,
+                "last_checked_seconds_ago": (
+                    round(time.monotonic() - replica.checked_at, 3) if replica.checked_at is not None else None
+                ),
+            }
+            for replica in self.replicas
+        ]
+
+
+replica_router = ReplicaRouter(DATABASE_REPLICA_URLS)
+
+# Users who wrote within the last REPLICA_STICKY_SECONDS read from the primary, so they see their own writes
+recent_writers = TTLCache(max_size=10000, ttl_seconds=REPLICA_STICKY_SECONDS)
+
+def _note_write(request: Optional[Request]) -> None:
+    if request is None or not replica_router.replicas or request.method in ("GET", "HEAD", "OPTIONS"):
+        return
+    user_id = request.path_params.get("user_id")
+    if user_id is not None:
+        recent_writers.set(str(user_id), True)
+
+def _reads_pinned_to_primary(request: Optional[Request]) -> bool:
+    if request is None:
+        return False
+    user_id = request.path_params.get("user_id")
+    return user_id is not None and recent_writers.get(str(user_id)) is not None
 
 def init_session():
-    SQLModel.metadata.create_all(bind=engine)
+    """Bring the schema up to date by applying pending migrations."""
+    migrations.upgrade(engine)
 
-def get_session():
-    with Session(engine) as session:
+def get_session(request: Request = None):
+    _note_write(request)
+    # Written objects stay loaded after commit, so returning them costs no refresh SELECT
+    with Session(engine, expire_on_commit=False) as session:
         yield session
+
+def _require_async_engine() -> None:
+    if async_engine is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="No async driver is configured for this database",
+        )
+
+async def get_async_session(request: Request = None):
+    _require_async_engine()
+    _note_write(request)
+    # Objects stay loaded after commit, so routes can serialize them without lazy I/O
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+def read_engine(request: Request = None):
+    """Engine for read-only work: a healthy replica if configured, otherwise the primary."""
+    replica = None if _reads_pinned_to_primary(request) else replica_router.pick()
+    return replica.engine if replica else engine
+
+def get_read_session(request: Request = None):
+    """Session for read-only endpoints: a healthy replica if configured, otherwise the primary."""
+    with Session(read_engine(request)) as session:
+        yield session
+
+async def get_async_read_session(request: Request = None):
+    """Async session for read-only endpoints: a healthy replica if configured, otherwise the primary."""
+    _require_async_engine()
+    replica = None if _reads_pinned_to_primary(request) else await replica_router.pick_async()
+    async with AsyncSession(replica.async_engine if replica else async_engine, expire_on_commit=False) as session:
+        yield session
+
+def _pool_usage(pool) -> dict:
+    usage = {"pool_class": type(pool).__name__}
+    if isinstance(pool, CheckoutStatsMixin):
+        with pool._stats_lock:
+            if isinstance(pool, QueuePool):
+                usage.update(
+                    checked_out=pool.checkedout(),
+                    checked_in=pool.checkedin(),
+                    overflow=max(pool.overflow(), 0),
+                )
+            usage.update(
+                checkouts=pool.checkouts,
+                timeouts=pool.timeouts,
+                total_wait_seconds=round(pool.total_wait, 6),
+                max_wait_seconds=round(pool.max_wait, 6),
+                avg_wait_seconds=round(pool.total_wait / pool.checkouts, 6) if pool.checkouts else 0.0,
+            )
+    return usage
+
+def get_pool_stats() -> dict:
+    """
+    Snapshot of the connection pools, for sizing them against the worker count.
+    The top level describes the sync engine's pool; "async" the async engine's, which
+    serves the mood, journal, game and insight routes with the same size and overflow.
+    """
+    stats = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pre_ping": DB_POOL_PRE_PING,
+        "statement_timeout_ms": DB_STATEMENT_TIMEOUT_MS,
+    }
+    stats.update(_pool_usage(engine.pool))
+    stats["async"] = _pool_usage(async_engine.sync_engine.pool) if async_engine is not None else None
+    return stats
@@ -0,0 +1,52 @@
+"""
+Fast JSON Lists
+Opt-in serialization path for large list responses (FAST_JSON_LISTS=true).
+
+By default list routes return ORM objects: SQLAlchemy hydrates one model
+instance per row, FastAPI validates each against the response_model
+(from_attributes) and the stdlib json encoder writes the result. On the
+fast path the query selects only the response schema's columns, so rows
+come back as plain tuples, and orjson encodes them to bytes in one call.
+The output matches the default path field for field.
+
+It's opt-in because it skips response_model validation: the projected
+columns come straight from the schema's field names, so every field of a
+list schema must be a column of its table.
+"""
+import os
+from typing import Any, List, Sequence, Type
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional: without orjson the default path is always used
+    orjson = None
+
+FAST_JSON_LISTS = os.environ.get("FAST_JSON_LISTS", "false").strip().lower() in ("1", "true", "yes", "on")
+
+# Set by the list response itself
+_SKIPPED_HEADERS = {"content-length", "content-type"}
+
+
+def enabled() -> bool:
+    return FAST_JSON_LISTS and orjson is not None
+
+
+def columns(schema: Type[BaseModel], model) -> List[Any]:
+    """The model's columns for each field of the response schema, in the schema's field order."""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def rows_response(rows: Sequence[Any], response: Response) -> Response:
+    """
+    Encode projected rows as a JSON list, keeping the headers (cursor, ETag) already set on
+    the route's response; FastAPI doesn't merge those into a Response returned directly.
+    """
+    body = orjson.dumps([row._asdict() for row in rows])
+    return Response(content=body, media_type="application/json", headers=route_headers(response))
+
+
+def route_headers(response: Response) -> dict:
+    """Headers set on a route's response parameter, for a Response the route builds itself."""
+    return {name: value for name, value in response.headers.items() if name not in _SKIPPED_HEADERS}
@@ -1,17 +1,31 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.database import init_session
+from sqlmodel import Session
+from app.database import engine, init_session
+from app.resources_logic import seed_resources
 from app.middleware.cors import add_cors_middleware
 from app.routes.auth import router as auth_router
 from app.routes.users import router as users_router
 from app.routes.moods import router as moods_router
-from app.routes.journals import router as journals_router
+from app.routes.journals import router as journals_router, import_router as journal_import_router
 from app.routes.resources import router as resources_router
 from app.routes.insights import router as insights_router
 from app.routes.games import router as games_router
+from app.routes.internal import router as internal_router
 
-init_session()
+def startup():
+    """One-time boot work: apply schema migrations, then seed the resource catalogue."""
+    init_session()
+    with Session(engine) as session:
+        seed_resources(session)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs once per worker process before it accepts requests, not on import
+    startup()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 add_cors_middleware(app)
@@ -21,6 +35,8 @@ app.include_router(auth_router)
 app.include_router(users_router)
 app.include_router(moods_router)
 app.include_router(journals_router)
+app.include_router(journal_import_router)
 app.include_router(resources_router)
 app.include_router(insights_router)
-app.include_router(games_router)
\ No newline at end of file
+app.include_router(games_router)
+app.include_router(internal_router)
@@ -1,4 +1,6 @@
 from fastapi.middleware.cors import CORSMiddleware
+from app.conditional import ETAG_HEADER
+from app.pagination import NEXT_CURSOR_HEADER
 
 def add_cors_middleware(app):
     app.add_middleware(
@@ -7,4 +9,5 @@ def add_cors_middleware(app):
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, ETAG_HEADER],  # lets browser clients read the pagination cursor and ETags
     )
\ No newline at end of file
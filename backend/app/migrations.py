@@ -0,0 +1,264 @@
+"""
+Schema Migrations
+Versioned, forward-only migrations applied once at startup.
+
+Applied versions are recorded in the schema_migrations table. Each
+migration spells out its own DDL as it was when it was written (frozen
+Table definitions below, never the live models), so a fresh database
+and an old one end up with the same schema by the same steps. Migrations
+are still idempotent: databases created by create_all before the runner
+existed may already have some of the tables and indexes.
+
+Usage (from backend/):
+    python -m app.migrations          # apply pending migrations
+    python -m app.migrations status   # list applied/pending versions
+"""
+import sys
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, cast, func, inspect, select, text,
+)
+from sqlalchemy.engine import Connection, Engine
+
+# Kept out of SQLModel.metadata so dropping the app tables doesn't lose migration history
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Arbitrary key for pg_advisory_xact_lock, so concurrent workers don't migrate at the same time
+PG_MIGRATION_LOCK_KEY = 7261001
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def _add_column_if_missing(conn: Connection, table: str, column: str, ddl: str) -> None:
+    columns = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {ddl}'))
+
+
+def _create_index(conn: Connection, name: str, table: str, *columns: str, unique: bool = False) -> None:
+    if name in {index["name"] for index in inspect(conn).get_indexes(table)}:
+        return
+    # A bare table of just the indexed columns is enough to compile CREATE INDEX
+    target = Table(table, MetaData(), *(Column(column) for column in columns))
+    Index(name, *(target.c[column] for column in columns), unique=unique).create(conn)
+
+
+# Migration 1: the tables as they were when the migration runner was added
+baseline_metadata = MetaData()
+Table(
+    "user", baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("email", String, nullable=False),
+    Column("password", String, nullable=False),
+)
+Table(
+    "mood", baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("date", DateTime, nullable=False),
+    Column("mood", Integer, nullable=False),
+    Column("commentary", String, nullable=False),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+)
+Table(
+    "journal", baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("date", DateTime, nullable=False),
+    Column("title", String, nullable=False),
+    Column("content", String, nullable=False),
+    Column("mood_id", Integer, ForeignKey("mood.id"), nullable=False),
+)
+Table(
+    "aiinsights", baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False, unique=True),
+    Column("insights_json", String, nullable=False),
+    Column("generated_at", DateTime, nullable=False),
+    Column("analysis_period_start", DateTime, nullable=False),
+    Column("analysis_period_end", DateTime, nullable=False),
+    Column("status", String, nullable=False),
+)
+Table(
+    "gamesession", baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+    Column("game_type", String, nullable=False),
+    Column("score", Integer),
+    Column("duration_seconds", Integer),
+    Column("completed", Boolean, nullable=False),
+    Column("date", DateTime, nullable=False),
+)
+Table(
+    "refreshtoken", baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+    Column("token_hash", String, nullable=False),
+    Column("token_version", Integer, nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+    Column("revoked", Boolean, nullable=False),
+)
+
+# Migration 4
+resource_metadata = MetaData()
+resource_table = Table(
+    "resource", resource_metadata,
+    Column("id", String, primary_key=True),
+    Column("title", String, nullable=False),
+    Column("type", String, nullable=False),
+    Column("url", String),
+    Column("duration_seconds", Integer),
+    Column("tags", String),
+    Column("mood_tags", String),
+    Column("description", String),
+    Column("public", Boolean, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+
+
+def _baseline(conn: Connection) -> None:
+    baseline_metadata.create_all(bind=conn)
+
+
+def _user_token_version(conn: Connection) -> None:
+    _add_column_if_missing(conn, "user", "token_version", "token_version INTEGER NOT NULL DEFAULT 0")
+
+
+def _hot_path_indexes(conn: Connection) -> None:
+    _create_index(conn, "ix_user_email", "user", "email")
+    _create_index(conn, "ix_mood_user_id_date", "mood", "user_id", "date")
+    _create_index(conn, "ix_journal_mood_id", "journal", "mood_id")
+    _create_index(conn, "ix_gamesession_user_id_date", "gamesession", "user_id", "date")
+    _create_index(conn, "ix_refreshtoken_user_id", "refreshtoken", "user_id")
+
+
+def _resource_table(conn: Connection) -> None:
+    # Resources used to live behind their own engine, possibly in a separate database
+    resource_table.create(conn, checkfirst=True)
+
+
+def _game_type_index(conn: Connection) -> None:
+    _create_index(conn, "ix_gamesession_user_id_game_type_date", "gamesession", "user_id", "game_type", "date")
+
+
+def _user_is_active(conn: Connection) -> None:
+    _add_column_if_missing(conn, "user", "is_active", "is_active BOOLEAN NOT NULL DEFAULT TRUE")
+
+
+def _updated_at_columns(conn: Connection) -> None:
+    # Existing rows keep NULL; list ETags also cover the row count and max id.
+    # The dialect's own name for a naive datetime: DATETIME on SQLite, TIMESTAMP on PostgreSQL
+    datetime_type = DateTime().compile(dialect=conn.dialect)
+    _add_column_if_missing(conn, "mood", "updated_at", f"updated_at {datetime_type}")
+    _add_column_if_missing(conn, "journal", "updated_at", f"updated_at {datetime_type}")
+    _create_index(conn, "ix_mood_user_id_updated_at", "mood", "user_id", "updated_at")
+
+
+# Migration 8, with the mood columns its backfill reads
+rollup_metadata = MetaData()
+Table("user", rollup_metadata, Column("id", Integer, primary_key=True))
+rollup_mood_table = Table(
+    "mood", rollup_metadata,
+    Column("user_id", Integer),
+    Column("date", DateTime),
+    Column("mood", Integer),
+)
+daily_mood_rollup_table = Table(
+    "daily_mood_rollup", rollup_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+    Column("day", Date, nullable=False),
+    Column("mood_count", Integer, nullable=False),
+    Column("mood_sum", Integer, nullable=False),
+    Column("mood_min", Integer, nullable=False),
+    Column("mood_max", Integer, nullable=False),
+    Column("mood_sum_squares", Integer, nullable=False),
+    Index("ix_daily_mood_rollup_user_id_day", "user_id", "day", unique=True),
+)
+
+
+def _daily_mood_rollup(conn: Connection) -> None:
+    # Backfilled from the existing moods; crud keeps it current from here on
+    daily_mood_rollup_table.create(conn, checkfirst=True)
+    mood = rollup_mood_table
+    # SQLite stores datetimes as 'YYYY-MM-DD HH:MM:SS.ffffff' text
+    day = func.substr(mood.c.date, 1, 10) if conn.dialect.name == "sqlite" else cast(mood.c.date, Date)
+    conn.execute(daily_mood_rollup_table.delete())
+    conn.execute(daily_mood_rollup_table.insert().from_select(
+        ["user_id", "day", "mood_count", "mood_sum", "mood_min", "mood_max", "mood_sum_squares"],
+        select(
+            mood.c.user_id,
+            day,
+            func.count(),
+            func.sum(mood.c.mood),
+            func.min(mood.c.mood),
+            func.max(mood.c.mood),
+            func.sum(mood.c.mood * mood.c.mood),
+        ).group_by(mood.c.user_id, day),
+    ))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline schema", _baseline),
+    Migration(2, "user.token_version for token revocation", _user_token_version),
+    Migration(3, "indexes for hot query paths", _hot_path_indexes),
+    Migration(4, "resource table in the main database", _resource_table),
+    Migration(5, "gamesession (user_id, game_type, date) index for filtered listings", _game_type_index),
+    Migration(6, "user.is_active for background account purges", _user_is_active),
+    Migration(7, "mood/journal updated_at for list ETags", _updated_at_columns),
+    Migration(8, "daily_mood_rollup table, backfilled from mood", _daily_mood_rollup),
+]
+
+
+def applied_versions(conn: Connection) -> List[int]:
+    migration_metadata.create_all(bind=conn)
+    return [row[0] for row in conn.execute(select(schema_migrations.c.version).order_by(schema_migrations.c.version))]
+
+
+def upgrade(engine: Engine) -> List[int]:
+    """Apply pending migrations in one transaction; returns the versions applied."""
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PG_MIGRATION_LOCK_KEY})
+        done = set(applied_versions(conn))
+        applied = []
+        for migration in MIGRATIONS:
+            if migration.version in done:
+                continue
+            migration.apply(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.utcnow(),
+            ))
+            applied.append(migration.version)
+    return applied
+
+
+def main(argv: List[str]) -> None:
+    from app.database import engine
+
+    if argv and argv[0] == "status":
+        with engine.begin() as conn:
+            done = set(applied_versions(conn))
+        for migration in MIGRATIONS:
+            state = "applied" if migration.version in done else "pending"
+            print(f"{migration.version:>4}  {state:<8} {migration.description}")
+        return
+    applied = upgrade(engine)
+    print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
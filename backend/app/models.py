@@ -1,30 +1,55 @@
 
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
+from uuid import uuid4
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
-    email: str
+    email: str = Field(index=True)
     password: str
+    token_version: int = Field(default=0)  # bumped to revoke outstanding access tokens
+    is_active: bool = Field(default=True)  # False while the account is being purged
     moods: List["Mood"] = Relationship(back_populates="owner")
 
 class Mood(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_mood_user_id_date", "user_id", "date"),
+        Index("ix_mood_user_id_updated_at", "user_id", "updated_at"),  # list ETags read only this index
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     date: datetime = Field(default_factory=datetime.utcnow)
     mood: int
     commentary: str
+    updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow)  # NULL on rows predating the column
     user_id: int = Field(foreign_key="user.id")
     owner: Optional["User"] = Relationship(back_populates="moods")
     journals: List["Journal"] = Relationship(back_populates="mood")
 
+class DailyMoodRollup(SQLModel, table=True):
+    __tablename__ = "daily_mood_rollup"
+    __table_args__ = (
+        Index("ix_daily_mood_rollup_user_id_day", "user_id", "day", unique=True),
+    )
+    # Aggregates of one user's moods on one UTC day, kept current by crud (see app.services.mood_rollup)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    day: date
+    mood_count: int
+    mood_sum: int
+    mood_min: int
+    mood_max: int
+    mood_sum_squares: int
+
 class Journal(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     date: datetime = Field(default_factory=datetime.utcnow)
     title: str
     content: str
-    mood_id: int = Field(foreign_key="mood.id")
+    updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow)  # NULL on rows predating the column
+    mood_id: int = Field(foreign_key="mood.id", index=True)
     mood: Optional["Mood"] = Relationship(back_populates="journals")
 
 class AIInsights(SQLModel, table=True):
@@ -37,10 +62,34 @@ class AIInsights(SQLModel, table=True):
     status: str = "completed"  # "generating", "completed", "failed"
 
 class GameSession(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_gamesession_user_id_date", "user_id", "date"),
+        Index("ix_gamesession_user_id_game_type_date", "user_id", "game_type", "date"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     game_type: str  # "matching", "breathing", etc.
     score: Optional[int] = None
     duration_seconds: Optional[int] = None
     completed: bool = False
-    date: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    date: datetime = Field(default_factory=datetime.utcnow)
+
+class RefreshToken(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    token_hash: str  # HMAC-SHA256 of the secret part; the secret itself is never stored
+    token_version: int  # user's token version at issue time
+    expires_at: datetime
+    revoked: bool = False
+
+class Resource(SQLModel, table=True):
+    id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
+    title: str
+    type: str
+    url: Optional[str] = None
+    duration_seconds: Optional[int] = None
+    tags: Optional[str] = None
+    mood_tags: Optional[str] = None
+    description: Optional[str] = None
+    public: bool = True
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,128 @@
+"""
+Keyset Pagination
+Cursor-based paging for the list endpoints.
+
+Pages are ordered by a key such as (date, id), and the next page starts
+strictly after the last row of the previous one:
+
+    WHERE date <= :date AND (date < :date OR id < :id)
+    ORDER BY date DESC, id DESC LIMIT :limit + 1
+
+The leading range on the first key column lets the database walk the
+(owner, date) index from the cursor position, so a deep page costs the
+same as the first one (unlike OFFSET, which reads and discards every
+skipped row). Cursors are opaque to clients: URL-safe base64 of the last
+row's key, returned in the X-Next-Cursor header so response bodies stay
+plain lists.
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, List, Literal, NamedTuple, Optional, Sequence, Tuple
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import BigInteger, and_, literal, or_
+from sqlmodel import Session
+
+DEFAULT_PAGE_SIZE = int(os.environ.get("DEFAULT_PAGE_SIZE", 100))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 500))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+Direction = Literal["asc", "desc"]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class PageParams(NamedTuple):
+    limit: int
+    after: Optional[Tuple[Any, ...]]  # key of the last row already seen
+    direction: Direction
+
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in key]
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _int_fits(column: Any, value: int) -> bool:
+    """Whether an integer fits the column's signed storage (64-bit for BigInteger, 32-bit otherwise)."""
+    bound = 2 ** 63 if isinstance(column.type, BigInteger) else 2 ** 31
+    return -bound <= value < bound
+
+
+def decode_cursor(token: str, columns: Sequence[Any]) -> Tuple[Any, ...]:
+    """Decode a cursor for the given key columns, raising InvalidCursor if it doesn't fit them."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, ValueError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidCursor("Malformed cursor")
+    key = []
+    for column, value in zip(columns, values):
+        python_type = column.type.python_type
+        try:
+            if python_type is datetime and isinstance(value, str):
+                key.append(datetime.fromisoformat(value))
+            elif python_type is int and isinstance(value, int) and not isinstance(value, bool) and _int_fits(column, value):
+                key.append(value)
+            else:
+                raise InvalidCursor("Malformed cursor")
+        except ValueError as e:
+            raise InvalidCursor("Malformed cursor") from e
+    return tuple(key)
+
+
+def page_params(*columns, default_direction: Direction = "desc") -> Callable[..., PageParams]:
+    """FastAPI dependency reading limit/cursor/direction for a list keyed on the given columns."""
+    def dependency(
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        direction: Direction = default_direction,
+    ) -> PageParams:
+        try:
+            after = decode_cursor(cursor, columns) if cursor else None
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return PageParams(limit=limit, after=after, direction=direction)
+    return dependency
+
+
+def _after(columns: Sequence[Any], key: Sequence[Any], descending: bool):
+    column = columns[0]
+    value = literal(key[0], column.type)
+    strict = column < value if descending else column > value
+    if len(columns) == 1:
+        return strict
+    loose = column <= value if descending else column >= value
+    return and_(loose, or_(strict, _after(columns[1:], key[1:], descending)))
+
+
+def fetch_page(session: Session, statement, columns: Sequence[Any], page: PageParams) -> Page:
+    """Run a select one page at a time, ordered by the key columns."""
+    descending = page.direction == "desc"
+    if page.after is not None:
+        statement = statement.where(_after(columns, page.after, descending))
+    statement = statement.order_by(*(column.desc() if descending else column.asc() for column in columns))
+    rows = session.exec(statement.limit(page.limit + 1)).all()
+    if len(rows) <= page.limit:
+        return Page(items=list(rows), next_cursor=None)
+    items = list(rows[:page.limit])
+    last = items[-1]
+    return Page(items=items, next_cursor=encode_cursor([getattr(last, column.key) for column in columns]))
+
+
+def set_next_cursor(response: Response, page: Page) -> List[Any]:
+    """Expose the page's next cursor (if any) as a header and return its items."""
+    if page.next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return page.items
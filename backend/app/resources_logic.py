@@ -1,30 +1,6 @@
-import os
-from uuid import uuid4
-from datetime import datetime
-from typing import Optional, List
-from sqlmodel import SQLModel, Field, create_engine, Session, select
-
-# Database setup
-DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./calmly_resources.db")
-engine = create_engine(DATABASE_URL, echo=False)
-
-# Model (separate from Pydantic schemas)
-class Resource(SQLModel, table=True):
-    id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    title: str
-    type: str
-    url: Optional[str] = None
-    duration_seconds: Optional[int] = None
-    tags: Optional[str] = None
-    mood_tags: Optional[str] = None
-    description: Optional[str] = None
-    public: bool = True
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-
-# Session dependency
-def get_session():
-    with Session(engine) as session:
-        yield session
+from typing import Any, Optional, List, Sequence
+from sqlmodel import Session, select
+from app.models import Resource
 
 # Helper: match mood tags
 def _matches_mood_tags(resource_mood_tags: Optional[str], target_mood: str) -> bool:
@@ -61,19 +37,20 @@ SEED_DATA = [
     },
 ]
 
-def init_db_and_seed():
-    """Create tables and seed data if empty."""
-    SQLModel.metadata.create_all(bind=engine)
-    with Session(engine) as session:
-        first = session.exec(select(Resource)).first()
-        if not first:
-            for data in SEED_DATA:
-                session.add(Resource(**data))
-            session.commit()
+def seed_resources(session: Session) -> bool:
+    """Seed the resource catalogue if it is empty. Returns True if rows were added."""
+    first = session.exec(select(Resource)).first()
+    if first:
+        return False
+    for data in SEED_DATA:
+        session.add(Resource(**data))
+    session.commit()
+    return True
 
 # Business logic functions
-def list_resources_logic(session: Session, limit: int = 50, mood: Optional[str] = None) -> List[Resource]:
-    stmt = select(Resource).limit(limit)
+def list_resources_logic(session: Session, limit: int = 50, mood: Optional[str] = None, columns: Optional[Sequence[Any]] = None) -> List[Resource]:
+    """List resources; with columns, as plain rows of those columns (see app.fast_json)."""
+    stmt = select(*columns).limit(limit) if columns else select(Resource).limit(limit)
     resources = session.exec(stmt).all()
     if mood:
         resources = [r for r in resources if _matches_mood_tags(r.mood_tags, mood)]
@@ -107,7 +84,6 @@ def create_resource_logic(session: Session, resource_data) -> Resource:
     db_resource = Resource(**payload)
     session.add(db_resource)
     session.commit()
-    session.refresh(db_resource)
     return db_resource
 
 def get_resource_logic(session: Session, resource_id: str) -> Optional[Resource]:
@@ -120,6 +96,3 @@ def delete_resource_logic(session: Session, resource_id: str) -> bool:
     session.delete(resource)
     session.commit()
     return True
-
-# Initialize on import
-init_db_and_seed()
\ No newline at end of file
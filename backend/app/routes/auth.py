@@ -1,27 +1,55 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session
 from fastapi.security import OAuth2PasswordRequestForm
 from app import models, schemas, database
-from app.auth import get_user_by_email, get_password_hash, verify_password, create_access_token
+from app.auth import get_user_by_email, create_user_access_token, create_refresh_token, rotate_refresh_token, set_token_version
+from app.services.password_service import password_hasher, PasswordPoolSaturated
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+def _password_pool_busy() -> HTTPException:
+	return HTTPException(status_code=503, detail="Server is busy, please retry shortly", headers={"Retry-After": "1"})
+
+def _add_user(db: Session, user: models.User) -> models.User:
+	db.add(user)
+	db.commit()
+	return user
+
 @router.post("/register", response_model=schemas.UserRead)
-def register(user: schemas.UserCreate, db: Session = Depends(database.get_session)):
-	db_user = get_user_by_email(db, user.email)
+async def register(user: schemas.UserCreate, db: Session = Depends(database.get_session)):
+	db_user = await run_in_threadpool(get_user_by_email, db, user.email)
 	if db_user:
 		raise HTTPException(status_code=400, detail="Email already registered")
-	hashed_password = get_password_hash(user.password)
+	try:
+		hashed_password = await password_hasher.hash_async(user.password)
+	except PasswordPoolSaturated:
+		raise _password_pool_busy()
 	new_user = models.User(name=user.name, email=user.email, password=hashed_password)
-	db.add(new_user)
-	db.commit()
-	db.refresh(new_user)
+	new_user = await run_in_threadpool(_add_user, db, new_user)
+	set_token_version(new_user.id, new_user.token_version, new_user.email)
 	return new_user
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_session)):
-	user = get_user_by_email(db, form_data.username)
-	if not user or not verify_password(form_data.password, user.password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_session)):
+	user = await run_in_threadpool(get_user_by_email, db, form_data.username)
+	if not user or not user.is_active:
+		raise HTTPException(status_code=401, detail="Incorrect email or password", headers={"WWW-Authenticate": "Bearer"})
+	try:
+		password_ok = await password_hasher.verify_async(form_data.password, user.password)
+	except PasswordPoolSaturated:
+		raise _password_pool_busy()
+	if not password_ok:
 		raise HTTPException(status_code=401, detail="Incorrect email or password", headers={"WWW-Authenticate": "Bearer"})
-	access_token = create_access_token(data={"sub": user.email})
-	return {"access_token": access_token, "token_type": "bearer"}
+	access_token = create_user_access_token(user)
+	refresh_token = await run_in_threadpool(create_refresh_token, db, user.id, user.token_version)
+	return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+@router.post("/refresh")
+def refresh(body: schemas.RefreshTokenRequest, db: Session = Depends(database.get_session)):
+	"""Exchange a refresh token for a new access token, rotating the refresh token."""
+	tokens = rotate_refresh_token(db, body.refresh_token)
+	if tokens is None:
+		raise HTTPException(status_code=401, detail="Invalid or expired refresh token", headers={"WWW-Authenticate": "Bearer"})
+	access_token, refresh_token = tokens
+	return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
@@ -1,48 +1,54 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
-from typing import List
-from app import crud, schemas
-from app.database import get_session
-from app.auth import get_current_user
-from app import models
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Annotated, List
+from app import async_crud, crud, fast_json, models, pagination, schemas
+from app.database import get_async_session, get_async_read_session
+from app.auth import get_current_user_async, Principal
 
 router = APIRouter(prefix="/users/{user_id}/games", tags=["games"])
 
 @router.post("/", response_model=schemas.GameSessionRead)
-def create_game_session(
+async def create_game_session(
     user_id: int, 
     game_session: schemas.GameSessionCreate, 
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     """Create a new game session"""
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="You can only create game sessions for yourself")
-    return crud.create_game_session(user_id, session, game_session)
+    return await async_crud.create_game_session(user_id, session, game_session)
 
 @router.get("/", response_model=List[schemas.GameSessionRead])
-def get_all_game_sessions(
+async def get_all_game_sessions(
     user_id: int,
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    response: Response,
+    filters: Annotated[schemas.GameSessionFilters, Query()],
+    page: pagination.PageParams = Depends(pagination.page_params(*crud.GAME_SESSION_PAGE_KEY)),
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: Principal = Depends(get_current_user_async)
 ):
-    """Get all game sessions for a user"""
+    """Get a user's game sessions, newest first, one page at a time (optionally filtered)"""
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="You can only access your own game sessions")
-    return crud.get_all_game_sessions_by_user(session, user_id)
+    if fast_json.enabled():
+        columns = fast_json.columns(schemas.GameSessionRead, models.GameSession)
+        rows = pagination.set_next_cursor(response, await async_crud.get_game_sessions_page(session, user_id, page, filters, columns))
+        return fast_json.rows_response(rows, response)
+    return pagination.set_next_cursor(response, await async_crud.get_game_sessions_page(session, user_id, page, filters))
 
 @router.get("/{game_id}", response_model=schemas.GameSessionRead)
-def get_game_session(
+async def get_game_session(
     user_id: int,
     game_id: int,
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     """Get a specific game session"""
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="You can only access your own game sessions")
-    game_session = crud.get_game_session(session, user_id, game_id)
+    game_session = await async_crud.get_game_session(session, user_id, game_id)
     if game_session is None:
         raise HTTPException(status_code=404, detail="Game session not found")
     return game_session
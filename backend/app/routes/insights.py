@@ -4,11 +4,14 @@ Handles AI insights generation with asynchronous background processing.
 """
 import os
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
-from sqlmodel import Session, select
-from app import models, schemas
-from app.database import get_session
-from app.auth import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, Response, status
+from sqlalchemy import inspect
+from sqlalchemy.orm import defer
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app import conditional, models, schemas
+from app.database import get_async_session
+from app.auth import get_current_user_async, Principal
 from app.services.insights_generator import generate_insights_background_task
 import json
 
@@ -39,18 +42,23 @@ def is_insight_fresh(generated_at: datetime) -> bool:
 @router.get("/", response_model=schemas.InsightsResponse)
 async def get_insights(
     user_id: int,
+    request: Request,
+    response: Response,
     background_tasks: BackgroundTasks,
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     """
     Get AI insights for a user.
     
-    - If fresh insights exist: Returns 200 with insights
+    - If fresh insights exist: Returns 200 with insights, or 304 if the client's
+      If-None-Match still matches their ETag
     - If insights are stale or missing: Returns 202 and triggers background generation
     
     Args:
         user_id: User ID (must match authenticated user)
+        request: Incoming request (for If-None-Match)
+        response: Outgoing response (for the ETag)
         background_tasks: FastAPI background tasks
         session: Database session
         current_user: Authenticated user from JWT
@@ -66,14 +74,22 @@ async def get_insights(
         )
     
     # Check for existing insights
-    existing_insight = session.exec(
-        select(models.AIInsights).where(models.AIInsights.user_id == user_id)
-    ).first()
+    statement = select(models.AIInsights).where(models.AIInsights.user_id == user_id)
+    if conditional.IF_NONE_MATCH_HEADER in request.headers:
+        # A revalidation usually ends in 304, so leave the JSON payload in the database until needed
+        statement = statement.options(defer(models.AIInsights.insights_json))
+    existing_insight = (await session.exec(statement)).first()
     
     # If fresh insight exists, return it immediately
     if existing_insight and existing_insight.status == "completed" and is_insight_fresh(existing_insight.generated_at):
+        etag = conditional.make_etag(existing_insight.id, existing_insight.generated_at.isoformat(), existing_insight.status)
+        if conditional.matches(request, etag):
+            return conditional.not_modified(etag)
+        if "insights_json" in inspect(existing_insight).unloaded:
+            await session.refresh(existing_insight, ["insights_json"])
         try:
             insights_dict = json.loads(existing_insight.insights_json)
+            conditional.set_etag(response, etag)
             return schemas.InsightsResponse(
                 status="completed",
                 insights=insights_dict,
@@ -101,8 +117,8 @@ async def get_insights(
         )
         session.add(existing_insight)
     
-    session.commit()
-    session.refresh(existing_insight)
+    # The async session doesn't expire objects on commit, so no refresh round trip is needed
+    await session.commit()
     
     # Add background task to generate insights
     # FastAPI BackgroundTasks runs after response is sent
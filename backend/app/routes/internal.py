@@ -0,0 +1,34 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.auth import get_token_version_cache_stats
+from app.database import get_pool_stats, replica_router
+
+# Operational stats are unauthenticated, so they are only served where explicitly enabled
+INTERNAL_ENDPOINTS_ENABLED = os.environ.get("INTERNAL_ENDPOINTS_ENABLED", "false").strip().lower() in ("1", "true", "yes", "on")
+
+def require_internal_endpoints_enabled():
+    """Answer 404, as if the route didn't exist, unless INTERNAL_ENDPOINTS_ENABLED is set."""
+    if not INTERNAL_ENDPOINTS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+router = APIRouter(prefix="/internal", tags=["internal"], dependencies=[Depends(require_internal_endpoints_enabled)])
+
+@router.get("/cache/users")
+def user_cache_stats():
+    """Hit/miss counters of the per-user lookups behind authentication (the token version map)."""
+    return get_token_version_cache_stats()
+
+@router.get("/cache/token-versions")
+def token_version_cache_stats():
+    """Hit/miss counters of the token version map used for revocation."""
+    return get_token_version_cache_stats()
+
+@router.get("/db/pool")
+def db_pool_stats():
+    """Connection pool usage: checked-out connections, overflow and checkout wait times."""
+    return get_pool_stats()
+
+@router.get("/db/replicas")
+def db_replica_status():
+    """Health of the configured read replicas."""
+    return replica_router.status()
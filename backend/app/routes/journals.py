@@ -1,72 +1,111 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
-from typing import List
-from app import crud, schemas, models
-from app.database import get_session
-from app.auth import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Literal, Optional
+from app import async_crud, conditional, crud, fast_json, models, pagination, schemas
+from app.services import journal_import
+from app.database import get_async_session, get_async_read_session
+from app.auth import get_current_user_async, Principal
 
 router = APIRouter(prefix="/users/{user_id}/moods/{mood_id}/journals", tags=["journals"])
+import_router = APIRouter(prefix="/users/{user_id}/journals", tags=["journals"])
 
 @router.post("/", response_model=schemas.JournalRead)
-def create_journal(
+async def create_journal(
     user_id: int, 
     mood_id: int, 
     journal: schemas.JournalCreate, 
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.create_journal(mood_id, session, journal)
+    session_journal = await async_crud.create_journal(user_id, mood_id, session, journal)
+    if session_journal is None:
+        raise HTTPException(status_code=404, detail="mood not found")
+    return session_journal
 
 @router.get("/", response_model=List[schemas.JournalRead])
-def get_all_journals_by_mood(
+async def get_all_journals_by_mood(
     user_id: int, 
     mood_id: int, 
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    page: pagination.PageParams = Depends(pagination.page_params(*crud.JOURNAL_PAGE_KEY)),
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.get_all_journals_by_mood(session, mood_id)
+    etag = conditional.make_etag(await async_crud.get_journals_change_token(session, user_id, mood_id), request.url.query)
+    if conditional.matches(request, etag):
+        return conditional.not_modified(etag)
+    conditional.set_etag(response, etag)
+    if fast_json.enabled():
+        columns = fast_json.columns(schemas.JournalRead, models.Journal)
+        rows = pagination.set_next_cursor(response, await async_crud.get_journals_page(session, user_id, mood_id, page, columns))
+        return fast_json.rows_response(rows, response)
+    return pagination.set_next_cursor(response, await async_crud.get_journals_page(session, user_id, mood_id, page))
 
 @router.get("/{id}", response_model=schemas.JournalRead)
-def get_journal(
+async def get_journal(
     user_id: int, 
     mood_id: int, 
     id: int, 
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.get_journal(session, mood_id, id)
+    session_journal = await async_crud.get_journal(session, user_id, mood_id, id)
+    if session_journal is None:
+        raise HTTPException(status_code=404, detail="journal not found")
+    return session_journal
 
 @router.put("/{id}", response_model=schemas.JournalRead)
-def update_journal(
+async def update_journal(
     user_id: int, 
     mood_id: int, 
     id: int, 
     journal_update: schemas.JournalCreate, 
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.update_journal(session, mood_id, id, journal_update)
+    session_journal = await async_crud.update_journal(session, user_id, mood_id, id, journal_update)
+    if session_journal is None:
+        raise HTTPException(status_code=404, detail="journal not found")
+    return session_journal
 
 @router.delete("/{id}", response_model=schemas.JournalRead)
-def delete_journal(
+async def delete_journal(
     user_id: int, 
     mood_id: int, 
     id: int, 
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    session_journal = crud.delete_journal(session, mood_id, id)
+    session_journal = await async_crud.delete_journal(session, user_id, mood_id, id)
     if session_journal is None:
         raise HTTPException(status_code=404, detail="journal not found")
-    return session_journal
\ No newline at end of file
+    return session_journal
+
+@import_router.post("/import", response_model=schemas.JournalImportSummary)
+async def import_journals(
+    user_id: int,
+    request: Request,
+    format: Optional[Literal["ndjson", "csv"]] = None,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    """
+    Stream an NDJSON or CSV export into moods and journals (one of each per entry).
+    The format comes from ?format= or the Content-Type; bad lines are reported, not fatal.
+    """
+    if current_user.id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    fmt = format or journal_import.detect_format(request.headers.get("content-type", ""))
+    return await journal_import.import_journals(session, user_id, request.stream(), fmt)
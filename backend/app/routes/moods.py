@@ -1,67 +1,110 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
-from typing import List
-from app import crud, schemas, models
-from app.database import get_session
-from app.auth import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Annotated, List
+from app import async_crud, conditional, crud, fast_json, models, pagination, schemas
+from app.database import get_async_session, get_async_read_session
+from app.auth import get_current_user_async, Principal
 
 router = APIRouter(prefix="/users/{user_id}/moods", tags=["moods"])
 
 @router.post("/", response_model=schemas.MoodRead)
-def create_mood(
+async def create_mood(
     user_id: int, 
     mood: schemas.MoodCreate, 
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to create mood for this user")
-    return crud.create_mood(user_id, session, mood)
+    return await async_crud.create_mood(user_id, session, mood)
 
-@router.get("/", response_model=List[schemas.MoodRead])
-def get_all_moods_by_user(
+@router.post("/batch", response_model=schemas.MoodBatchResult)
+async def create_moods_batch(
+    user_id: int,
+    batch: schemas.MoodBatchCreate,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    """Insert up to MOOD_BATCH_MAX_ITEMS moods (e.g. an offline sync) in one transaction."""
+    if current_user.id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to create mood for this user")
+    if any(item.user_id is not None and item.user_id != user_id for item in batch.items):
+        raise HTTPException(status_code=403, detail="Not authorized to create mood for this user")
+    ids = await async_crud.create_moods_bulk(session, user_id, batch.items)
+    return schemas.MoodBatchResult(ids=ids, count=len(ids))
+
+@router.get(
+    "/",
+    response_model=List[schemas.MoodRead],
+    responses={200: {"model": List[schemas.MoodWithJournals], "description": "With include=journals"}},
+)
+async def get_all_moods_by_user(
     user_id: int, 
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    filters: Annotated[schemas.MoodListQuery, Query()],
+    page: pagination.PageParams = Depends(pagination.page_params(*crud.MOOD_PAGE_KEY)),
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: Principal = Depends(get_current_user_async)
 ):
+    """List moods one page at a time; include=journals embeds each mood's journals."""
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to view moods for this user")
-    return crud.get_all_moods_by_user(session, user_id)
+    include_journals = filters.include == "journals"
+    change_token = await async_crud.get_moods_change_token(session, user_id, include_journals)
+    etag = conditional.make_etag(change_token, request.url.query)
+    if conditional.matches(request, etag):
+        return conditional.not_modified(etag)
+    conditional.set_etag(response, etag)
+    if include_journals:
+        moods = pagination.set_next_cursor(
+            response, await async_crud.get_moods_page(session, user_id, page, filters, include_journals=True)
+        )
+        # Returned directly: the MoodRead response_model would drop the journals
+        content = jsonable_encoder([schemas.MoodWithJournals.model_validate(mood) for mood in moods])
+        return JSONResponse(content, headers=fast_json.route_headers(response))
+    if fast_json.enabled():
+        columns = fast_json.columns(schemas.MoodRead, models.Mood)
+        rows = pagination.set_next_cursor(response, await async_crud.get_moods_page(session, user_id, page, filters, columns))
+        return fast_json.rows_response(rows, response)
+    return pagination.set_next_cursor(response, await async_crud.get_moods_page(session, user_id, page, filters))
 
 @router.get("/{id}/", response_model=schemas.MoodRead)
-def get_mood(
+async def get_mood(
     user_id: int, 
     id: int, 
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.get_mood(session, user_id, id)
+    return await async_crud.get_mood(session, user_id, id)
 
 @router.put("/{id}/", response_model=schemas.MoodRead)
-def update_mood(
+async def update_mood(
     user_id: int, 
     id: int, 
     mood_update: schemas.MoodCreate, 
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.update_mood(session, user_id, id, mood_update)
+    return await async_crud.update_mood(session, user_id, id, mood_update)
 
 @router.delete("/{id}", response_model=schemas.MoodRead)
-def delete_mood(
+async def delete_mood(
     user_id: int, 
     id: int, 
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    session_mood = crud.delete_mood(session, user_id, id)
+    session_mood = await async_crud.delete_mood(session, user_id, id)
     if session_mood is None:
         raise HTTPException(status_code=404, detail="Mood not found")
     return session_mood
@@ -1,25 +1,30 @@
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlmodel import Session
 from app.resources_logic import (
-    get_session,
     list_resources_logic,
     recommend_resources_logic,
     create_resource_logic,
     get_resource_logic,
     delete_resource_logic,
 )
+from app import fast_json
+from app.database import get_session, get_read_session
+from app.models import Resource
 from app.schemas import ResourceCreate, ResourceRead
 
 router = APIRouter(prefix="/resources", tags=["resources"])
 
 @router.get("/", response_model=list[ResourceRead])
-def list_resources(limit: int = 50, mood: Optional[str] = None, session: Session = Depends(get_session)):
+def list_resources(response: Response, limit: int = 50, mood: Optional[str] = None, session: Session = Depends(get_read_session)):
     """List all resources, optionally filter by mood."""
+    if fast_json.enabled():
+        rows = list_resources_logic(session, limit, mood, fast_json.columns(ResourceRead, Resource))
+        return fast_json.rows_response(rows, response)
     return list_resources_logic(session, limit, mood)
 
 @router.get("/recommend", response_model=list[ResourceRead])
-def recommend_resources(mood: Optional[str] = None, limit: int = 5, session: Session = Depends(get_session)):
+def recommend_resources(mood: Optional[str] = None, limit: int = 5, session: Session = Depends(get_read_session)):
     """Recommend resources based on mood."""
     return recommend_resources_logic(session, mood, limit)
 
@@ -29,7 +34,7 @@ def create_resource(resource: ResourceCreate, session: Session = Depends(get_ses
     return create_resource_logic(session, resource)
 
 @router.get("/{resource_id}", response_model=ResourceRead)
-def get_resource(resource_id: str, session: Session = Depends(get_session)):
+def get_resource(resource_id: str, session: Session = Depends(get_read_session)):
     """Fetch a single resource."""
     resource = get_resource_logic(session, resource_id)
     if not resource:
@@ -1,42 +1,64 @@
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
-from typing import List
-from app import crud, schemas, models
-from app.database import get_session
-from app.auth import get_current_user
+from typing import List, Literal
+from app import crud, pagination, schemas
+from app.database import get_session, get_read_session, read_engine
+from app.services import data_export, user_purge
+from app.auth import get_current_user, Principal
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/", response_model=List[schemas.UserRead])
 def get_users(
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    response: Response,
+    page: pagination.PageParams = Depends(pagination.page_params(*crud.USER_PAGE_KEY, default_direction="asc")),
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_user)
 ):
-    return crud.get_users(session)
+    return pagination.set_next_cursor(response, crud.get_users_page(session, page))
 
 @router.get("/{user_id}", response_model=schemas.UserRead)
 def get_user(
     user_id: int, 
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_user)
 ):
     return crud.get_user(session, user_id)
 
 @router.get("/name/{name}", response_model=schemas.UserRead)
 def get_user_by_name(
     name: str, 
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_user)
 ):
     return crud.get_user_by_username(session, name)
 
+@router.get("/{user_id}/export")
+def export_user_data(
+    user_id: int,
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    current_user: Principal = Depends(get_current_user)
+):
+    """Download the user's full history (profile, moods, journals, games, insights) as a stream."""
+    if current_user.id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to export this user's data")
+    filename = f"calmly-export-{user_id}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        data_export.iter_export(read_engine(request), user_id, format, compress=gzip),
+        media_type="application/gzip" if gzip else data_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 @router.put("/{user_id}", response_model=schemas.UserRead)
 def update_user(
     user_id: int, 
     user_update: schemas.UserCreate, 
     session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to update this user")
@@ -48,12 +70,27 @@ def update_user(
 @router.delete("/{user_id}", response_model=schemas.UserRead)
 def delete_user(
     user_id: int, 
+    response: Response,
+    background_tasks: BackgroundTasks,
+    background: bool = False,
     session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
+    """
+    Delete a user and their whole history.
+
+    With background=true the account is deactivated at once and its history is
+    purged in batches after the response (202), for very large accounts.
+    """
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this user")
-    session_user = crud.delete_user(session, user_id)
+    if background:
+        session_user = crud.deactivate_user(session, user_id)
+    else:
+        session_user = crud.delete_user(session, user_id)
     if session_user is None:
         raise HTTPException(status_code=404, detail="User not found")
+    if background:
+        background_tasks.add_task(user_purge.purge_user_background, user_id)
+        response.status_code = status.HTTP_202_ACCEPTED
     return session_user
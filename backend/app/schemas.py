@@ -1,7 +1,7 @@
 
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from typing import List, Literal, Optional
+from datetime import datetime, timezone
 
 # User Schemas
 class UserBase(BaseModel):
@@ -18,6 +18,9 @@ class UserRead(UserBase):
 class UserInDB(UserRead):
     password: str
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
 # Mood Schemas
 class MoodBase(BaseModel):
     mood: int
@@ -32,6 +35,49 @@ class MoodRead(MoodBase):
     date: datetime
     user_id: int
 
+MOOD_BATCH_MAX_ITEMS = 500
+
+class MoodBatchItem(MoodBase):
+    user_id: Optional[int] = None
+    date: Optional[datetime] = None  # client timestamp for moods logged offline; defaults to now
+
+class MoodBatchCreate(BaseModel):
+    items: List[MoodBatchItem] = Field(min_length=1, max_length=MOOD_BATCH_MAX_ITEMS)
+
+class MoodBatchResult(BaseModel):
+    ids: List[int]
+    count: int
+
+class DateRangeFilter(BaseModel):
+    """Query filters on an entry's date: since is inclusive, until is exclusive."""
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+    @field_validator("since", "until")
+    @classmethod
+    def naive_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # Stored dates are naive UTC; an offset-aware bound is converted so both bounds compare
+        if value is None or value.tzinfo is None:
+            return value
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.since is not None and self.until is not None and self.since >= self.until:
+            raise ValueError("since must be before until")
+        return self
+
+class MoodFilters(DateRangeFilter):
+    # Bounded to the Integer mood column, so an oversized filter is a 422 rather than a driver error
+    min_mood: Optional[int] = Field(default=None, ge=-2**31, le=2**31 - 1)
+    max_mood: Optional[int] = Field(default=None, ge=-2**31, le=2**31 - 1)
+
+    @model_validator(mode="after")
+    def check_mood_range(self):
+        if self.min_mood is not None and self.max_mood is not None and self.min_mood > self.max_mood:
+            raise ValueError("min_mood must not exceed max_mood")
+        return self
+
 # Journal Schemas
 class JournalBase(BaseModel):
     title: str
@@ -46,6 +92,34 @@ class JournalRead(JournalBase):
     date: datetime
     mood_id: int
 
+class MoodListQuery(MoodFilters):
+    """Query of the moods list: the filters, plus include=journals to embed each mood's journals."""
+    include: Optional[Literal["journals"]] = None
+
+class MoodWithJournals(MoodRead):
+    """A mood with its journals embedded (GET /users/{user_id}/moods/?include=journals)."""
+    journals: List[JournalRead] = []
+
+class JournalImportRow(BaseModel):
+    """One entry of a journal import: a mood and the journal written with it."""
+    mood: int
+    commentary: str = ""
+    title: str
+    content: str
+    date: Optional[datetime] = None
+
+class JournalImportError(BaseModel):
+    line: int
+    error: str
+
+class JournalImportSummary(BaseModel):
+    processed: int
+    imported: int
+    failed: int
+    chunks: int
+    errors: List[JournalImportError]
+    errors_truncated: bool
+
 # Resource Schemas
 class ResourceBase(BaseModel):
     title: str
@@ -88,4 +162,7 @@ class GameSessionCreate(GameSessionBase):
 class GameSessionRead(GameSessionBase):
     id: int
     user_id: int
-    date: datetime
\ No newline at end of file
+    date: datetime
+
+class GameSessionFilters(DateRangeFilter):
+    game_type: Optional[str] = None
\ No newline at end of file
@@ -4,27 +4,45 @@ Handles communication with Google Gemini API using JSON mode for reliable output
 """
 import os
 import json
+import threading
 from typing import Dict, Any, Optional
-from dotenv import load_dotenv
 
-# Try to import genai, but don't fail if not installed
-try:
-    import google.generativeai as genai
-    GENAI_AVAILABLE = True
-except ImportError:
-    GENAI_AVAILABLE = False
-    genai = None
+ENV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), ".env")
 
-load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), ".env"))
+# Gemini SDK and its configuration are loaded on first use, not at import:
+# the SDK is slow to import and most workers never generate insights.
+_genai_lock = threading.Lock()
+_genai_state: Optional[Dict[str, Any]] = None
 
-# Configuration
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-1.5-flash")
-GEMINI_TEMPERATURE = float(os.environ.get("GEMINI_TEMPERATURE", "0.2"))
 
-# Initialize Gemini
-if GEMINI_API_KEY and GENAI_AVAILABLE:
-    genai.configure(api_key=GEMINI_API_KEY)
+def get_gemini() -> Dict[str, Any]:
+    """
+    Lazily import and configure the Gemini SDK.
+    
+    Returns:
+        Dictionary with the genai module (None if not installed), api_key, model and temperature
+    """
+    global _genai_state
+    if _genai_state is not None:
+        return _genai_state
+    with _genai_lock:
+        if _genai_state is None:
+            from dotenv import load_dotenv
+            load_dotenv(ENV_FILE)
+            try:
+                import google.generativeai as genai
+            except ImportError:
+                genai = None
+            api_key = os.environ.get("GEMINI_API_KEY")
+            if genai is not None and api_key:
+                genai.configure(api_key=api_key)
+            _genai_state = {
+                "genai": genai,
+                "api_key": api_key,
+                "model": os.environ.get("GEMINI_MODEL", "gemini-1.5-flash"),
+                "temperature": float(os.environ.get("GEMINI_TEMPERATURE", "0.2")),
+            }
+    return _genai_state
 
 
 def get_insights_schema() -> Dict[str, Any]:
@@ -187,10 +205,12 @@ def generate_insights_from_stats(data_summary: Dict[str, Any]) -> Dict[str, Any]
     Raises:
         Exception: If API call fails
     """
-    if not GENAI_AVAILABLE:
+    gemini = get_gemini()
+    genai = gemini["genai"]
+    if genai is None:
         raise ValueError("google-generativeai package not installed. Install with: pip install google-generativeai")
     
-    if not GEMINI_API_KEY:
+    if not gemini["api_key"]:
         raise ValueError("GEMINI_API_KEY not configured in .env file")
     
     # Check if there's any data to analyze
@@ -212,9 +232,9 @@ def generate_insights_from_stats(data_summary: Dict[str, Any]) -> Dict[str, Any]
     try:
         # Initialize model
         model = genai.GenerativeModel(
-            model_name=GEMINI_MODEL,
+            model_name=gemini["model"],
             generation_config={
-                "temperature": GEMINI_TEMPERATURE
+                "temperature": gemini["temperature"]
             },
             safety_settings=[
                 {
@@ -3,12 +3,95 @@ Data Aggregator Service
 Efficiently fetches and pre-processes user data for AI analysis.
 Uses single JOIN query to avoid N+1 problem.
 """
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Tuple
+import string
+from bisect import bisect_left
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from functools import reduce
+from operator import or_
+from typing import Dict, Iterable, List, Any, Optional, Tuple
 from sqlmodel import Session, select
 from sqlalchemy import func
 from app import models
 
+# Common wellness-related keywords/themes
+THEME_KEYWORDS = {
+    "work": ["work", "job", "office", "colleague", "project", "deadline", "meeting"],
+    "sleep": ["sleep", "tired", "rest", "insomnia", "wake", "dream"],
+    "exercise": ["exercise", "workout", "gym", "run", "walk", "fitness", "sport"],
+    "family": ["family", "parent", "sibling", "relative", "mom", "dad", "brother", "sister"],
+    "friends": ["friend", "social", "hangout", "party", "gathering"],
+    "health": ["health", "doctor", "medical", "pain", "illness", "medication"],
+    "stress": ["stress", "anxious", "worried", "overwhelmed", "pressure"],
+    "hobby": ["hobby", "interest", "creative", "art", "music", "reading"],
+    "food": ["food", "eat", "meal", "cooking", "restaurant", "hungry"],
+    "travel": ["travel", "trip", "vacation", "journey", "flight"]
+}
+KEYWORD_THEMES = {keyword: theme for theme, keywords in THEME_KEYWORDS.items() for keyword in keywords}
+# A journal's themes are kept as a bitmask of these
+THEME_BITS = {theme: 1 << position for position, theme in enumerate(THEME_KEYWORDS)}
+
+# Punctuation separates words, as \W would in a regex ("_" stays a word character)
+_WORD_SEPARATORS = str.maketrans({char: " " for char in string.punctuation.replace("_", "") + "‘’“”–—…"})
+# Regular inflections that change a keyword's meaning, so they don't count
+_NOT_INFLECTIONS = {"interesting"}
+
+
+def _inflections(keyword: str) -> List[str]:
+    """A keyword and its -s, -es, -ing and -ed forms (final e dropped, y to i, CVC consonant doubled)."""
+    forms = [keyword + suffix for suffix in ("s", "es", "ing", "ed")]
+    if keyword.endswith("e"):
+        forms += [keyword[:-1] + "ing", keyword + "d"]  # exercising, exercised
+    if keyword.endswith("y"):
+        forms += [keyword[:-1] + "ies", keyword[:-1] + "ied"]  # parties, hobbies
+    vowels = "aeiou"
+    if (len(keyword) >= 3 and keyword[-1] not in vowels + "wxy" and keyword[-2] in vowels
+            and keyword[-3] not in vowels):
+        forms += [keyword + keyword[-1] + "ing", keyword + keyword[-1] + "ed"]  # running, tripped
+    return [keyword] + [form for form in forms if form not in _NOT_INFLECTIONS]
+
+
+# Every word that counts, matched whole: "walks" and "walking" are walks, "sidewalk" isn't,
+# and neither is "moment" (mom) or "painting" (pain). Keywords win over another keyword's inflection.
+WORD_THEMES = dict(KEYWORD_THEMES)
+for _keyword, _theme in KEYWORD_THEMES.items():
+    for _form in _inflections(_keyword):
+        WORD_THEMES.setdefault(_form, _theme)
+_WORD_BITS = {word: THEME_BITS[theme] for word, theme in WORD_THEMES.items()}
+
+
+def journal_words(journal: models.Journal) -> List[str]:
+    """Lowercased words of a journal's title and content, split in one pass."""
+    return f"{journal.title} {journal.content}".lower().translate(_WORD_SEPARATORS).split()
+
+
+def journal_theme_masks(journals: List[models.Journal]) -> List[int]:
+    """
+    Theme bitmask of each journal (THEME_BITS of every theme it mentions), in journal order.
+    
+    This is the only pass over journal text: theme counts and mood
+    correlations are computed from the masks.
+    """
+    masks = []
+    for journal in journals:
+        # Bit lookups and the set run in C; OR-ing a handful of distinct bits is cheap
+        bits = set(map(_WORD_BITS.get, journal_words(journal)))
+        bits.discard(None)
+        masks.append(reduce(or_, bits, 0))
+    return masks
+
+
+def _count_theme_bits(masks: Iterable[int], themes: Iterable[str]) -> Dict[str, int]:
+    """How many masks have each theme's bit set, leaving out themes none of them have."""
+    mask_counts = Counter(masks)
+    counts = {}
+    for theme in themes:
+        bit = THEME_BITS[theme]
+        count = sum(n for mask, n in mask_counts.items() if mask & bit)
+        if count > 0:
+            counts[theme] = count
+    return counts
+
 
 def fetch_user_data_efficiently(
     session: Session,
@@ -49,6 +132,57 @@ def fetch_user_data_efficiently(
     return moods, journals
 
 
+def fetch_analysis_periods(
+    session: Session,
+    user_id: int,
+    days: int = 30,
+    now: Optional[datetime] = None,
+    previous: bool = True
+) -> Tuple[List[models.Mood], List[models.Journal], List[models.Mood]]:
+    """
+    Fetch the current analysis period and the one before it in two queries.
+    
+    One ordered read of the (user_id, date) index covers both periods and is
+    split in memory; journals are only read for the current period, through
+    a join on its date range rather than a list of mood ids.
+    
+    Args:
+        session: Database session
+        user_id: User ID
+        days: Length of each period in days (default 30)
+        now: End of the current period (default: now)
+        previous: Also load the previous period's moods; when False the
+            last element of the tuple is always empty
+        
+    Returns:
+        Tuple of (current moods, current journals, previous period moods)
+    """
+    now = now or datetime.utcnow()
+    current_cutoff = now - timedelta(days=days)
+    previous_cutoff = now - timedelta(days=days * 2)
+    
+    mood_statement = select(models.Mood).where(
+        models.Mood.user_id == user_id,
+        models.Mood.date >= (previous_cutoff if previous else current_cutoff)
+    ).order_by(models.Mood.date)
+    window = list(session.exec(mood_statement).all())
+    
+    split = bisect_left([mood.date for mood in window], current_cutoff)
+    previous_moods, moods = window[:split], window[split:]
+    
+    journals = []
+    if moods:
+        journal_statement = select(models.Journal).join(
+            models.Mood, models.Journal.mood_id == models.Mood.id
+        ).where(
+            models.Mood.user_id == user_id,
+            models.Mood.date >= current_cutoff
+        ).order_by(models.Journal.date)
+        journals = list(session.exec(journal_statement).all())
+    
+    return moods, journals, previous_moods
+
+
 def calculate_mood_statistics(
     moods: List[models.Mood],
     previous_period_moods: List[models.Mood] = None
@@ -56,6 +190,9 @@ def calculate_mood_statistics(
     """
     Calculate mood statistics from mood entries.
     
+    Reference implementation of calculate_mood_statistics_from_rollup, for
+    moods already in memory; expects them ordered by (date, id).
+    
     Args:
         moods: List of mood entries
         previous_period_moods: Optional list of moods from previous period for comparison
@@ -128,53 +265,133 @@ def calculate_mood_statistics(
     }
 
 
-def extract_journal_themes(journals: List[models.Journal]) -> Dict[str, int]:
+def calculate_mood_statistics_from_rollup(
+    session: Session,
+    user_id: int,
+    since: date,
+    until: Optional[date] = None,
+    previous_since: Optional[date] = None
+) -> Dict[str, Any]:
     """
-    Extract recurring themes from journal entries using basic keyword analysis.
+    Same statistics as calculate_mood_statistics, for whole days, from daily_mood_rollup.
+    
+    Reads one rollup row per day with moods in [previous_since, until)
+    instead of every entry. Totals, the previous average and weekday
+    averages add up day rows directly; for the trend halves only the day
+    the midpoint falls in is read from mood, to take its first moods in
+    (date, id) order.
     
     Args:
-        journals: List of journal entries
+        session: Database session
+        user_id: User ID
+        since: First day of the analysed period
+        until: Day after the analysed period; open-ended by default
+        previous_since: First day of the comparison period, which ends at since
         
     Returns:
-        Dictionary mapping themes to frequency counts
+        Dictionary of mood statistics
     """
-    if not journals:
-        return {}
+    rollup = models.DailyMoodRollup
+    statement = select(rollup).where(rollup.user_id == user_id, rollup.day >= (previous_since or since))
+    if until is not None:
+        statement = statement.where(rollup.day < until)
+    days = session.exec(statement.order_by(rollup.day)).all()
+    split = bisect_left([row.day for row in days], since)
+    previous_days, days = days[:split], days[split:]
+    
+    total = sum(row.mood_count for row in days)
+    if not total:
+        return {
+            "average": 0,
+            "min": 0,
+            "max": 0,
+            "trend": "no_data",
+            "previous_average": 0,
+            "day_patterns": {},
+            "total_entries": 0
+        }
+    mood_sum = sum(row.mood_sum for row in days)
     
-    # Common wellness-related keywords/themes
-    theme_keywords = {
-        "work": ["work", "job", "office", "colleague", "project", "deadline", "meeting"],
-        "sleep": ["sleep", "tired", "rest", "insomnia", "wake", "dream"],
-        "exercise": ["exercise", "workout", "gym", "run", "walk", "fitness", "sport"],
-        "family": ["family", "parent", "sibling", "relative", "mom", "dad", "brother", "sister"],
-        "friends": ["friend", "social", "hangout", "party", "gathering"],
-        "health": ["health", "doctor", "medical", "pain", "illness", "medication"],
-        "stress": ["stress", "anxious", "worried", "overwhelmed", "pressure"],
-        "hobby": ["hobby", "interest", "creative", "art", "music", "reading"],
-        "food": ["food", "eat", "meal", "cooking", "restaurant", "hungry"],
-        "travel": ["travel", "trip", "vacation", "journey", "flight"]
-    }
+    trend_diff = 0
+    if total >= 4:
+        mid = total // 2
+        first_half_sum = 0
+        seen = 0
+        for row in days:
+            if seen + row.mood_count > mid:
+                if seen < mid:
+                    start = datetime.combine(row.day, time.min)
+                    first_half_sum += sum(session.exec(
+                        select(models.Mood.mood).where(
+                            models.Mood.user_id == user_id,
+                            models.Mood.date >= start,
+                            models.Mood.date < start + timedelta(days=1)
+                        ).order_by(models.Mood.date, models.Mood.id).limit(mid - seen)
+                    ).all())
+                break
+            first_half_sum += row.mood_sum
+            seen += row.mood_count
+        trend_diff = (mood_sum - first_half_sum) / (total - mid) - first_half_sum / mid
+        if trend_diff > 0.5:
+            trend = "improving"
+        elif trend_diff < -0.5:
+            trend = "declining"
+        else:
+            trend = "stable"
+    else:
+        trend = "insufficient_data"
     
-    theme_counts = {theme: 0 for theme in theme_keywords.keys()}
+    # Weekday sums and counts, in order of first appearance
+    weekdays = {}
+    for row in days:
+        day_sum, day_count = weekdays.get(row.day.strftime('%A'), (0, 0))
+        weekdays[row.day.strftime('%A')] = (day_sum + row.mood_sum, day_count + row.mood_count)
     
-    # Count theme occurrences in journal titles and content
-    all_text = " ".join([
-        f"{journal.title} {journal.content}".lower()
-        for journal in journals
-    ])
+    previous_count = sum(row.mood_count for row in previous_days)
+    prev_avg = sum(row.mood_sum for row in previous_days) / previous_count if previous_count else 0
+    return {
+        "average": round(mood_sum / total, 2),
+        "min": min(row.mood_min for row in days),
+        "max": max(row.mood_max for row in days),
+        "trend": trend,
+        "trend_difference": round(trend_diff, 2),
+        "previous_average": round(prev_avg, 2) if prev_avg > 0 else None,
+        "day_patterns": {name: day_sum / day_count for name, (day_sum, day_count) in weekdays.items()},
+        "total_entries": total
+    }
+
+
+def extract_journal_themes(
+    journals: List[models.Journal],
+    theme_masks: Optional[List[int]] = None
+) -> Dict[str, int]:
+    """
+    Extract recurring themes from journal entries using basic keyword analysis.
     
-    for theme, keywords in theme_keywords.items():
-        for keyword in keywords:
-            theme_counts[theme] += all_text.count(keyword)
+    A journal mentions a theme when one of its words is one of the
+    theme's keywords or an inflection of it (see WORD_THEMES).
     
-    # Filter out themes with zero occurrences
-    return {theme: count for theme, count in theme_counts.items() if count > 0}
+    Args:
+        journals: List of journal entries
+        theme_masks: journal_theme_masks(journals), if already computed
+        
+    Returns:
+        Dictionary mapping themes to the number of entries mentioning them
+    """
+    if not journals:
+        return {}
+    if theme_masks is None:
+        theme_masks = journal_theme_masks(journals)
+    
+    # Themes with zero occurrences are left out
+    return _count_theme_bits(theme_masks, THEME_KEYWORDS)
 
 
 def identify_correlations(
     moods: List[models.Mood],
     journals: List[models.Journal],
-    themes: Dict[str, int]
+    themes: Dict[str, int],
+    theme_masks: Optional[List[int]] = None
 ) -> List[Dict[str, Any]]:
     """
     Identify correlations between moods and other factors.
@@ -183,6 +400,7 @@ def identify_correlations(
         moods: List of mood entries
         journals: List of journal entries
         themes: Dictionary of theme frequencies
+        theme_masks: journal_theme_masks(journals), if already computed
         
     Returns:
         List of correlation observations
@@ -191,35 +409,21 @@ def identify_correlations(
     
     if not moods:
         return correlations
+    if theme_masks is None:
+        theme_masks = journal_theme_masks(journals)
     
-    # Create mood-to-journal mapping
-    mood_journals = {mood.id: [] for mood in moods}
-    for journal in journals:
-        if journal.mood_id in mood_journals:
-            mood_journals[journal.mood_id].append(journal)
+    # Themes of each mood: the union of its journals' masks
+    mood_masks = {mood.id: 0 for mood in moods}
+    for journal, mask in zip(journals, theme_masks):
+        if journal.mood_id in mood_masks:
+            mood_masks[journal.mood_id] |= mask
     
     # Find correlations between low moods and themes
     low_mood_threshold = 5
     high_mood_threshold = 7
     
-    low_mood_themes = {}
-    high_mood_themes = {}
-    
-    for mood in moods:
-        journals_for_mood = mood_journals.get(mood.id, [])
-        mood_text = " ".join([
-            f"{j.title} {j.content}".lower()
-            for j in journals_for_mood
-        ])
-        
-        if mood.mood <= low_mood_threshold:
-            for theme in themes.keys():
-                if theme in mood_text:
-                    low_mood_themes[theme] = low_mood_themes.get(theme, 0) + 1
-        elif mood.mood >= high_mood_threshold:
-            for theme in themes.keys():
-                if theme in mood_text:
-                    high_mood_themes[theme] = high_mood_themes.get(theme, 0) + 1
+    low_mood_themes = _count_theme_bits((mood_masks[mood.id] for mood in moods if mood.mood <= low_mood_threshold), themes)
+    high_mood_themes = _count_theme_bits((mood_masks[mood.id] for mood in moods if mood.mood >= high_mood_threshold), themes)
     
     # Add correlation observations
     for theme, count in low_mood_themes.items():
@@ -276,25 +480,26 @@ def prepare_data_for_ai(
     Returns:
         Dictionary of pre-processed statistics ready for AI
     """
-    # Fetch current period data
-    moods, journals = fetch_user_data_efficiently(session, user_id, analysis_days)
+    # Whole UTC days, today included, so the statistics come from at most
+    # analysis_days rollup rows per period
+    today = datetime.utcnow().date()
+    since = today - timedelta(days=analysis_days - 1)
+    
+    # Fetch current period data; correlations need the rows themselves
+    end = datetime.combine(today + timedelta(days=1), time.min)
+    moods, journals, _ = fetch_analysis_periods(session, user_id, analysis_days, now=end, previous=False)
     
-    # Fetch previous period data for comparison
-    previous_cutoff = datetime.utcnow() - timedelta(days=analysis_days * 2)
-    previous_moods, _ = fetch_user_data_efficiently(
+    # Calculate statistics; the previous period is only aggregated, never loaded
+    mood_stats = calculate_mood_statistics_from_rollup(
         session,
         user_id,
-        analysis_days * 2
+        since=since,
+        previous_since=since - timedelta(days=analysis_days)
     )
-    previous_period_moods = [
-        m for m in previous_moods
-        if m.date < (datetime.utcnow() - timedelta(days=analysis_days))
-    ]
-    
-    # Calculate statistics
-    mood_stats = calculate_mood_statistics(moods, previous_period_moods)
-    themes = extract_journal_themes(journals)
-    correlations = identify_correlations(moods, journals, themes)
+    # Journal text is scanned once; themes and correlations share the masks
+    theme_masks = journal_theme_masks(journals)
+    themes = extract_journal_themes(journals, theme_masks)
+    correlations = identify_correlations(moods, journals, themes, theme_masks)
     
     # Determine period boundaries
     period_start = min(mood.date for mood in moods) if moods else datetime.utcnow()
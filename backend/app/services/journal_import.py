@@ -0,0 +1,199 @@
+"""
+Journal Import
+Streams NDJSON or CSV exports from other journaling apps into moods and journals.
+
+The request body is consumed incrementally and entries are written in
+chunks of JOURNAL_IMPORT_CHUNK_SIZE, one transaction per chunk, so memory
+use stays flat however large the upload is. Lines that fail to parse or
+validate are reported with their line number and skipped.
+
+Each entry becomes one mood plus one journal. NDJSON lines are objects
+with the JournalImportRow fields; CSV files start with a header row
+naming the same fields.
+"""
+import csv
+import json
+import logging
+import os
+from typing import AsyncIterator, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app import async_crud, schemas
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_IMPORT_CHUNK_SIZE = int(os.environ.get("JOURNAL_IMPORT_CHUNK_SIZE", 500))
+JOURNAL_IMPORT_MAX_LINE_BYTES = int(os.environ.get("JOURNAL_IMPORT_MAX_LINE_BYTES", 1024 * 1024))
+MAX_REPORTED_ERRORS = 100
+
+# (line number, parsed fields, error)
+Record = Tuple[int, Optional[dict], Optional[str]]
+
+
+def detect_format(content_type: str) -> str:
+    """Pick the import format from the request's Content-Type, defaulting to NDJSON."""
+    return "csv" if "csv" in content_type.lower() else "ndjson"
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = JOURNAL_IMPORT_MAX_LINE_BYTES) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Split a byte stream into (line number, line) pairs without holding more than one line.
+    Lines longer than max_line_bytes are discarded as they arrive and yielded as None.
+    """
+    buffer = bytearray()
+    line_no = 0
+    oversized = False
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            newline = buffer.find(b"\n", start)
+            if newline < 0:
+                break
+            line_no += 1
+            yield line_no, None if oversized or newline - start > max_line_bytes else bytes(buffer[start:newline])
+            oversized = False
+            start = newline + 1
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            oversized = True
+            buffer.clear()
+    if buffer or oversized:
+        yield line_no + 1, None if oversized else bytes(buffer)
+
+
+def _decode(raw: bytes, line_no: int) -> str:
+    text = raw.decode("utf-8")
+    if line_no == 1:
+        text = text.lstrip("\ufeff")
+    return text.rstrip("\r")
+
+
+async def iter_ndjson(lines: AsyncIterator[Tuple[int, Optional[bytes]]]) -> AsyncIterator[Record]:
+    async for line_no, raw in lines:
+        if raw is None:
+            yield line_no, None, f"line exceeds {JOURNAL_IMPORT_MAX_LINE_BYTES} bytes"
+            continue
+        try:
+            text = _decode(raw, line_no)
+            if not text.strip():
+                continue
+            data = json.loads(text)
+        except (UnicodeDecodeError, ValueError) as e:
+            yield line_no, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(data, dict):
+            yield line_no, None, "expected a JSON object"
+            continue
+        yield line_no, data, None
+
+
+async def iter_csv(lines: AsyncIterator[Tuple[int, Optional[bytes]]]) -> AsyncIterator[Record]:
+    header: Optional[List[str]] = None
+    pending: Optional[str] = None  # a quoted field that continues on the next line
+    record_start = 0
+    async for line_no, raw in lines:
+        if raw is None:
+            pending = None
+            yield line_no, None, f"line exceeds {JOURNAL_IMPORT_MAX_LINE_BYTES} bytes"
+            continue
+        try:
+            text = _decode(raw, line_no)
+        except UnicodeDecodeError as e:
+            pending = None
+            yield line_no, None, f"invalid UTF-8: {e}"
+            continue
+        if pending is None:
+            record_start = line_no
+            record = text
+        else:
+            record = pending + "\n" + text
+        if record.count('"') % 2:
+            pending = record if len(record) <= JOURNAL_IMPORT_MAX_LINE_BYTES else None
+            if pending is None:
+                yield record_start, None, f"record exceeds {JOURNAL_IMPORT_MAX_LINE_BYTES} bytes"
+            continue
+        pending = None
+        if not record.strip():
+            continue
+        try:
+            values = next(csv.reader([record]))
+        except csv.Error as e:
+            yield record_start, None, f"invalid CSV: {e}"
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield record_start, None, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        # Empty cells fall back to the field defaults
+        yield record_start, {name: value for name, value in zip(header, values) if value != ""}, None
+    if pending is not None:
+        yield record_start, None, "unterminated quoted field"
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors())
+
+
+async def import_journals(
+    session: AsyncSession,
+    user_id: int,
+    chunks: AsyncIterator[bytes],
+    fmt: str = "ndjson",
+    chunk_size: Optional[int] = None,
+) -> schemas.JournalImportSummary:
+    """Import a streamed NDJSON/CSV body for a user, committing every chunk_size entries."""
+    chunk_size = chunk_size or JOURNAL_IMPORT_CHUNK_SIZE
+    records = iter_csv(iter_lines(chunks)) if fmt == "csv" else iter_ndjson(iter_lines(chunks))
+    processed = imported = failed = chunk_count = 0
+    errors: List[schemas.JournalImportError] = []
+    batch: List[Tuple[int, schemas.JournalImportRow]] = []
+
+    def record_error(line_no: int, message: str) -> None:
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append(schemas.JournalImportError(line=line_no, error=message))
+
+    async def flush() -> None:
+        nonlocal imported, chunk_count
+        if not batch:
+            return
+        chunk_count += 1
+        try:
+            imported += await async_crud.import_journal_chunk(session, user_id, [entry for _, entry in batch])
+        except SQLAlchemyError as e:
+            await session.rollback()
+            logger.warning("Journal import for user %s: chunk %d rolled back: %s", user_id, chunk_count, e)
+            for line_no, _ in batch:
+                record_error(line_no, "could not be saved")
+        batch.clear()
+        logger.info(
+            "Journal import for user %s: chunk %d done, %d processed, %d imported, %d failed",
+            user_id, chunk_count, processed, imported, failed,
+        )
+
+    async for line_no, data, error in records:
+        processed += 1
+        if error is None:
+            try:
+                batch.append((line_no, schemas.JournalImportRow.model_validate(data)))
+            except ValidationError as e:
+                error = _validation_message(e)
+        if error is not None:
+            record_error(line_no, error)
+        elif len(batch) >= chunk_size:
+            await flush()
+    await flush()
+
+    return schemas.JournalImportSummary(
+        processed=processed,
+        imported=imported,
+        failed=failed,
+        chunks=chunk_count,
+        errors=errors,
+        errors_truncated=failed > len(errors),
+    )
@@ -0,0 +1,167 @@
+"""
+Daily Mood Rollup
+Per-user, per-day mood aggregates kept alongside the raw Mood rows.
+
+daily_mood_rollup holds one row per user and UTC day with the count,
+sum, min, max and sum of squares of that day's moods, so period
+statistics read at most one row per day instead of every entry. crud
+maintains it in the same transaction as each mood write: new moods are
+added to their day with an upsert, while updates and deletes recompute
+the day from its moods (a min or max can't be subtracted back out).
+
+Usage (from backend/):
+    python -m app.services.mood_rollup rebuild [user_id]   # backfill or rebuild from the moods
+    python -m app.services.mood_rollup check [user_id]     # compare with the moods
+"""
+import sys
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import Date, case, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlmodel import Session, delete, select
+from app import models
+
+ROLLUP_COLUMNS = ("user_id", "day", "mood_count", "mood_sum", "mood_min", "mood_max", "mood_sum_squares")
+
+# Backends with INSERT ... ON CONFLICT DO UPDATE; others recompute the day instead
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+class mood_day(FunctionElement):
+    """UTC calendar day of a datetime column."""
+    type = Date()
+    name = "mood_day"
+    inherit_cache = True
+
+
+@compiles(mood_day)
+def _mood_day_cast(element, compiler, **kw):
+    return "CAST(%s AS DATE)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(mood_day, "sqlite")
+def _mood_day_sqlite(element, compiler, **kw):
+    # Datetimes are stored as 'YYYY-MM-DD HH:MM:SS.ffffff' text, dates as 'YYYY-MM-DD'
+    return "substr(%s, 1, 10)" % compiler.process(element.clauses, **kw)
+
+
+def _aggregate(*where):
+    """Rollup rows computed from the moods matching where, one per (user_id, day)."""
+    day = mood_day(models.Mood.date)
+    return select(
+        models.Mood.user_id,
+        day,
+        func.count(),
+        func.sum(models.Mood.mood),
+        func.min(models.Mood.mood),
+        func.max(models.Mood.mood),
+        func.sum(models.Mood.mood * models.Mood.mood),
+    ).where(*where).group_by(models.Mood.user_id, day)
+
+
+def _replace(mood_where: list, rollup_where: list) -> list:
+    return [
+        delete(models.DailyMoodRollup).where(*rollup_where),
+        insert(models.DailyMoodRollup).from_select(ROLLUP_COLUMNS, _aggregate(*mood_where)),
+    ]
+
+
+def rebuild_statements(user_id: Optional[int] = None) -> list:
+    """Statements replacing the whole rollup, or one user's, with aggregates of the moods."""
+    if user_id is None:
+        return _replace([], [])
+    return _replace([models.Mood.user_id == user_id], [models.DailyMoodRollup.user_id == user_id])
+
+
+def rebuild_days(session: Session, user_id: int, days: Iterable[date]) -> None:
+    """Recompute some of a user's days from their moods (no commit)."""
+    for day in sorted(set(days)):
+        start = datetime.combine(day, time.min)
+        statements = _replace(
+            [models.Mood.user_id == user_id, models.Mood.date >= start, models.Mood.date < start + timedelta(days=1)],
+            [models.DailyMoodRollup.user_id == user_id, models.DailyMoodRollup.day == day],
+        )
+        for statement in statements:
+            session.exec(statement)
+
+
+def add_moods(session: Session, rows: Iterable[Dict[str, Any]]) -> None:
+    """Add newly inserted moods (user_id, date and mood of each) to their days, in one statement (no commit)."""
+    days = defaultdict(lambda: {"mood_count": 0, "mood_sum": 0, "mood_min": None, "mood_max": None, "mood_sum_squares": 0})
+    for row in rows:
+        day = days[(row["user_id"], row["date"].date())]
+        mood = row["mood"]
+        day["mood_count"] += 1
+        day["mood_sum"] += mood
+        day["mood_min"] = mood if day["mood_min"] is None else min(day["mood_min"], mood)
+        day["mood_max"] = mood if day["mood_max"] is None else max(day["mood_max"], mood)
+        day["mood_sum_squares"] += mood * mood
+    if not days:
+        return
+
+    dialect = session.get_bind().dialect.name
+    if dialect not in _UPSERT_INSERTS:
+        for user_id, day in days:
+            rebuild_days(session, user_id, [day])
+        return
+
+    rollup = models.DailyMoodRollup
+    statement = _UPSERT_INSERTS[dialect](rollup)
+    new = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "day"],
+        set_={
+            "mood_count": rollup.mood_count + new.mood_count,
+            "mood_sum": rollup.mood_sum + new.mood_sum,
+            "mood_min": case((new.mood_min < rollup.mood_min, new.mood_min), else_=rollup.mood_min),
+            "mood_max": case((new.mood_max > rollup.mood_max, new.mood_max), else_=rollup.mood_max),
+            "mood_sum_squares": rollup.mood_sum_squares + new.mood_sum_squares,
+        },
+    )
+    session.exec(statement, params=[
+        {"user_id": user_id, "day": day, **values} for (user_id, day), values in days.items()
+    ])
+
+
+def check(session: Session, user_id: Optional[int] = None) -> List[str]:
+    """Days where the rollup disagrees with the moods, one line each; empty when consistent."""
+    rollup = models.DailyMoodRollup
+    expected_statement = _aggregate(*([models.Mood.user_id == user_id] if user_id is not None else []))
+    actual_statement = select(*(getattr(rollup, column) for column in ROLLUP_COLUMNS))
+    if user_id is not None:
+        actual_statement = actual_statement.where(rollup.user_id == user_id)
+    expected = {(row[0], row[1]): tuple(row[2:]) for row in session.exec(expected_statement)}
+    actual = {(row[0], row[1]): tuple(row[2:]) for row in session.exec(actual_statement)}
+    return [
+        f"user {key[0]} on {key[1]}: rollup {actual.get(key)} != moods {expected.get(key)}"
+        for key in sorted(expected.keys() | actual.keys())
+        if actual.get(key) != expected.get(key)
+    ]
+
+
+def main(argv: List[str]) -> None:
+    from app.database import engine
+
+    command = argv[0] if argv else "check"
+    user_id = int(argv[1]) if len(argv) > 1 else None
+    with Session(engine) as session:
+        if command == "rebuild":
+            for statement in rebuild_statements(user_id):
+                session.exec(statement)
+            session.commit()
+            print("Rebuilt the daily mood rollup")
+        elif command == "check":
+            problems = check(session, user_id)
+            for problem in problems:
+                print(problem)
+            print(f"{len(problems)} inconsistent day(s)")
+            sys.exit(1 if problems else 0)
+        else:
+            sys.exit("usage: python -m app.services.mood_rollup [rebuild|check] [user_id]")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,86 @@
+"""
+Password Service
+Single shared bcrypt context, plus a bounded worker pool so async routes can
+hash and verify passwords without blocking the event loop.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+# Configuration
+PASSWORD_POOL_SIZE = int(os.environ.get("PASSWORD_POOL_SIZE", 4))
+PASSWORD_QUEUE_LIMIT = int(os.environ.get("PASSWORD_QUEUE_LIMIT", 32))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with bcrypt (blocking, ~200ms of CPU)."""
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Check a password against a bcrypt hash (blocking, ~200ms of CPU)."""
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordPoolSaturated(Exception):
+    """Raised when the password pool already has its maximum number of jobs."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated, size-limited thread pool.
+
+    bcrypt releases the GIL while hashing, so threads give real parallelism.
+    At most max_workers + max_pending jobs are accepted at once; beyond that
+    callers get PasswordPoolSaturated immediately instead of queueing forever.
+    """
+
+    def __init__(self, max_workers: int = PASSWORD_POOL_SIZE, max_pending: int = PASSWORD_QUEUE_LIMIT):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    async def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolSaturated("Password hashing pool is saturated")
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        # Release on completion rather than after the await, so cancelled requests still free their slot
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def hash_async(self, password: str) -> str:
+        """Hash a password on the pool."""
+        return await self._run(hash_password, password)
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password on the pool."""
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of jobs currently running or queued."""
+        return self._in_flight
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,52 @@
+"""
+User Purge
+Deletes very large accounts in the background.
+
+DELETE /users/{id}?background=true deactivates the account straight away
+(no logins, every token revoked) and hands the history to
+purge_user_background, which removes it USER_PURGE_BATCH_SIZE rows per
+transaction so a heavy account never holds one long write transaction.
+The user row goes last; until then it stays deactivated.
+
+Purges interrupted by a restart can be finished from the command line:
+
+    python -m app.services.user_purge
+"""
+import logging
+import os
+import time
+from typing import Optional
+from sqlmodel import Session, select
+from app import crud, database, models
+
+logger = logging.getLogger(__name__)
+
+USER_PURGE_BATCH_SIZE = int(os.environ.get("USER_PURGE_BATCH_SIZE", 5000))
+
+
+def purge_user_background(user_id: int, batch_size: Optional[int] = None) -> None:
+    """Background task deleting a deactivated user's history in batches."""
+    batch_size = batch_size or USER_PURGE_BATCH_SIZE
+    # Create a new database session for the background task
+    with Session(database.engine) as session:
+        start = time.perf_counter()
+        try:
+            deleted = crud.purge_user(session, user_id, batch_size)
+        except Exception:
+            session.rollback()
+            logger.exception("Purge of user %s failed; rerun python -m app.services.user_purge", user_id)
+            return
+        logger.info("Purged user %s: %d rows in %.1fs", user_id, deleted, time.perf_counter() - start)
+
+
+def main() -> None:
+    """Finish every pending purge (users left deactivated)."""
+    with Session(database.engine) as session:
+        pending = session.exec(select(models.User.id).where(models.User.is_active == False)).all()  # noqa: E712
+    for user_id in pending:
+        purge_user_background(user_id)
+    print(f"Purged {len(pending)} user(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Sync vs. async session stack throughput.
+
+Mounts the same "list moods" handler twice - once on the sync Session
+(threadpool) and once on the AsyncSession (event loop) - and drives both
+with concurrent requests through httpx's in-process ASGI transport.
+
+Usage (from backend/):
+    python -m benchmarks.bench_async_sessions [requests] [concurrency] [moods]
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Always a throwaway file: the benchmark drops every table, so it must never see a real DATABASE_URL
+os.environ["DATABASE_URL"] = "sqlite:///./bench.db"
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlmodel import Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app import async_crud, crud, models
+from app.database import engine, get_async_session, get_session
+
+bench_app = FastAPI()
+
+
+@bench_app.get("/sync/{user_id}")
+def list_sync(user_id: int, session: Session = Depends(get_session)):
+    return len(crud.get_all_moods_by_user(session, user_id))
+
+
+@bench_app.get("/async/{user_id}")
+async def list_async(user_id: int, session: AsyncSession = Depends(get_async_session)):
+    return len(await async_crud.get_all_moods_by_user(session, user_id))
+
+
+def _seed(moods: int) -> int:
+    SQLModel.metadata.drop_all(bind=engine)
+    SQLModel.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        user = models.User(name="Bench", email="bench@example.com", password="x")
+        session.add(user)
+        session.commit()
+        session.add_all([models.Mood(mood=i % 10, commentary="bench", user_id=user.id) for i in range(moods)])
+        session.commit()
+        return user.id
+
+
+async def _drive(path: str, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=bench_app)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return time.perf_counter() - start
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    moods = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    user_id = _seed(moods)
+
+    print(f"{'stack':>6} {'seconds':>10} {'req/s':>10}")
+    for stack in ("sync", "async"):
+        elapsed = asyncio.run(_drive(f"/{stack}/{user_id}", requests, concurrency))
+        print(f"{stack:>6} {elapsed:>10.2f} {requests / elapsed:>10.1f}")
+    SQLModel.metadata.drop_all(bind=engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Streaming export throughput and memory.
+
+Seeds histories of increasing size, downloads each through
+GET /users/{id}/export and reports rows per second and the peak Python
+heap (tracemalloc) for each format; the peak should stay flat as the
+history grows. The export is driven through the raw ASGI interface and
+each body chunk is discarded as it's sent (httpx's ASGI transport would
+collect the whole body first).
+
+Usage (from backend/):
+    python -m benchmarks.bench_export [moods ...]
+"""
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Always a throwaway file: the benchmark drops every table, so it must never see a real DATABASE_URL
+os.environ["DATABASE_URL"] = "sqlite:///./bench.db"
+
+import httpx
+from sqlalchemy import delete, insert
+from sqlmodel import Session, SQLModel
+from app import models
+from app.database import engine
+from app.main import app, startup
+
+
+def _seed(user_id: int, moods: int) -> None:
+    start = datetime(2020, 1, 1)
+    with Session(engine) as session:
+        session.exec(delete(models.Journal))
+        session.exec(delete(models.Mood))
+        ids = session.exec(insert(models.Mood).returning(models.Mood.id), params=[
+            {"user_id": user_id, "mood": i % 10, "commentary": "seeded", "date": start + timedelta(hours=i)}
+            for i in range(moods)
+        ]).scalars().all()
+        session.exec(insert(models.Journal), params=[
+            {"mood_id": mood_id, "title": "Entry", "content": "Seeded journal entry. " * 10, "date": start}
+            for mood_id in ids
+        ])
+        session.commit()
+
+
+async def _download(path: str, token: str, query: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": ("bench", 1), "server": ("bench", 80),
+    }
+    received = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal received
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"export failed with {message['status']}")
+        if message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return received
+
+
+async def _run(sizes):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/auth/register", json={"name": "Bench", "email": "bench@example.com", "password": "benchpass"})
+        login = await client.post("/auth/login", data={"username": "bench@example.com", "password": "benchpass"})
+        token = login.json()["access_token"]
+        user_id = (await client.get("/users/", headers={"Authorization": f"Bearer {token}"})).json()[0]["id"]
+
+        print(f"{'moods':>8} {'variant':>12} {'seconds':>9} {'rows/s':>10} {'MiB out':>9} {'peak MiB':>9}")
+        for moods in sizes:
+            _seed(user_id, moods)
+            for label, query in (
+                ("ndjson", "format=ndjson"),
+                ("csv", "format=csv"),
+                ("ndjson.gz", "format=ndjson&gzip=true"),
+            ):
+                tracemalloc.start()
+                start = time.perf_counter()
+                received = await _download(f"/users/{user_id}/export", token, query)
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                rows = moods * 2
+                print(f"{moods:>8} {label:>12} {elapsed:>9.2f} {rows / elapsed:>10.1f} "
+                      f"{received / 2**20:>9.1f} {peak / 2**20:>9.1f}")
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 50000, 100000]
+    SQLModel.metadata.drop_all(bind=engine)
+    SQLModel.metadata.create_all(bind=engine)
+    startup()
+    asyncio.run(_run(sizes))
+    SQLModel.metadata.drop_all(bind=engine)
+
+
+if __name__ == "__main__":
+    main()
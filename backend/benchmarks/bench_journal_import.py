@@ -0,0 +1,65 @@
+"""
+Streaming journal import throughput and memory.
+
+Streams generated NDJSON bodies of increasing size through
+POST /users/{id}/journals/import and reports rows per second and the
+peak Python heap (tracemalloc) for each; the peak should stay flat as the
+upload grows. Requests go through httpx's ASGI transport, which streams
+the body to the app (TestClient would buffer it first).
+
+Usage (from backend/):
+    python -m benchmarks.bench_journal_import [rows ...]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+# Always a throwaway file: the benchmark drops every table, so it must never see a real DATABASE_URL
+os.environ["DATABASE_URL"] = "sqlite:///./bench.db"
+
+import httpx
+from sqlmodel import SQLModel
+from app.database import engine
+from app.main import app, startup
+
+
+async def _body(rows: int):
+    for i in range(rows):
+        yield (json.dumps({"mood": i % 10, "title": f"Entry {i}", "content": "Imported from another app. " * 8}) + "\n").encode()
+
+
+async def _run(sizes):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/auth/register", json={"name": "Bench", "email": "bench@example.com", "password": "benchpass"})
+        login = await client.post("/auth/login", data={"username": "bench@example.com", "password": "benchpass"})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}", "Content-Type": "application/x-ndjson"}
+        user_id = (await client.get("/users/", headers=headers)).json()[0]["id"]
+
+        print(f"{'rows':>8} {'seconds':>10} {'rows/s':>10} {'peak MiB':>10}")
+        for rows in sizes:
+            tracemalloc.start()
+            start = time.perf_counter()
+            response = await client.post(f"/users/{user_id}/journals/import", content=_body(rows), headers=headers)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            response.raise_for_status()
+            assert response.json()["imported"] == rows
+            print(f"{rows:>8} {elapsed:>10.2f} {rows / elapsed:>10.1f} {peak / 2**20:>10.1f}")
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [5000, 20000, 50000]
+    SQLModel.metadata.drop_all(bind=engine)
+    SQLModel.metadata.create_all(bind=engine)
+    startup()
+    asyncio.run(_run(sizes))
+    SQLModel.metadata.drop_all(bind=engine)
+
+
+if __name__ == "__main__":
+    main()
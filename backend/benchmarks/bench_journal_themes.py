@@ -0,0 +1,73 @@
+"""
+Journal theme extraction: per-keyword str.count scans vs. single-pass per-journal theme masks.
+
+Builds 10k synthetic journals and times extract_journal_themes against the
+previous implementation. That one joined every journal into one lowercased
+string and called str.count for each of the ~60 keywords, so it scanned
+the text once per keyword and also counted substrings ("walk" inside
+"sidewalk", "art" inside "start"). The current one counts entries
+mentioning each theme (from per-journal theme masks) rather than keyword
+occurrences, so the counts differ on purpose; both sets are printed.
+
+No database is needed.
+
+Usage (from backend/):
+    python -m benchmarks.bench_journal_themes [journals] [iterations]
+"""
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from app.services import data_aggregator
+
+WORDS = (
+    "today was long but the sidewalk was sunny and I started a new project at the office "
+    "slept badly again after a stressful meeting with my colleague about the deadline "
+    "went for a walk with a friend then cooked a meal and listened to music before reading "
+    "my brother called from the airport before his flight and mom worried about the trip "
+    "gym session felt great running intervals then a restless night and strange dreams"
+).split()
+
+
+def legacy_extract_journal_themes(journals):
+    all_text = " ".join([f"{journal.title} {journal.content}".lower() for journal in journals])
+    theme_counts = {theme: 0 for theme in data_aggregator.THEME_KEYWORDS}
+    for theme, keywords in data_aggregator.THEME_KEYWORDS.items():
+        for keyword in keywords:
+            theme_counts[theme] += all_text.count(keyword)
+    return {theme: count for theme, count in theme_counts.items() if count > 0}
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    rng = random.Random(24)
+    journals = [
+        SimpleNamespace(
+            title=" ".join(rng.choices(WORDS, k=3)).capitalize(),
+            content=" ".join(rng.choices(WORDS, k=rng.randint(40, 160))),
+        )
+        for _ in range(count)
+    ]
+
+    results = {}
+    counts = {}
+    for label, extract in (("str.count", legacy_extract_journal_themes), ("masks", data_aggregator.extract_journal_themes)):
+        counts[label] = extract(journals)  # warm up
+        begin = time.perf_counter()
+        for _ in range(iterations):
+            extract(journals)
+        results[label] = (time.perf_counter() - begin) / iterations
+
+    print(f"{'path':>10} {'ms/call':>10} {'journals/s':>12}")
+    for label, elapsed in results.items():
+        print(f"{label:>10} {elapsed * 1000:>10.1f} {count / elapsed:>12.0f}")
+    print(f"speedup: {results['str.count'] / results['masks']:.1f}x")
+    print(f"{'theme':>10} {'str.count':>10} {'masks':>10}")
+    for theme in data_aggregator.THEME_KEYWORDS:
+        print(f"{theme:>10} {counts['str.count'].get(theme, 0):>10} {counts['masks'].get(theme, 0):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+List serialization cost: ORM objects + response_model vs. the FAST_JSON_LISTS path.
+
+Seeds one user with 10k moods and fetches them as a single page through
+GET /users/{id}/moods/, first on the default path (ORM hydration,
+from_attributes validation, stdlib JSON) and then with fast_json enabled
+(column projection, orjson). Bodies are compared to make sure both paths
+return the same JSON.
+
+Usage (from backend/):
+    python -m benchmarks.bench_list_json [moods] [iterations]
+"""
+import os
+import sys
+import time
+
+# Always a throwaway file: the benchmark drops every table, so it must never see a real DATABASE_URL
+os.environ["DATABASE_URL"] = "sqlite:///./bench.db"
+os.environ.setdefault("MAX_PAGE_SIZE", "100000")
+
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel
+from app import fast_json, models
+from app.main import app
+from app.database import engine
+
+
+def main():
+    moods = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    SQLModel.metadata.drop_all(bind=engine)
+    SQLModel.metadata.create_all(bind=engine)
+    client = TestClient(app)
+    client.post("/auth/register", json={"email": "bench@example.com", "password": "benchpass", "name": "Bench"})
+    token = client.post("/auth/login", data={"username": "bench@example.com", "password": "benchpass"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+
+    start = datetime(2020, 1, 1)
+    with Session(engine) as session:
+        session.exec(insert(models.Mood), params=[
+            {"user_id": user_id, "mood": i % 10, "commentary": f"Seeded mood {i}", "date": start + timedelta(hours=i)}
+            for i in range(moods)
+        ])
+        session.commit()
+
+    url = f"/users/{user_id}/moods/?limit={moods}"
+    results = {}
+    bodies = {}
+    for label, enabled in (("default", False), ("fast_json", True)):
+        fast_json.FAST_JSON_LISTS = enabled
+        bodies[label] = client.get(url, headers=headers).content  # warm up
+        begin = time.perf_counter()
+        for _ in range(iterations):
+            response = client.get(url, headers=headers)
+            response.raise_for_status()
+        results[label] = (time.perf_counter() - begin) / iterations
+
+    SQLModel.metadata.drop_all(bind=engine)
+    assert bodies["default"] == bodies["fast_json"], "fast path body differs from the default path"
+    print(f"{'path':>10} {'ms/request':>12} {'rows/s':>12}")
+    for label, elapsed in results.items():
+        print(f"{label:>10} {elapsed * 1000:>12.1f} {moods / elapsed:>12.0f}")
+    print(f"speedup: {results['default'] / results['fast_json']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
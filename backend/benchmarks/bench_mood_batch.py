@@ -0,0 +1,67 @@
+"""
+Per-item vs. batch mood ingestion throughput.
+
+Uploads the same number of moods through the app twice - once as one
+POST /users/{id}/moods/ per mood and once through POST
+/users/{id}/moods/batch - and reports rows per second for each.
+
+Usage (from backend/):
+    python -m benchmarks.bench_mood_batch [moods] [batch_size]
+"""
+import os
+import sys
+import time
+
+# Always a throwaway file: the benchmark drops every table, so it must never see a real DATABASE_URL
+os.environ["DATABASE_URL"] = "sqlite:///./bench.db"
+
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel
+from app.database import engine
+from app.main import app
+
+
+def _login(client: TestClient) -> dict:
+    client.post("/auth/register", json={"name": "Bench", "email": "bench@example.com", "password": "benchpass"})
+    token = client.post("/auth/login", data={"username": "bench@example.com", "password": "benchpass"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _per_item(client: TestClient, headers: dict, user_id: int, moods: int) -> float:
+    start = time.perf_counter()
+    for i in range(moods):
+        response = client.post(f"/users/{user_id}/moods/", json={"mood": i % 10, "commentary": "bench", "user_id": user_id}, headers=headers)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def _batched(client: TestClient, headers: dict, user_id: int, moods: int, batch_size: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, moods, batch_size):
+        items = [{"mood": i % 10, "commentary": "bench"} for i in range(offset, min(offset + batch_size, moods))]
+        response = client.post(f"/users/{user_id}/moods/batch", json={"items": items}, headers=headers)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def main():
+    moods = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    SQLModel.metadata.drop_all(bind=engine)
+
+    with TestClient(app) as client:
+        headers = _login(client)
+        user_id = client.get("/users/", headers=headers).json()[0]["id"]
+
+        print(f"{'mode':>10} {'seconds':>10} {'rows/s':>10}")
+        for mode, run in (
+            ("per-item", lambda: _per_item(client, headers, user_id, moods)),
+            ("batch", lambda: _batched(client, headers, user_id, moods, batch_size)),
+        ):
+            elapsed = run()
+            print(f"{mode:>10} {elapsed:>10.2f} {moods / elapsed:>10.1f}")
+    SQLModel.metadata.drop_all(bind=engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Login throughput vs. password pool size.
+
+Fires a burst of concurrent bcrypt verifications (the CPU-bound part of
+/auth/login) through PasswordHasher at several pool sizes.
+
+Usage (from backend/):
+    python -m benchmarks.bench_password_pool [logins] [sizes...]
+"""
+import asyncio
+import sys
+import time
+from app.services.password_service import PasswordHasher, hash_password
+
+
+async def _burst(hasher: PasswordHasher, hashed: str, logins: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(hasher.verify_async("benchmark-password", hashed) for _ in range(logins)))
+    return time.perf_counter() - start
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    sizes = [int(s) for s in sys.argv[2:]] or [1, 2, 4, 8]
+    hashed = hash_password("benchmark-password")
+
+    print(f"{'pool size':>10} {'seconds':>10} {'logins/s':>10}")
+    for size in sizes:
+        hasher = PasswordHasher(max_workers=size, max_pending=logins)
+        elapsed = asyncio.run(_burst(hasher, hashed, logins))
+        hasher.shutdown()
+        print(f"{size:>10} {elapsed:>10.2f} {logins / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
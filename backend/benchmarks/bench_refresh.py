@@ -0,0 +1,49 @@
+"""
+Token renewal cost: full /auth/login (bcrypt) vs. /auth/refresh (HMAC).
+
+Runs both endpoints in-process through TestClient against a throwaway SQLite
+file (bench.db), whatever DATABASE_URL says.
+
+Usage (from backend/):
+    python -m benchmarks.bench_refresh [iterations]
+"""
+import os
+import sys
+import time
+
+# Always a throwaway file: the benchmark drops every table, so it must never see a real DATABASE_URL
+os.environ["DATABASE_URL"] = "sqlite:///./bench.db"
+
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel
+from app.main import app
+from app.database import engine
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    SQLModel.metadata.drop_all(bind=engine)
+    SQLModel.metadata.create_all(bind=engine)
+    client = TestClient(app)
+    credentials = {"username": "bench@example.com", "password": "benchmark-password"}
+    client.post("/auth/register", json={"email": credentials["username"], "password": credentials["password"], "name": "Bench"})
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        tokens = client.post("/auth/login", data=credentials).json()
+    login_elapsed = time.perf_counter() - start
+
+    refresh_token = tokens["refresh_token"]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        refresh_token = client.post("/auth/refresh", json={"refresh_token": refresh_token}).json()["refresh_token"]
+    refresh_elapsed = time.perf_counter() - start
+
+    SQLModel.metadata.drop_all(bind=engine)
+    print(f"{'path':>8} {'ms/op':>10} {'ops/s':>10}")
+    for name, elapsed in [("login", login_elapsed), ("refresh", refresh_elapsed)]:
+        print(f"{name:>8} {elapsed / iterations * 1000:>10.2f} {iterations / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Worker cold-start cost.
+
+Times `import app.main` and the lifespan startup phase (migrations and
+seeding) in fresh interpreters against a throwaway SQLite database, and
+reports how many SQL statements each phase issued.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = """
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, "before_cursor_execute", lambda *args: statements.append(1))
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+import_statements = len(statements)
+app.main.startup()
+booted = time.perf_counter()
+print(imported - start, import_statements, booted - imported, len(statements) - import_statements)
+"""
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/startup.db")
+            out = subprocess.run(
+                [sys.executable, "-c", PROBE], env=env, cwd=backend_dir, check=True, capture_output=True, text=True
+            ).stdout.split()
+            samples.append([float(value) for value in out])
+
+    import_s, import_sql, boot_s, boot_sql = (statistics.median(column) for column in zip(*samples))
+    print(f"{'phase':>10} {'median ms':>10} {'SQL stmts':>10}")
+    print(f"{'import':>10} {import_s * 1000:>10.1f} {int(import_sql):>10}")
+    print(f"{'startup':>10} {boot_s * 1000:>10.1f} {int(boot_sql):>10}")
+
+
+if __name__ == "__main__":
+    main()
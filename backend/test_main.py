@@ -2,7 +2,6 @@ import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 from app.database import engine
-from app.resources_logic import engine as resources_engine
 from sqlmodel import SQLModel
 
 
@@ -13,10 +12,8 @@ client = TestClient(app)
 def setup_and_teardown_db():
     """Create tables before test and drop after."""
     SQLModel.metadata.create_all(bind=engine)
-    SQLModel.metadata.create_all(bind=resources_engine)
     yield
     SQLModel.metadata.drop_all(bind=engine)
-    SQLModel.metadata.drop_all(bind=resources_engine)
 
 
 @pytest.fixture(scope="function")
@@ -479,3 +476,1692 @@ def test_insights_unauthorized_access(user_token):
     # Try to access another user's insights (user_id 999)
     response = client.get("/users/999/insights/", headers=headers)
     assert response.status_code == 403
+
+
+# ========== TOKEN REVOCATION TESTS ==========
+def test_token_without_user_id_is_rejected(setup_and_teardown_db):
+    from app.auth import create_access_token
+    client.post("/auth/register", json={"email": "legacy@example.com", "password": "pw", "name": "Legacy"})
+    # Email-only tokens predate the id/version claims and are no longer accepted
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': 'legacy@example.com'})}"}
+    response = client.get("/users/", headers=headers)
+    assert response.status_code == 401
+
+
+def test_user_cache_invalidated_on_update(user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    update_payload = {
+        "name": "Renamed User",
+        "email": "renamed@example.com",
+        "password": "newpassword123"
+    }
+    response = client.put(f"/users/{user_id}", json=update_payload, headers=headers)
+    assert response.status_code == 200
+    # The update bumped the token version, so the old token is revoked
+    response = client.get("/users/", headers=headers)
+    assert response.status_code == 401
+
+
+def test_user_cache_invalidated_on_delete(user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    response = client.delete(f"/users/{user_id}", headers=headers)
+    assert response.status_code == 200
+    response = client.get("/users/", headers=headers)
+    assert response.status_code == 401
+
+
+def test_internal_endpoints_disabled_by_default(monkeypatch):
+    from app.routes import internal
+    for path in ["/internal/cache/users", "/internal/cache/token-versions", "/internal/db/pool", "/internal/db/replicas"]:
+        assert client.get(path).status_code == 404
+    monkeypatch.setattr(internal, "INTERNAL_ENDPOINTS_ENABLED", True)
+    assert client.get("/internal/db/replicas").status_code == 200
+
+
+def test_user_cache_stats(user_token, monkeypatch):
+    from app.routes import internal
+    monkeypatch.setattr(internal, "INTERNAL_ENDPOINTS_ENABLED", True)
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.get("/users/", headers=headers)
+    hits_before = client.get("/internal/cache/users").json()["hits"]
+    client.get("/users/", headers=headers)
+    response = client.get("/internal/cache/users")
+    assert response.status_code == 200
+    assert {"hits", "misses", "size", "hit_ratio"} <= response.json().keys()
+    assert response.json()["hits"] == hits_before + 1
+    response = client.get("/internal/cache/token-versions")
+    assert response.status_code == 200
+    assert response.json()["size"] >= 1
+
+
+# ========== PASSWORD POOL TESTS ==========
+def test_password_pool_rejects_when_saturated():
+    import asyncio
+    from app.services.password_service import PasswordHasher, PasswordPoolSaturated, hash_password
+
+    hashed = hash_password("secret")
+    hasher = PasswordHasher(max_workers=1, max_pending=0)
+
+    async def burst():
+        return await asyncio.gather(
+            hasher.verify_async("secret", hashed),
+            hasher.verify_async("secret", hashed),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(burst())
+    hasher.shutdown()
+    assert results[0] is True
+    assert isinstance(results[1], PasswordPoolSaturated)
+    assert hasher.in_flight == 0
+
+
+def test_login_returns_503_when_password_pool_saturated(setup_and_teardown_db, monkeypatch):
+    from app.services.password_service import password_hasher, PasswordPoolSaturated
+
+    client.post("/auth/register", json={"email": "busy@example.com", "password": "pw", "name": "Busy"})
+
+    async def saturated(*args, **kwargs):
+        raise PasswordPoolSaturated()
+
+    monkeypatch.setattr(password_hasher, "verify_async", saturated)
+    response = client.post("/auth/login", data={"username": "busy@example.com", "password": "pw"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_login_rejects_wrong_password(setup_and_teardown_db):
+    client.post("/auth/register", json={"email": "wrongpw@example.com", "password": "right", "name": "Wrong"})
+    response = client.post("/auth/login", data={"username": "wrongpw@example.com", "password": "wrong"})
+    assert response.status_code == 401
+
+
+# ========== TOKEN CLAIMS TESTS ==========
+def test_token_carries_user_id_and_version(user_token):
+    from jose import jwt
+    from app.auth import SECRET_KEY, ALGORITHM
+    claims = jwt.decode(user_token, SECRET_KEY, algorithms=[ALGORITHM])
+    assert claims["sub"] == "testuser@example.com"
+    assert isinstance(claims["uid"], int)
+    assert claims["ver"] == 0
+
+
+def test_authorized_request_skips_user_lookup(user_token):
+    from sqlalchemy import event
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    from app.database import async_engine
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = client.get(f"/users/{user_id}/moods/", headers=headers)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    assert statements
+    assert not any('FROM "user"' in s or "FROM user" in s for s in statements)
+
+
+def test_token_revoked_after_password_change(user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    update_payload = {"name": "Test User", "email": "testuser@example.com", "password": "changed"}
+    response = client.put(f"/users/{user_id}", json=update_payload, headers=headers)
+    assert response.status_code == 200
+    assert client.get("/users/", headers=headers).status_code == 401
+
+    login_payload = {"username": "testuser@example.com", "password": "changed"}
+    new_token = client.post("/auth/login", data=login_payload).json()["access_token"]
+    response = client.get("/users/", headers={"Authorization": f"Bearer {new_token}"})
+    assert response.status_code == 200
+
+
+def test_token_revocation_survives_version_cache_expiry(user_token):
+    from app.auth import token_versions
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    update_payload = {"name": "Test User", "email": "testuser@example.com", "password": "changed"}
+    client.put(f"/users/{user_id}", json=update_payload, headers=headers)
+    # Another worker without the in-memory entry falls back to the persisted version
+    token_versions.clear()
+    assert client.get("/users/", headers=headers).status_code == 401
+
+
+# ========== REFRESH TOKEN TESTS ==========
+def _login_tokens(email="refresh@example.com", password="pw"):
+    client.post("/auth/register", json={"email": email, "password": password, "name": "Refresh"})
+    return client.post("/auth/login", data={"username": email, "password": password}).json()
+
+
+def test_refresh_issues_new_tokens(setup_and_teardown_db):
+    tokens = _login_tokens()
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    refreshed = response.json()
+    assert refreshed["refresh_token"] != tokens["refresh_token"]
+    headers = {"Authorization": f"Bearer {refreshed['access_token']}"}
+    assert client.get("/users/", headers=headers).status_code == 200
+
+
+def test_refresh_token_reuse_revokes_family(setup_and_teardown_db):
+    tokens = _login_tokens()
+    rotated = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+    # Replaying the rotated token is rejected and kills the token that replaced it
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+    response = client.post("/auth/refresh", json={"refresh_token": rotated["refresh_token"]})
+    assert response.status_code == 401
+
+
+def test_refresh_rejects_tampered_token(setup_and_teardown_db):
+    tokens = _login_tokens()
+    token_id = tokens["refresh_token"].split(".")[0]
+    for bad in [f"{token_id}.forged", "garbage", "", "².x", "9" * 30 + ".x"]:
+        response = client.post("/auth/refresh", json={"refresh_token": bad})
+        assert response.status_code == 401
+
+
+def test_refresh_rejected_after_password_change(setup_and_teardown_db):
+    tokens = _login_tokens()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    update_payload = {"name": "Refresh", "email": "refresh@example.com", "password": "changed"}
+    client.put(f"/users/{user_id}", json=update_payload, headers=headers)
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+
+def test_refresh_prunes_expired_and_stale_tokens(setup_and_teardown_db):
+    from datetime import datetime, timedelta
+    from sqlmodel import Session, select
+    from app import models
+    tokens = _login_tokens()
+    token_id = int(tokens["refresh_token"].split(".")[0])
+    with Session(engine) as session:
+        user_id = session.get(models.RefreshToken, token_id).user_id
+        expired = models.RefreshToken(user_id=user_id, token_hash="x", token_version=0, expires_at=datetime.utcnow() - timedelta(days=1))
+        stale = models.RefreshToken(user_id=user_id, token_hash="y", token_version=-1, expires_at=datetime.utcnow() + timedelta(days=1))
+        session.add_all([expired, stale])
+        session.commit()
+
+    rotated = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+    with Session(engine) as session:
+        rows = session.exec(select(models.RefreshToken).where(models.RefreshToken.user_id == user_id)).all()
+    # The rotated token is kept (revoked) for reuse detection; the expired and stale rows are gone
+    assert sorted((row.id, row.revoked) for row in rows) == [
+        (token_id, True),
+        (int(rotated["refresh_token"].split(".")[0]), False),
+    ]
+
+
+# ========== DATABASE PROFILE TESTS ==========
+def test_engine_options_profile(monkeypatch):
+    from app import database
+    monkeypatch.setattr(database, "DB_STATEMENT_TIMEOUT_MS", 5000)
+    options = database.engine_options("postgresql://u:p@localhost/calmly")
+    assert options["echo"] is False
+    assert options["poolclass"] is database.InstrumentedQueuePool
+    assert options["pool_size"] == database.DB_POOL_SIZE
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"] == {"options": "-c statement_timeout=5000"}
+
+    memory_options = database.engine_options("sqlite://")
+    assert "poolclass" not in memory_options
+    assert "connect_args" not in database.engine_options("sqlite:///./other.db")
+
+    async_options = database.async_engine_options("postgresql://u:p@localhost/calmly")
+    assert async_options["poolclass"] is database.InstrumentedAsyncQueuePool
+    assert async_options["pool_size"] == database.DB_POOL_SIZE
+    assert async_options["connect_args"] == {"server_settings": {"statement_timeout": "5000"}}
+    assert database.async_engine_options("sqlite:///./other.db")["poolclass"] is database.InstrumentedNullPool
+
+
+def test_db_pool_stats(user_token, monkeypatch):
+    from app.routes import internal
+    monkeypatch.setattr(internal, "INTERNAL_ENDPOINTS_ENABLED", True)
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    client.get(f"/users/{user_id}/moods/", headers=headers)
+    response = client.get("/internal/db/pool")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["pool_class"] == "InstrumentedQueuePool"
+    assert stats["checkouts"] > 0
+    assert {"checked_out", "overflow", "max_wait_seconds", "avg_wait_seconds"} <= stats.keys()
+    # The async routes check out from the async engine's pool (a NullPool for SQLite)
+    assert stats["async"]["pool_class"] == "InstrumentedNullPool"
+    assert stats["async"]["checkouts"] > 0
+    assert {"max_wait_seconds", "avg_wait_seconds"} <= stats["async"].keys()
+
+
+# ========== ASYNC SESSION TESTS ==========
+def test_async_database_url():
+    from app.database import async_database_url
+    assert async_database_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+    assert async_database_url("postgresql://u:p@localhost:5432/calmly") == "postgresql+asyncpg://u:p@localhost:5432/calmly"
+    assert async_database_url("postgresql+psycopg2://u:p@db/calmly") == "postgresql+asyncpg://u:p@db/calmly"
+    with pytest.raises(ValueError):
+        async_database_url("mysql://u:p@db/calmly")
+
+
+def test_async_crud_round_trip(user_token):
+    import asyncio
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    from app import async_crud, schemas
+    from app.database import async_engine
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+
+    async def round_trip():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            mood = await async_crud.create_mood(
+                user_id, session, schemas.MoodCreate(mood=6, commentary="async", user_id=user_id)
+            )
+            moods = await async_crud.get_all_moods_by_user(session, user_id)
+            deleted = await async_crud.delete_mood(session, user_id, mood.id)
+            return mood, moods, deleted
+
+    mood, moods, deleted = asyncio.run(round_trip())
+    assert mood.id is not None
+    assert [m.id for m in moods] == [mood.id]
+    assert deleted.id == mood.id
+
+
+def test_async_routes_authenticate_without_sync_session(user_token):
+    from app import auth, database
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    auth.token_versions.clear()  # force the token version lookup through the async session
+
+    def no_sync_session():
+        raise AssertionError("async route opened a sync session")
+        yield
+
+    app.dependency_overrides[database.get_session] = no_sync_session
+    try:
+        created = client.post(f"/users/{user_id}/moods/", json={"mood": 5, "commentary": "async auth", "user_id": user_id}, headers=headers)
+        listed = client.get(f"/users/{user_id}/moods/", headers=headers)
+        rejected = client.get(f"/users/{user_id}/moods/", headers={"Authorization": "Bearer not-a-token"})
+    finally:
+        app.dependency_overrides.pop(database.get_session)
+    assert created.status_code == 200
+    assert [m["id"] for m in listed.json()] == [created.json()["id"]]
+    assert rejected.status_code == 401
+
+
+def test_backend_without_async_driver_degrades(user_token, monkeypatch):
+    from app import database
+    assert database.create_async_engine_for("mysql://u:p@db/calmly") is None
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+
+    monkeypatch.setattr(database, "async_engine", None)
+    assert client.get(f"/users/{user_id}", headers=headers).status_code == 200
+    response = client.get(f"/users/{user_id}/moods/", headers=headers)
+    assert response.status_code == 503
+
+
+# ========== READ REPLICA TESTS ==========
+def _replica_url(tmp_path, name):
+    url = f"sqlite:///{tmp_path / name}"
+    from sqlmodel import create_engine as _create_engine
+    replica_engine = _create_engine(url)
+    SQLModel.metadata.create_all(bind=replica_engine)
+    replica_engine.dispose()
+    return url
+
+
+def test_replica_router_round_robin(tmp_path):
+    from app.database import ReplicaRouter
+    router = ReplicaRouter([_replica_url(tmp_path, "r1.db"), _replica_url(tmp_path, "r2.db")])
+    picked = [router.pick().url for _ in range(4)]
+    assert picked[0] != picked[1]
+    assert picked[0] == picked[2] and picked[1] == picked[3]
+
+
+def test_replica_router_skips_unhealthy(tmp_path):
+    from app.database import ReplicaRouter
+    healthy = _replica_url(tmp_path, "healthy.db")
+    router = ReplicaRouter([f"sqlite:///{tmp_path}/missing/dir/down.db", healthy])
+    assert all(router.pick().url == healthy for _ in range(3))
+    assert [r["healthy"] for r in router.status()] == [False, True]
+
+    down_only = ReplicaRouter([f"sqlite:///{tmp_path}/missing/dir/down.db"])
+    assert down_only.pick() is None
+
+
+def test_get_routes_read_from_replica(user_token, tmp_path, monkeypatch):
+    from sqlmodel import Session as _Session
+    from app import database, models
+    from app.database import ReplicaRouter
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+
+    replica_url = _replica_url(tmp_path, "replica.db")
+    router = ReplicaRouter([replica_url])
+    with _Session(router.replicas[0].engine) as replica_session:
+        replica_session.add(models.Mood(mood=3, commentary="only on replica", user_id=user_id))
+        replica_session.commit()
+    monkeypatch.setattr(database, "replica_router", router)
+    database.recent_writers.clear()
+
+    moods = client.get(f"/users/{user_id}/moods/", headers=headers).json()
+    assert [m["commentary"] for m in moods] == ["only on replica"]
+
+    # Writes go to the primary, and the writer's next reads stick to the primary
+    mood_payload = {"mood": 8, "commentary": "on primary", "user_id": user_id}
+    assert client.post(f"/users/{user_id}/moods/", json=mood_payload, headers=headers).status_code == 200
+    moods = client.get(f"/users/{user_id}/moods/", headers=headers).json()
+    assert [m["commentary"] for m in moods] == ["on primary"]
+    database.recent_writers.clear()
+
+
+# ========== INDEX AND MIGRATION TESTS ==========
+def _query_plan(statement):
+    if engine.dialect.name != "sqlite":
+        pytest.skip("EXPLAIN QUERY PLAN checks are SQLite specific")
+    compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").all()
+    return " | ".join(row[-1] for row in rows)
+
+
+def test_hot_queries_use_indexes(setup_and_teardown_db):
+    from datetime import datetime, timedelta
+    from sqlmodel import select
+    from app import models
+
+    since = datetime.utcnow() - timedelta(days=30)
+    plans = {
+        "ix_mood_user_id_date": select(models.Mood).where(
+            models.Mood.user_id == 1, models.Mood.date >= since
+        ).order_by(models.Mood.date),
+        "ix_journal_mood_id": select(models.Journal).where(models.Journal.mood_id == 1),
+        "ix_gamesession_user_id_date": select(models.GameSession).where(
+            models.GameSession.user_id == 1
+        ).order_by(models.GameSession.date.desc(), models.GameSession.id.desc()),
+        "ix_gamesession_user_id_game_type_date": select(models.GameSession).where(
+            models.GameSession.user_id == 1, models.GameSession.game_type == "breathing", models.GameSession.date >= since
+        ).order_by(models.GameSession.date.desc(), models.GameSession.id.desc()),
+        "ix_user_email": select(models.User).where(models.User.email == "a@example.com"),
+        "sqlite_autoindex_aiinsights": select(models.AIInsights).where(models.AIInsights.user_id == 1),
+    }
+    for index_name, statement in plans.items():
+        plan = _query_plan(statement)
+        assert "SCAN" not in plan.replace("SCAN CONSTANT ROW", ""), plan
+        assert index_name in plan, plan
+
+    journal_plan = _query_plan(select(models.Journal).where(models.Journal.mood_id.in_([1, 2, 3])))
+    assert "ix_journal_mood_id" in journal_plan
+
+
+def test_migrations_upgrade_old_schema(tmp_path):
+    from sqlalchemy import inspect
+    from sqlmodel import create_engine as _create_engine
+    from app import migrations
+
+    old_engine = _create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with old_engine.begin() as conn:
+        # Shape of the user table before token versions and indexes existed
+        conn.exec_driver_sql(
+            'CREATE TABLE "user" (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, '
+            'email VARCHAR NOT NULL, password VARCHAR NOT NULL)'
+        )
+        conn.exec_driver_sql(
+            'CREATE TABLE mood (id INTEGER PRIMARY KEY, date DATETIME NOT NULL, mood INTEGER NOT NULL, '
+            'commentary VARCHAR NOT NULL, user_id INTEGER NOT NULL REFERENCES "user" (id))'
+        )
+        conn.exec_driver_sql("INSERT INTO \"user\" (name, email, password) VALUES ('Old', 'old@example.com', 'x')")
+        conn.exec_driver_sql(
+            "INSERT INTO mood (date, mood, commentary, user_id) VALUES "
+            "('2024-05-01 08:00:00.000000', 4, '', 1), ('2024-05-01 21:00:00.000000', 8, '', 1)"
+        )
+
+    assert migrations.upgrade(old_engine) == [1, 2, 3, 4, 5, 6, 7, 8]
+    inspector = inspect(old_engine)
+    assert "token_version" in {c["name"] for c in inspector.get_columns("user")}
+    assert "ix_mood_user_id_date" in {i["name"] for i in inspector.get_indexes("mood")}
+    assert "ix_mood_user_id_updated_at" in {i["name"] for i in inspector.get_indexes("mood")}
+    assert "updated_at" in {c["name"] for c in inspector.get_columns("mood")}
+    assert "ix_user_email" in {i["name"] for i in inspector.get_indexes("user")}
+    with old_engine.connect() as conn:
+        assert conn.exec_driver_sql('SELECT token_version FROM "user"').scalar() == 0
+        # Existing moods are backfilled into the rollup
+        rollup = conn.exec_driver_sql(
+            "SELECT user_id, day, mood_count, mood_sum, mood_min, mood_max, mood_sum_squares FROM daily_mood_rollup"
+        ).all()
+        assert [tuple(row) for row in rollup] == [(1, "2024-05-01", 2, 12, 4, 8, 80)]
+
+    # Re-running is a no-op
+    assert migrations.upgrade(old_engine) == []
+    old_engine.dispose()
+
+
+def _schema(engine_):
+    from sqlalchemy import inspect
+    inspector = inspect(engine_)
+    return {
+        table: {
+            "columns": {c["name"]: (str(c["type"]), c["nullable"]) for c in inspector.get_columns(table)},
+            "indexes": {i["name"]: (tuple(i["column_names"]), bool(i["unique"])) for i in inspector.get_indexes(table)},
+            "unique": sorted(tuple(u["column_names"]) for u in inspector.get_unique_constraints(table)),
+            "foreign_keys": sorted((tuple(f["constrained_columns"]), f["referred_table"]) for f in inspector.get_foreign_keys(table)),
+            "primary_key": inspector.get_pk_constraint(table)["constrained_columns"],
+        }
+        for table in inspector.get_table_names()
+        if table != "schema_migrations"
+    }
+
+
+def test_migrations_build_the_model_schema(tmp_path):
+    from sqlmodel import create_engine as _create_engine
+    from app import migrations
+
+    migrated = _create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    created = _create_engine(f"sqlite:///{tmp_path / 'created.db'}")
+    migrations.upgrade(migrated)
+    SQLModel.metadata.create_all(bind=created)
+    # The frozen migrations, applied in order, end at exactly the schema the models describe
+    assert _schema(migrated) == _schema(created)
+    migrated.dispose()
+    created.dispose()
+
+
+def test_updated_at_migration_uses_dialect_types(monkeypatch):
+    from types import SimpleNamespace
+    from sqlalchemy.dialects import postgresql
+    from app import migrations
+    added = []
+    monkeypatch.setattr(migrations, "_add_column_if_missing", lambda conn, table, column, ddl: added.append(ddl))
+    monkeypatch.setattr(migrations, "_create_index", lambda *args, **kwargs: None)
+    migrations._updated_at_columns(SimpleNamespace(dialect=postgresql.dialect()))
+    # PostgreSQL has no DATETIME type
+    assert added == ["updated_at TIMESTAMP WITHOUT TIME ZONE"] * 2
+
+
+# ========== STARTUP TESTS ==========
+def test_import_does_no_database_work(tmp_path):
+    import os
+    import subprocess
+    import sys
+    db_file = tmp_path / "untouched.db"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_file}")
+    subprocess.run([sys.executable, "-c", "import app.main"], check=True, env=env, cwd=os.path.dirname(__file__))
+    # SQLite creates the file on first connect, so it must not exist after a bare import
+    assert not db_file.exists()
+
+
+def test_lifespan_migrates_and_seeds_once(tmp_path, monkeypatch):
+    from sqlmodel import Session as _Session, create_engine as _create_engine, select
+    from app import main, migrations, models, resources_logic
+
+    boot_engine = _create_engine(f"sqlite:///{tmp_path / 'boot.db'}")
+    monkeypatch.setattr(main, "engine", boot_engine)
+    monkeypatch.setattr(main, "init_session", lambda: migrations.upgrade(boot_engine))
+    with TestClient(main.app):
+        pass
+    with TestClient(main.app):
+        pass
+    with _Session(boot_engine) as session:
+        titles = session.exec(select(models.Resource.title)).all()
+    assert sorted(titles) == sorted(data["title"] for data in resources_logic.SEED_DATA)
+    boot_engine.dispose()
+
+
+def test_gemini_sdk_not_imported_at_boot():
+    import os
+    import subprocess
+    import sys
+    probe = "import sys, app.main; assert 'google.generativeai' not in sys.modules"
+    subprocess.run([sys.executable, "-c", probe], check=True, cwd=os.path.dirname(__file__))
+
+
+def test_bootprofile_reports_imports_and_init(setup_and_teardown_db):
+    from app import bootprofile
+    imports = dict(bootprofile.profile_imports(["app.cache", "app.database"]))
+    assert all(seconds >= 0 for seconds in imports.values())
+    init_steps = [name for name, _ in bootprofile.profile_init()]
+    assert init_steps == ["migrations (init_session)", "seed resources"]
+
+
+# ========== BULK MOOD TESTS ==========
+def test_create_moods_batch(user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    items = [
+        {"mood": 4, "commentary": "offline 1", "date": "2026-01-01T08:00:00Z"},
+        {"mood": 6, "commentary": "offline 2", "date": "2026-01-01T20:00:00+02:00"},
+        {"mood": 8, "commentary": "no timestamp"},
+    ]
+    response = client.post(f"/users/{user_id}/moods/batch", json={"items": items}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 3
+    assert body["ids"] == sorted(body["ids"])
+
+    moods = {m["id"]: m for m in client.get(f"/users/{user_id}/moods/", headers=headers).json()}
+    assert [moods[i]["commentary"] for i in body["ids"]] == ["offline 1", "offline 2", "no timestamp"]
+    assert moods[body["ids"][0]]["date"].startswith("2026-01-01T08:00:00")
+    # Client timestamps are normalised to naive UTC like server-side dates
+    assert moods[body["ids"][1]]["date"].startswith("2026-01-01T18:00:00")
+
+
+def test_create_moods_batch_validation(user_token):
+    from app.schemas import MOOD_BATCH_MAX_ITEMS
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    url = f"/users/{user_id}/moods/batch"
+
+    assert client.post(url, json={"items": []}, headers=headers).status_code == 422
+    too_many = [{"mood": 5, "commentary": "x"}] * (MOOD_BATCH_MAX_ITEMS + 1)
+    assert client.post(url, json={"items": too_many}, headers=headers).status_code == 422
+    invalid = [{"mood": 5, "commentary": "ok"}, {"mood": "bad", "commentary": "x"}]
+    assert client.post(url, json={"items": invalid}, headers=headers).status_code == 422
+    # Nothing from the rejected batches was written
+    assert client.get(f"/users/{user_id}/moods/", headers=headers).json() == []
+
+    other_user = [{"mood": 5, "commentary": "x", "user_id": user_id + 1}]
+    assert client.post(url, json={"items": other_user}, headers=headers).status_code == 403
+    assert client.post(f"/users/{user_id + 1}/moods/batch", json={"items": [{"mood": 5, "commentary": "x"}]}, headers=headers).status_code == 403
+
+
+# ========== JOURNAL IMPORT TESTS ==========
+def test_import_journals_ndjson_streams_in_chunks(user_token, monkeypatch):
+    import json
+    from app.services import journal_import
+    monkeypatch.setattr(journal_import, "JOURNAL_IMPORT_CHUNK_SIZE", 2)
+    headers = {"Authorization": f"Bearer {user_token}", "Content-Type": "application/x-ndjson"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    lines = [
+        json.dumps({"mood": 7, "commentary": "sunny", "title": "Day 1", "content": "Walked", "date": "2024-03-01T09:00:00Z"}),
+        json.dumps({"mood": 3, "title": "Day 2", "content": "Tired"}),
+        "{not json",
+        "",
+        json.dumps({"mood": "high", "title": "Day 3", "content": "?"}),
+        json.dumps(["not", "an", "object"]),
+        json.dumps({"mood": 5, "title": "Day 4", "content": "Ok"}),
+    ]
+
+    def body():
+        # Split mid-line to exercise the incremental line splitter
+        data = ("\n".join(lines) + "\n").encode()
+        for i in range(0, len(data), 7):
+            yield data[i:i + 7]
+
+    response = client.post(f"/users/{user_id}/journals/import", content=body(), headers=headers)
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["processed"] == 6
+    assert summary["imported"] == 3
+    assert summary["failed"] == 3
+    assert summary["chunks"] == 2
+    assert [e["line"] for e in summary["errors"]] == [3, 5, 6]
+    assert "mood" in summary["errors"][1]["error"]
+    assert summary["errors_truncated"] is False
+
+    moods = client.get(f"/users/{user_id}/moods/", headers=headers).json()
+    assert sorted(m["commentary"] for m in moods) == ["", "", "sunny"]
+    first = next(m for m in moods if m["commentary"] == "sunny")
+    assert first["date"].startswith("2024-03-01T09:00:00")
+    journals = client.get(f"/users/{user_id}/moods/{first['id']}/journals/", headers=headers).json()
+    assert [(j["title"], j["content"]) for j in journals] == [("Day 1", "Walked")]
+    assert journals[0]["date"] == first["date"]
+
+
+def test_import_journals_csv_with_quoted_newlines(user_token):
+    headers = {"Authorization": f"Bearer {user_token}", "Content-Type": "text/csv"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    body = (
+        "\ufeffdate,mood,commentary,title,content\r\n"
+        '2024-01-02T10:00:00,6,,Morning,"Line one\nline two, with comma"\r\n'
+        "2024-01-03T10:00:00,oops,,Bad,Row\r\n"
+        "2024-01-04T10:00:00,8,great,Evening,Calm\r\n"
+        "only,three,columns\r\n"
+    ).encode("utf-8")
+    response = client.post(f"/users/{user_id}/journals/import", content=body, headers=headers)
+    assert response.status_code == 200
+    summary = response.json()
+    assert (summary["processed"], summary["imported"], summary["failed"]) == (4, 2, 2)
+    assert [e["line"] for e in summary["errors"]] == [4, 6]
+
+    moods = sorted(client.get(f"/users/{user_id}/moods/", headers=headers).json(), key=lambda m: m["date"])
+    journals = client.get(f"/users/{user_id}/moods/{moods[0]['id']}/journals/", headers=headers).json()
+    assert journals[0]["content"] == "Line one\nline two, with comma"
+
+
+def test_import_journals_caps_errors_and_oversized_lines(user_token, monkeypatch):
+    from app.services import journal_import
+    monkeypatch.setattr(journal_import, "JOURNAL_IMPORT_MAX_LINE_BYTES", 64)
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+
+    response = client.post(f"/users/{user_id}/journals/import?format=ndjson", content=b"x\n" * 150, headers=headers)
+    summary = response.json()
+    assert summary["failed"] == 150
+    assert len(summary["errors"]) == journal_import.MAX_REPORTED_ERRORS
+    assert summary["errors_truncated"] is True
+
+    async def lines():
+        async def chunks():
+            yield b'{"mood": 1, "title": "a", "content": "' + b"z" * 100
+            yield b'"}\n{"mood": 2, "title": "b", "content": "c"}'
+        return [item async for item in journal_import.iter_lines(chunks(), max_line_bytes=64)]
+
+    import asyncio
+    assert asyncio.run(lines()) == [(1, None), (2, b'{"mood": 2, "title": "b", "content": "c"}')]
+
+
+def test_import_journals_requires_owner(user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    response = client.post(f"/users/{user_id + 1}/journals/import", content=b"", headers=headers)
+    assert response.status_code == 403
+
+
+# ========== PAGINATION TESTS ==========
+def _walk_pages(url, headers, **params):
+    pages, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        response = client.get(url, params=query, headers=headers)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+def test_moods_keyset_pagination(user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    # Several moods share a timestamp, so ties must be broken by id
+    items = [{"mood": i % 10, "commentary": str(i), "date": f"2024-01-{1 + i // 3:02d}T12:00:00"} for i in range(25)]
+    ids = client.post(f"/users/{user_id}/moods/batch", json={"items": items}, headers=headers).json()["ids"]
+
+    pages = _walk_pages(f"/users/{user_id}/moods/", headers, limit=10)
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [m["id"] for page in pages for m in page] == ids[::-1]
+
+    pages = _walk_pages(f"/users/{user_id}/moods/", headers, limit=7, direction="asc")
+    assert [m["id"] for page in pages for m in page] == ids
+
+    # A page that ends exactly at the last row has no next cursor
+    response = client.get(f"/users/{user_id}/moods/", params={"limit": 25}, headers=headers)
+    assert len(response.json()) == 25
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_pagination_rejects_bad_parameters(user_token):
+    from app.pagination import MAX_PAGE_SIZE, encode_cursor
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    url = f"/users/{user_id}/moods/"
+
+    assert client.get(url, params={"limit": 0}, headers=headers).status_code == 422
+    assert client.get(url, params={"limit": MAX_PAGE_SIZE + 1}, headers=headers).status_code == 422
+    assert client.get(url, params={"direction": "sideways"}, headers=headers).status_code == 422
+    assert client.get(url, params={"cursor": "not-a-cursor!"}, headers=headers).status_code == 400
+    # Well-formed, but keyed for a different list
+    assert client.get(url, params={"cursor": encode_cursor([5])}, headers=headers).status_code == 400
+    assert client.get(url, params={"cursor": encode_cursor(["yesterday", 5])}, headers=headers).status_code == 400
+    # Ids that don't fit the id column
+    assert client.get(url, params={"cursor": encode_cursor(["2024-01-01T00:00:00", 10**30])}, headers=headers).status_code == 400
+    assert client.get(url, params={"cursor": encode_cursor(["2024-01-01T00:00:00", 2**31])}, headers=headers).status_code == 400
+    assert client.get(url, params={"cursor": encode_cursor(["2024-01-01T00:00:00", 2**31 - 1])}, headers=headers).status_code == 200
+
+
+def test_users_and_games_pagination(user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    for i in range(3):
+        client.post("/auth/register", json={"name": f"Pager {i}", "email": f"pager{i}@example.com", "password": "pw"})
+    users = [u for page in _walk_pages("/users/", headers, limit=2) for u in page]
+    assert len(users) == 4
+    assert [u["id"] for u in users] == sorted(u["id"] for u in users)
+
+    user_id = users[0]["id"]
+    for score in range(5):
+        payload = {"game_type": "breathing", "score": score, "duration_seconds": 60, "completed": True, "user_id": user_id}
+        client.post(f"/users/{user_id}/games/", json=payload, headers=headers)
+    pages = _walk_pages(f"/users/{user_id}/games/", headers, limit=2)
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [g["score"] for page in pages for g in page] == [4, 3, 2, 1, 0]
+
+
+def test_keyset_page_uses_owner_date_index(setup_and_teardown_db):
+    from datetime import datetime
+    from sqlmodel import Session, select
+    from app import crud, models, pagination
+    if engine.dialect.name != "sqlite":
+        pytest.skip("query plan check is SQLite-specific")
+
+    statement = select(models.Mood).where(models.Mood.user_id == 1).where(
+        pagination._after(crud.MOOD_PAGE_KEY, (datetime(2024, 1, 1), 5), True)
+    ).order_by(models.Mood.date.desc(), models.Mood.id.desc()).limit(11)
+    sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    with Session(engine) as session:
+        plan = " ".join(row[-1] for row in session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + sql))
+    assert "ix_mood_user_id_date" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+# ========== LISTING FILTER TESTS ==========
+def _seed_history(user_id, days=730, per_day=12):
+    """Two years of moods and game sessions for one user, plus noise rows for another user."""
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from sqlmodel import Session
+    from app import models
+
+    with Session(engine) as session:
+        other = models.User(name="Noise", email="noise@example.com", password="x")
+        session.add(other)
+        session.commit()
+        other_id = other.id
+
+    start = datetime(2023, 1, 1)
+    moods = [
+        {"user_id": owner, "mood": (day * 7 + i) % 10 + 1, "commentary": "", "date": start + timedelta(days=day, hours=i * 2)}
+        for owner in (user_id, other_id)
+        for day in range(days)
+        for i in range(per_day)
+    ]
+    games = [
+        {"user_id": user_id, "game_type": ("breathing", "matching", "memory")[day % 3], "score": day, "completed": True,
+         "date": start + timedelta(days=day, hours=9)}
+        for day in range(days)
+    ]
+    with Session(engine) as session:
+        session.exec(insert(models.Mood), params=moods)
+        session.exec(insert(models.GameSession), params=games)
+        session.commit()
+    return moods, games
+
+
+def test_mood_filters_on_large_history(user_token):
+    from datetime import datetime
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    moods, _ = _seed_history(user_id)
+
+    since, until = datetime(2024, 6, 1), datetime(2024, 6, 8)
+    expected = sorted(
+        (m for m in moods if m["user_id"] == user_id and since <= m["date"] < until and 3 <= m["mood"] <= 6),
+        key=lambda m: m["date"], reverse=True,
+    )
+    params = {"since": since.isoformat(), "until": until.isoformat(), "min_mood": 3, "max_mood": 6, "limit": 500}
+    response = client.get(f"/users/{user_id}/moods/", params=params, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body) == len(expected) > 0
+    assert [m["date"] for m in body] == [m["date"].isoformat() for m in expected]
+    assert all(3 <= m["mood"] <= 6 and m["user_id"] == user_id for m in body)
+
+    # Filters compose with pagination: walking the pages yields the same rows
+    pages = _walk_pages(f"/users/{user_id}/moods/", headers, **dict(params, limit=9))
+    assert [m["id"] for page in pages for m in page] == [m["id"] for m in body]
+
+    # Timezone-aware bounds are compared in UTC
+    aware = client.get(f"/users/{user_id}/moods/", params={
+        "since": "2024-06-01T02:00:00+02:00", "until": "2024-06-08T02:00:00+02:00", "min_mood": 3, "max_mood": 6, "limit": 500,
+    }, headers=headers).json()
+    assert [m["id"] for m in aware] == [m["id"] for m in body]
+
+    # One aware and one naive bound: both are UTC
+    mixed = client.get(f"/users/{user_id}/moods/", params={
+        "since": "2024-06-01T02:00:00+02:00", "until": "2024-06-08T00:00:00", "min_mood": 3, "max_mood": 6, "limit": 500,
+    }, headers=headers)
+    assert mixed.status_code == 200
+    assert [m["id"] for m in mixed.json()] == [m["id"] for m in body]
+
+
+def test_game_session_filters_on_large_history(user_token):
+    from datetime import datetime
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    _, games = _seed_history(user_id, per_day=1)
+
+    since = datetime(2024, 1, 1)
+    expected = [g["score"] for g in sorted(games, key=lambda g: g["date"], reverse=True)
+                if g["game_type"] == "memory" and g["date"] >= since]
+    response = client.get(f"/users/{user_id}/games/", params={"game_type": "memory", "since": since.isoformat(), "limit": 500}, headers=headers)
+    assert response.status_code == 200
+    assert [g["score"] for g in response.json()] == expected
+
+    response = client.get(f"/users/{user_id}/games/", params={"game_type": "unknown"}, headers=headers)
+    assert response.json() == []
+
+
+def test_listing_filters_validation(user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    url = f"/users/{user_id}/moods/"
+    assert client.get(url, params={"min_mood": 8, "max_mood": 2}, headers=headers).status_code == 422
+    assert client.get(url, params={"min_mood": 10**30}, headers=headers).status_code == 422
+    assert client.get(url, params={"max_mood": -(10**30)}, headers=headers).status_code == 422
+    assert client.get(url, params={"since": "2024-02-01", "until": "2024-01-01"}, headers=headers).status_code == 422
+    assert client.get(url, params={"since": "last week"}, headers=headers).status_code == 422
+    assert client.get(f"/users/{user_id}/games/", params={"since": "2024-02-01", "until": "2024-02-01"}, headers=headers).status_code == 422
+    # Mixed naive and aware bounds are compared in UTC rather than failing
+    games_url = f"/users/{user_id}/games/"
+    assert client.get(games_url, params={"since": "2024-01-01T00:00:00Z", "until": "2024-02-01T00:00:00"}, headers=headers).status_code == 200
+    assert client.get(url, params={"since": "2024-01-01T00:30:00+01:00", "until": "2024-01-01T00:00:00"}, headers=headers).status_code == 200
+    assert client.get(url, params={"since": "2024-01-01T02:00:00+01:00", "until": "2024-01-01T00:00:00"}, headers=headers).status_code == 422
+
+
+# ========== DATA EXPORT TESTS ==========
+def _seed_export_data(headers, user_id):
+    items = [{"mood": 5 + i % 3, "commentary": f"day {i}, \"quoted\"", "date": f"2024-02-{i + 1:02d}T08:00:00"} for i in range(5)]
+    mood_ids = client.post(f"/users/{user_id}/moods/batch", json={"items": items}, headers=headers).json()["ids"]
+    for mood_id in mood_ids[:2]:
+        client.post(f"/users/{user_id}/moods/{mood_id}/journals/", json={"title": "Entry", "content": "line 1\nline 2", "mood_id": mood_id}, headers=headers)
+    payload = {"game_type": "breathing", "score": 10, "duration_seconds": 60, "completed": True, "user_id": user_id}
+    client.post(f"/users/{user_id}/games/", json=payload, headers=headers)
+    return mood_ids
+
+
+def test_export_ndjson(user_token):
+    import json
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    mood_ids = _seed_export_data(headers, user_id)
+    # Another user's data must not leak into the export
+    client.post("/auth/register", json={"name": "Other", "email": "other@example.com", "password": "pw"})
+
+    response = client.get(f"/users/{user_id}/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert "attachment" in response.headers["content-disposition"]
+    records = [json.loads(line) for line in response.text.splitlines()]
+    by_type = {}
+    for record in records:
+        by_type.setdefault(record["type"], []).append(record)
+    assert set(by_type) == {"user", "mood", "journal", "game_session"}
+    assert by_type["user"] == [{"type": "user", "id": user_id, "name": "Test User", "email": "testuser@example.com"}]
+    assert "password" not in response.text
+    assert [m["id"] for m in by_type["mood"]] == mood_ids
+    assert by_type["mood"][0]["date"] == "2024-02-01T08:00:00"
+    assert [j["mood_id"] for j in by_type["journal"]] == mood_ids[:2]
+    assert by_type["journal"][0]["content"] == "line 1\nline 2"
+    assert by_type["game_session"][0]["game_type"] == "breathing"
+
+
+def test_export_csv_gzip(user_token, monkeypatch):
+    import csv, gzip, io
+    from app.services import data_export
+    # Tiny chunks so the export is flushed (and compressed) across many writes
+    monkeypatch.setattr(data_export, "EXPORT_CHUNK_BYTES", 64)
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    mood_ids = _seed_export_data(headers, user_id)
+
+    response = client.get(f"/users/{user_id}/export", params={"format": "csv", "gzip": "true"}, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert response.headers["content-disposition"].endswith('.csv.gz"')
+    rows = list(csv.reader(io.StringIO(gzip.decompress(response.content).decode("utf-8"))))
+    sections, header = {}, None
+    for row in rows:
+        if not row:
+            header = None
+        elif header is None:
+            header = row
+        else:
+            sections.setdefault(row[0], {"header": header, "rows": []})["rows"].append(row)
+    # Tables without rows (no insights yet) are left out
+    assert list(sections) == ["user", "mood", "journal", "game_session"]
+    assert sections["user"]["header"] == ["type", "id", "name", "email"]
+    assert [int(r[1]) for r in sections["mood"]["rows"]] == mood_ids
+    assert sections["mood"]["rows"][0][4] == 'day 0, "quoted"'
+    assert sections["journal"]["rows"][0][5] == "line 1\nline 2"
+
+
+def test_export_requires_owner(user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    assert client.get(f"/users/{user_id + 1}/export", headers=headers).status_code == 403
+    assert client.get(f"/users/{user_id}/export", params={"format": "xml"}, headers=headers).status_code == 422
+
+
+# ========== WRITE ROUND TRIP TESTS ==========
+class _StatementLog:
+    """Records the SQL sent by both the sync and async engines while active."""
+
+    def __init__(self):
+        from app.database import async_engine
+        self.engines = [engine, async_engine.sync_engine]
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        from sqlalchemy import event
+        for target in self.engines:
+            event.listen(target, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        for target in self.engines:
+            event.remove(target, "before_cursor_execute", self._record)
+
+
+def test_writes_skip_refresh_round_trip(user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    mood_id = client.post(f"/users/{user_id}/moods/", json={"mood": 5, "commentary": "warm up", "user_id": user_id}, headers=headers).json()["id"]
+    journal_url = f"/users/{user_id}/moods/{mood_id}/journals/"
+    journal_id = client.post(journal_url, json={"title": "t", "content": "c", "mood_id": mood_id}, headers=headers).json()["id"]
+
+    # (method, url, payload, statements): one write each; register reads first for its duplicate-email
+    # check and the user update for the cache invalidation of the old email, neither refreshes afterwards.
+    # Mood writes also maintain daily_mood_rollup: an upsert for inserts, delete + recompute for updates
+    writes = [
+        ("post", "/auth/register", {"name": "Round Trip", "email": "roundtrip@example.com", "password": "roundtrip"}, 2),
+        ("post", f"/users/{user_id}/moods/", {"mood": 6, "commentary": "new", "user_id": user_id}, 2),
+        ("post", f"/users/{user_id}/moods/batch", {"items": [{"mood": 3, "commentary": "a"}, {"mood": 4, "commentary": "b"}]}, 2),
+        ("put", f"/users/{user_id}/moods/{mood_id}/", {"mood": 9, "commentary": "updated", "user_id": user_id}, 3),
+        ("post", journal_url, {"title": "Second", "content": "More", "mood_id": mood_id}, 1),
+        ("put", f"{journal_url}{journal_id}", {"title": "Edited", "content": "Changed", "mood_id": mood_id}, 1),
+        ("post", f"/users/{user_id}/games/", {"user_id": user_id, "game_type": "breathing", "score": 10, "duration_seconds": 60, "completed": True}, 1),
+        # Last: a password change revokes this token
+        ("put", f"/users/{user_id}", {"name": "Test User", "email": "testuser@example.com", "password": "testpassword123"}, 2),
+    ]
+    mood_url = f"/users/{user_id}/moods/{mood_id}"
+    for method, url, payload, expected in writes:
+        with _StatementLog() as log:
+            response = client.request(method, url, json=payload, headers=headers)
+        assert response.status_code == 200, (url, response.text)
+        assert len(log.statements) == expected, (url, log.statements)
+        assert not log.statements[-1].lstrip().upper().startswith("SELECT"), (url, log.statements)
+        if url == f"{mood_url}/":
+            assert (response.json()["mood"], response.json()["commentary"]) == (9, "updated")
+
+
+def test_update_returns_row_without_returning_support(user_token, monkeypatch):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    mood_id = client.post(f"/users/{user_id}/moods/", json={"mood": 5, "commentary": "before", "user_id": user_id}, headers=headers).json()["id"]
+    from app.database import async_engine
+    monkeypatch.setattr(async_engine.sync_engine.dialect, "update_returning", False)
+    with _StatementLog() as log:
+        response = client.put(f"/users/{user_id}/moods/{mood_id}/", json={"mood": 2, "commentary": "after", "user_id": user_id}, headers=headers)
+    assert response.status_code == 200
+    assert (response.json()["mood"], response.json()["commentary"]) == (2, "after")
+    assert len(log.statements) == 4 and log.statements[0].lstrip().startswith("SELECT")
+
+
+# ========== USER DELETION TESTS ==========
+def _seed_account(user_id, moods):
+    """A heavy account: moods with a journal on every tenth, games, insights and a refresh token."""
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from sqlmodel import Session, select
+    from app import models
+    from app.services import mood_rollup
+
+    start = datetime(2020, 1, 1)
+    with Session(engine) as session:
+        session.exec(insert(models.Mood), params=[
+            {"user_id": user_id, "mood": i % 10, "commentary": "", "date": start + timedelta(minutes=i)}
+            for i in range(moods)
+        ])
+        mood_ids = session.exec(select(models.Mood.id).where(models.Mood.user_id == user_id)).all()
+        session.exec(insert(models.Journal), params=[
+            {"mood_id": mood_id, "title": "Entry", "content": "Seeded", "date": start} for mood_id in mood_ids[::10]
+        ])
+        session.exec(insert(models.GameSession), params=[
+            {"user_id": user_id, "game_type": "breathing", "completed": True, "date": start} for _ in range(moods // 100)
+        ])
+        session.add(models.AIInsights(user_id=user_id, insights_json="{}", analysis_period_start=start, analysis_period_end=start))
+        for statement in mood_rollup.rebuild_statements(user_id):
+            session.exec(statement)
+        session.commit()
+
+
+def _owned_row_counts(user_id):
+    from sqlalchemy import func
+    from sqlmodel import Session, select
+    from app import crud, models
+
+    with Session(engine) as session:
+        counts = {
+            model.__name__: session.exec(select(func.count()).select_from(model).where(crud._owned_by(model, user_id))).one()
+            for model in crud.USER_OWNED_MODELS
+        }
+        counts["User"] = session.exec(select(func.count()).select_from(models.User).where(models.User.id == user_id)).one()
+    return counts
+
+
+def _second_user():
+    client.post("/auth/register", json={"name": "Other", "email": "other@example.com", "password": "otherpass"})
+    token = client.post("/auth/login", data={"username": "other@example.com", "password": "otherpass"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    return client.get("/users/", headers=headers).json()[1]["id"], headers
+
+
+def test_delete_user_with_100k_moods_is_set_based(user_token):
+    import time
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    other_id, other_headers = _second_user()
+    _seed_account(user_id, 100_000)
+    _seed_account(other_id, 100)
+    assert _owned_row_counts(user_id)["Mood"] == 100_000
+
+    with _StatementLog() as log:
+        start = time.perf_counter()
+        response = client.delete(f"/users/{user_id}", headers=headers)
+        elapsed = time.perf_counter() - start
+    assert response.status_code == 200
+    assert response.json()["id"] == user_id
+    # One DELETE per table plus the user lookup, however large the history
+    assert len(log.statements) <= 8, log.statements
+    assert elapsed < 20, elapsed
+    assert set(_owned_row_counts(user_id).values()) == {0}
+    assert _owned_row_counts(other_id)["Journal"] == 10
+    assert client.get("/users/", headers=headers).status_code == 401
+    assert client.get(f"/users/{other_id}/moods/", headers=other_headers).status_code == 200
+
+
+def test_delete_user_background_purge(user_token, monkeypatch):
+    from app.services import user_purge
+    monkeypatch.setattr(user_purge, "USER_PURGE_BATCH_SIZE", 700)
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    other_id, _ = _second_user()
+    _seed_account(user_id, 5000)
+    _seed_account(other_id, 100)
+
+    # TestClient runs background tasks before returning the response
+    response = client.delete(f"/users/{user_id}?background=true", headers=headers)
+    assert response.status_code == 202
+    assert response.json()["id"] == user_id
+    assert set(_owned_row_counts(user_id).values()) == {0}
+    assert _owned_row_counts(other_id)["Mood"] == 100
+
+
+def test_deactivated_user_is_locked_out(user_token):
+    from sqlmodel import Session
+    from app import auth, crud
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    with Session(engine) as session:
+        crud.deactivate_user(session, user_id)
+
+    assert client.get("/users/", headers=headers).status_code == 401
+    login = client.post("/auth/login", data={"username": "testuser@example.com", "password": "testpassword123"})
+    assert login.status_code == 401
+    # Tokens stay revoked once the cached version is gone
+    auth.token_versions.invalidate(user_id)
+    assert client.get("/users/", headers=headers).status_code == 401
+
+
+# ========== ETAG TESTS ==========
+def test_moods_list_etag(user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    url = f"/users/{user_id}/moods/"
+    mood_id = client.post(url, json={"mood": 5, "commentary": "first", "user_id": user_id}, headers=headers).json()["id"]
+
+    first = client.get(url, headers=headers)
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    # Unchanged: 304 after only the change token query, no rows loaded
+    with _StatementLog() as log:
+        response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag and response.content == b""
+    assert len(log.statements) == 1 and "count(" in log.statements[0]
+    assert client.get(url, headers={**headers, "If-None-Match": f'"other", W/{etag}'}).status_code == 304
+
+    # Other query strings are other representations
+    assert client.get(f"{url}?limit=1", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+    # Creates, updates and deletes all change the ETag
+    seen = {etag}
+    for method, target, payload in [
+        ("post", url, {"mood": 6, "commentary": "second", "user_id": user_id}),
+        ("put", f"{url}{mood_id}/", {"mood": 9, "commentary": "edited", "user_id": user_id}),
+        ("delete", f"{url}{mood_id}", None),
+    ]:
+        assert client.request(method, target, json=payload, headers=headers).status_code == 200
+        response = client.get(url, headers={**headers, "If-None-Match": ", ".join(seen)})
+        assert response.status_code == 200
+        assert response.headers["ETag"] not in seen
+        seen.add(response.headers["ETag"])
+
+
+def test_journals_list_etag(user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    mood_id = client.post(f"/users/{user_id}/moods/", json={"mood": 5, "commentary": "", "user_id": user_id}, headers=headers).json()["id"]
+    url = f"/users/{user_id}/moods/{mood_id}/journals/"
+    journal_id = client.post(url, json={"title": "t", "content": "c", "mood_id": mood_id}, headers=headers).json()["id"]
+
+    etag = client.get(url, headers=headers).headers["ETag"]
+    assert client.get(url, headers={**headers, "If-None-Match": etag}).status_code == 304
+    client.put(f"{url}{journal_id}", json={"title": "t2", "content": "c", "mood_id": mood_id}, headers=headers)
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["title"] == "t2"
+
+
+def test_insights_etag_skips_payload(user_token, monkeypatch):
+    import json as _json
+    from types import SimpleNamespace
+    from datetime import datetime, timedelta
+    from sqlmodel import Session
+    from app import models
+    from app.routes import insights as insights_route
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    with Session(engine) as session:
+        now = datetime.utcnow()
+        session.add(models.AIInsights(
+            user_id=user_id, insights_json=_json.dumps({"summary": "steady"}), status="completed",
+            generated_at=now, analysis_period_start=now - timedelta(days=30), analysis_period_end=now,
+        ))
+        session.commit()
+    url = f"/users/{user_id}/insights/"
+
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200 and first.json()["insights"] == {"summary": "steady"}
+    etag = first.headers["ETag"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("insights_json parsed for a 304")
+
+    monkeypatch.setattr(insights_route, "json", SimpleNamespace(loads=fail, JSONDecodeError=ValueError))
+    with _StatementLog() as log:
+        response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304 and response.headers["ETag"] == etag
+    assert not any("insights_json" in statement for statement in log.statements)
+    monkeypatch.undo()
+
+    # A stale ETag still gets the full body
+    response = client.get(url, headers={**headers, "If-None-Match": '"stale"'})
+    assert response.status_code == 200 and response.json()["insights"] == {"summary": "steady"}
+
+
+def test_moods_change_token_reads_only_an_index(setup_and_teardown_db):
+    from sqlalchemy import func
+    from sqlmodel import select
+    from app import models
+
+    plan = _query_plan(select(func.count(), func.max(models.Mood.id), func.max(models.Mood.updated_at)).where(models.Mood.user_id == 1))
+    assert "COVERING INDEX ix_mood_user_id_updated_at" in plan, plan
+
+
+# ========== FAST JSON TESTS ==========
+def test_fast_json_lists_match_default_path(user_token, monkeypatch):
+    from app import fast_json
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    client.post(f"/users/{user_id}/moods/batch", json={"items": [
+        {"mood": i % 10, "commentary": f"Mood {i}", "date": f"2024-01-{i + 1:02d}T08:30:00.123456"} for i in range(5)
+    ]}, headers=headers)
+    mood_id = client.get(f"/users/{user_id}/moods/", headers=headers).json()[0]["id"]
+    client.post(f"/users/{user_id}/moods/{mood_id}/journals/", json={"title": "T", "content": "Ü ☃", "mood_id": mood_id}, headers=headers)
+    client.post(f"/users/{user_id}/games/", json={"user_id": user_id, "game_type": "breathing", "completed": True}, headers=headers)
+
+    urls = [
+        f"/users/{user_id}/moods/?limit=2",
+        f"/users/{user_id}/moods/?min_mood=2&direction=asc",
+        f"/users/{user_id}/moods/{mood_id}/journals/",
+        f"/users/{user_id}/games/",
+        "/resources/?mood=stressed",
+    ]
+    default = {url: client.get(url, headers=headers) for url in urls}
+    monkeypatch.setattr(fast_json, "FAST_JSON_LISTS", True)
+    for url in urls:
+        fast = client.get(url, headers=headers)
+        assert fast.status_code == 200
+        assert fast.json() == default[url].json(), url
+        assert fast.headers["content-type"] == "application/json"
+        for header in ("X-Next-Cursor", "ETag"):
+            assert fast.headers.get(header) == default[url].headers.get(header), (url, header)
+    assert len(client.get(urls[0], headers=headers).json()) == 2
+
+
+# ========== JOURNAL OWNERSHIP TESTS ==========
+def _foreign_journal():
+    """A mood and journal owned by a second user; returns (mood id, journal id)."""
+    other_id, other_headers = _second_user()
+    mood_id = client.post(f"/users/{other_id}/moods/", json={"mood": 4, "commentary": "theirs", "user_id": other_id}, headers=other_headers).json()["id"]
+    journal_id = client.post(f"/users/{other_id}/moods/{mood_id}/journals/", json={"title": "Private", "content": "Theirs", "mood_id": mood_id}, headers=other_headers).json()["id"]
+    return mood_id, journal_id
+
+
+def test_journal_routes_check_mood_ownership_in_one_query(user_token):
+    from sqlalchemy import func
+    from sqlmodel import Session, select
+    from app import models
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    mood_id, journal_id = _foreign_journal()
+    url = f"/users/{user_id}/moods/{mood_id}/journals/"
+    payload = {"title": "Hijacked", "content": "x", "mood_id": mood_id}
+
+    for method, target, body, status in [
+        ("get", url, None, 200),
+        ("get", f"{url}{journal_id}", None, 404),
+        ("put", f"{url}{journal_id}", payload, 404),
+        ("delete", f"{url}{journal_id}", None, 404),
+        ("post", url, payload, 404),
+    ]:
+        with _StatementLog() as log:
+            response = client.request(method, target, json=body, headers=headers)
+        assert response.status_code == status, (method, target, response.text)
+        # The list runs its change token query too; everything else is a single statement
+        assert len(log.statements) == (2 if method == "get" and target == url else 1), log.statements
+    assert client.get(url, headers=headers).json() == []
+
+    with Session(engine) as session:
+        journal = session.get(models.Journal, journal_id)
+        assert (journal.title, journal.content) == ("Private", "Theirs")
+        assert session.exec(select(func.count()).select_from(models.Journal)).one() == 1
+
+
+def test_journal_writes_on_own_mood(user_token, monkeypatch):
+    from app.database import async_engine
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    mood_id = client.post(f"/users/{user_id}/moods/", json={"mood": 5, "commentary": "", "user_id": user_id}, headers=headers).json()["id"]
+    url = f"/users/{user_id}/moods/{mood_id}/journals/"
+
+    created = client.post(url, json={"title": "Mine", "content": "Text", "mood_id": mood_id}, headers=headers)
+    assert created.status_code == 200
+    assert created.json()["mood_id"] == mood_id and created.json()["title"] == "Mine"
+    journal_id = created.json()["id"]
+    assert client.get(f"{url}{journal_id}", headers=headers).json()["title"] == "Mine"
+    assert client.delete(f"{url}{journal_id}", headers=headers).json()["id"] == journal_id
+    assert client.get(f"{url}{journal_id}", headers=headers).status_code == 404
+
+    # Backends without RETURNING check the mood first, then insert/delete through the ORM
+    dialect = async_engine.sync_engine.dialect
+    monkeypatch.setattr(dialect, "insert_returning", False)
+    monkeypatch.setattr(dialect, "delete_returning", False)
+    created = client.post(url, json={"title": "Fallback", "content": "Text", "mood_id": mood_id}, headers=headers)
+    assert created.status_code == 200 and created.json()["title"] == "Fallback"
+    assert client.delete(f"{url}{created.json()['id']}", headers=headers).status_code == 200
+    assert client.post(f"/users/{user_id}/moods/999999/journals/", json={"title": "x", "content": "x", "mood_id": 999999}, headers=headers).status_code == 404
+
+
+def test_moods_include_journals(user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    mood_ids = []
+    for i in range(6):
+        mood_id = client.post(f"/users/{user_id}/moods/", json={"mood": i, "commentary": "", "user_id": user_id}, headers=headers).json()["id"]
+        mood_ids.append(mood_id)
+        for j in range(i % 3):
+            client.post(f"/users/{user_id}/moods/{mood_id}/journals/", json={"title": f"{i}-{j}", "content": "", "mood_id": mood_id}, headers=headers)
+    url = f"/users/{user_id}/moods/?include=journals&limit=4"
+
+    with _StatementLog() as log:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    # Two change tokens, the page and one selectinload query, whatever the page size
+    assert len(log.statements) == 4, log.statements
+    body = response.json()
+    assert [mood["id"] for mood in body] == mood_ids[::-1][:4]
+    for mood in body:
+        i = mood["mood"]
+        assert sorted(journal["title"] for journal in mood["journals"]) == [f"{i}-{j}" for j in range(i % 3)]
+    assert "X-Next-Cursor" in response.headers
+    assert "journals" not in client.get(f"/users/{user_id}/moods/", headers=headers).json()[0]
+
+    # Editing an embedded journal changes the ETag
+    etag = response.headers["ETag"]
+    assert client.get(url, headers={**headers, "If-None-Match": etag}).status_code == 304
+    journal = body[0]["journals"][0] if body[0]["journals"] else body[1]["journals"][0]
+    client.put(f"/users/{user_id}/moods/{journal['mood_id']}/journals/{journal['id']}", json={"title": "edited", "content": "", "mood_id": journal["mood_id"]}, headers=headers)
+    assert client.get(url, headers={**headers, "If-None-Match": etag}).status_code == 200
+    assert client.get(f"/users/{user_id}/moods/?include=everything", headers=headers).status_code == 422
+
+
+# ========== AI DATA AGGREGATION TESTS ==========
+def _seed_recent_history(user_id, days=3 * 365, per_day=8):
+    """Years of moods ending now, each with a journal, plus another user's recent moods (rollup rebuilt)."""
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from sqlmodel import Session, select
+    from app import models
+    from app.services import mood_rollup
+
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        other = models.User(name="Noise", email="noise@example.com", password="x")
+        session.add(other)
+        session.commit()
+        rows = [
+            {"user_id": owner, "mood": (day * 3 + i) % 10 + 1, "commentary": "",
+             "date": now - timedelta(days=day, hours=i * 3, minutes=1)}
+            for owner in (user_id, other.id)
+            for day in range(days if owner == user_id else 90)
+            for i in range(per_day)
+        ]
+        session.exec(insert(models.Mood), params=rows)
+        mood_ids = session.exec(select(models.Mood.id, models.Mood.date)).all()
+        session.exec(insert(models.Journal), params=[
+            {"mood_id": mood_id, "title": "Day", "content": "work meeting then a walk with a friend", "date": date}
+            for mood_id, date in mood_ids
+        ])
+        for statement in mood_rollup.rebuild_statements():
+            session.exec(statement)
+        session.commit()
+    return len(rows)
+
+
+def test_prepare_data_for_ai_reads_each_period_once(user_token):
+    import time
+    from datetime import datetime, time as day_start, timedelta
+    from sqlmodel import Session
+    from app.services import data_aggregator
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    _seed_recent_history(user_id)
+
+    with Session(engine) as session:
+        with _StatementLog() as log:
+            start = time.perf_counter()
+            summary = data_aggregator.prepare_data_for_ai(session, user_id, 30)
+            elapsed = time.perf_counter() - start
+    # Current moods, current journals, the rollup, and the moods of the day holding the trend midpoint
+    assert len(log.statements) <= 4, log.statements
+    assert "journal" in log.statements[1] and "mood.date >=" in log.statements[1]
+    assert "daily_mood_rollup" in log.statements[2]
+    assert elapsed < 5, elapsed
+
+    # Same split as reading each period separately
+    with Session(engine) as session:
+        now = datetime.utcnow()
+        moods, journals, previous = data_aggregator.fetch_analysis_periods(session, user_id, 30, now=now)
+        reference, reference_journals = data_aggregator.fetch_user_data_efficiently(session, user_id, 30)
+        both, _ = data_aggregator.fetch_user_data_efficiently(session, user_id, 60)
+    assert [m.id for m in moods] == [m.id for m in reference]
+    assert sorted(j.id for j in journals) == sorted(j.id for j in reference_journals)
+    assert [m.id for m in previous] == [m.id for m in both if m.date < now - timedelta(days=30)]
+    assert all(m.user_id == user_id for m in moods + previous)
+    assert len(moods) == len(journals) == 30 * 8
+
+    # The summary covers whole days, today included
+    end = datetime.combine(now.date() + timedelta(days=1), day_start.min)
+    with Session(engine) as session:
+        day_moods, day_journals, day_previous = data_aggregator.fetch_analysis_periods(session, user_id, 30, now=end)
+    assert summary["journal_statistics"]["total_entries"] == len(day_journals)
+    assert summary["mood_statistics"]["total_entries"] == len(day_moods)
+    _assert_same_statistics(summary["mood_statistics"], data_aggregator.calculate_mood_statistics(day_moods, day_previous))
+
+
+# ========== MOOD STATISTICS TESTS ==========
+def _mood_datasets():
+    """(name, current moods, previous moods) as (hours from period start, mood) pairs."""
+    import random
+    rng = random.Random(22)
+    return [
+        ("empty", [], []),
+        ("empty_with_previous", [], [(5, 4), (30, 6)]),
+        ("single", [(1, 7)], []),
+        ("three", [(1, 2), (2, 9), (50, 5)], [(3, 3)]),
+        ("four_improving", [(1, 1), (25, 2), (49, 8), (73, 9)], []),
+        ("five_declining", [(1, 9), (2, 9), (26, 8), (50, 2), (74, 1)], [(10, 5), (11, 6)]),
+        ("stable_ties", [(24, 5), (24, 6), (24, 5), (48, 6), (48, 5), (48, 6)], [(1, 1)]),
+        ("every_weekday", [(h * 7, (h * 3) % 10 + 1) for h in range(60)], [(h * 5, h % 10 + 1) for h in range(40)]),
+        ("random", [(rng.randrange(0, 30 * 24), rng.randint(1, 10)) for _ in range(301)],
+         [(rng.randrange(0, 30 * 24), rng.randint(1, 10)) for _ in range(150)]),
+    ]
+
+
+def _assert_same_statistics(actual, expected):
+    import pytest
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if key == "day_patterns":
+            assert list(actual[key]) == list(value)
+            assert actual[key] == pytest.approx(value)
+        elif isinstance(value, float):
+            assert actual[key] == pytest.approx(value, abs=0.011), key
+        else:
+            assert actual[key] == value, key
+
+
+# ========== MOOD ROLLUP TESTS ==========
+def _rollup_rows(user_id):
+    from sqlmodel import Session, select
+    from app import models
+    with Session(engine) as session:
+        rollup = models.DailyMoodRollup
+        return {
+            row.day.isoformat(): (row.mood_count, row.mood_sum, row.mood_min, row.mood_max, row.mood_sum_squares)
+            for row in session.exec(select(rollup).where(rollup.user_id == user_id))
+        }
+
+
+def test_mood_writes_maintain_rollup(user_token):
+    import json
+    from datetime import datetime
+    from sqlmodel import Session
+    from app.services import mood_rollup
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    other_id, other_headers = _second_user()
+    today = datetime.utcnow().date().isoformat()
+
+    url = f"/users/{user_id}/moods/"
+    first = client.post(url, json={"mood": 4, "commentary": "a", "user_id": user_id}, headers=headers).json()
+    client.post(url, json={"mood": 6, "commentary": "b", "user_id": user_id}, headers=headers)
+    client.post(f"{url}batch", headers=headers, json={"items": [
+        {"mood": 2, "commentary": "c", "date": "2024-02-10T23:30:00Z"},
+        {"mood": 9, "commentary": "d", "date": "2024-02-10T08:00:00+02:00"},
+        {"mood": 5, "commentary": "e", "date": "2024-02-11T00:15:00Z"},
+    ]})
+    client.post(f"/users/{other_id}/moods/", json={"mood": 1, "commentary": "x", "user_id": other_id}, headers=other_headers)
+    assert _rollup_rows(user_id) == {
+        today: (2, 10, 4, 6, 52),
+        "2024-02-10": (2, 11, 2, 9, 85),
+        "2024-02-11": (1, 5, 5, 5, 25),
+    }
+
+    # Updates and deletes recompute the day, including its min and max
+    client.put(f"{url}{first['id']}/", json={"mood": 10, "commentary": "a", "user_id": user_id}, headers=headers)
+    assert _rollup_rows(user_id)[today] == (2, 16, 6, 10, 136)
+    moods = {m["commentary"]: m["id"] for m in client.get(url, headers=headers).json()}
+    assert client.delete(f"{url}{moods['b']}", headers=headers).status_code == 200
+    assert client.delete(f"{url}{moods['e']}", headers=headers).status_code == 200
+    assert _rollup_rows(user_id) == {today: (1, 10, 10, 10, 100), "2024-02-10": (2, 11, 2, 9, 85)}
+
+    # Imports go through the same insert path
+    import_headers = dict(headers, **{"Content-Type": "application/x-ndjson"})
+    line = json.dumps({"mood": 3, "title": "t", "content": "c", "date": "2024-02-10T12:00:00Z"})
+    assert client.post(f"/users/{user_id}/journals/import", content=line + "\n", headers=import_headers).status_code == 200
+    assert _rollup_rows(user_id)["2024-02-10"] == (3, 14, 2, 9, 94)
+
+    with Session(engine) as session:
+        assert mood_rollup.check(session) == []
+
+
+def test_rollup_fallback_without_upsert(user_token, monkeypatch):
+    import json
+    from sqlmodel import Session
+    from app.services import mood_rollup
+    # Backends without ON CONFLICT recompute each touched day from the moods just inserted
+    monkeypatch.setattr(mood_rollup, "_UPSERT_INSERTS", {})
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+
+    url = f"/users/{user_id}/moods/"
+    client.post(url, json={"mood": 4, "commentary": "a", "user_id": user_id}, headers=headers)
+    client.post(url, json={"mood": 8, "commentary": "b", "user_id": user_id}, headers=headers)
+    client.post(f"{url}batch", headers=headers, json={"items": [
+        {"mood": 5, "commentary": "c", "date": "2024-02-10T09:00:00Z"},
+        {"mood": 7, "commentary": "d", "date": "2024-02-10T18:00:00Z"},
+    ]})
+    import_headers = dict(headers, **{"Content-Type": "application/x-ndjson"})
+    line = json.dumps({"mood": 3, "title": "t", "content": "c", "date": "2024-02-11T12:00:00Z"})
+    assert client.post(f"/users/{user_id}/journals/import", content=line + "\n", headers=import_headers).status_code == 200
+
+    rows = _rollup_rows(user_id)
+    assert rows["2024-02-10"] == (2, 12, 5, 7, 74)
+    assert rows["2024-02-11"] == (1, 3, 3, 3, 9)
+    with Session(engine) as session:
+        assert mood_rollup.check(session) == []
+
+
+def test_rollup_check_and_rebuild(user_token):
+    from datetime import date as datetime_date
+    from sqlalchemy import update
+    from sqlmodel import Session
+    from app import models
+    from app.services import mood_rollup
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    _seed_account(user_id, 3000)
+    other_id, _ = _second_user()
+    _seed_account(other_id, 100)
+
+    with Session(engine) as session:
+        assert mood_rollup.check(session) == []
+        rollup = models.DailyMoodRollup
+        session.exec(update(rollup).where(rollup.user_id == user_id, rollup.day == datetime_date(2020, 1, 2)).values(mood_sum=0))
+        session.exec(update(rollup).where(rollup.user_id == other_id).values(mood_max=99))
+        session.commit()
+
+        problems = mood_rollup.check(session, user_id)
+        assert len(problems) == 1 and "2020-01-02" in problems[0]
+        assert len(mood_rollup.check(session)) == 2
+
+        for statement in mood_rollup.rebuild_statements(user_id):
+            session.exec(statement)
+        session.commit()
+        assert mood_rollup.check(session, user_id) == []
+        assert len(mood_rollup.check(session)) == 1
+
+        for statement in mood_rollup.rebuild_statements():
+            session.exec(statement)
+        session.commit()
+        assert mood_rollup.check(session) == []
+    # 3000 moods a minute apart
+    assert len(_rollup_rows(user_id)) == 3
+
+
+def test_rollup_statistics_match_python(user_token):
+    from datetime import datetime, timedelta
+    from sqlalchemy import delete, insert
+    from sqlmodel import Session, select
+    from app import models
+    from app.services import data_aggregator, mood_rollup
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+
+    since = datetime(2024, 3, 1)
+    previous_since = since - timedelta(days=30)
+    for name, current, previous in _mood_datasets():
+        with Session(engine) as session:
+            session.exec(delete(models.Mood))
+            session.exec(insert(models.Mood), params=[
+                {"user_id": user_id, "mood": mood, "commentary": "", "date": start + timedelta(hours=hours)}
+                for start, entries in ((since, current), (previous_since, previous))
+                for hours, mood in entries
+            ] + [{"user_id": user_id, "mood": 10, "commentary": "", "date": previous_since - timedelta(hours=1)}])
+            for statement in mood_rollup.rebuild_statements():
+                session.exec(statement)
+            session.commit()
+
+            def period(start, end=None):
+                statement = select(models.Mood).where(models.Mood.user_id == user_id, models.Mood.date >= start)
+                if end is not None:
+                    statement = statement.where(models.Mood.date < end)
+                return list(session.exec(statement.order_by(models.Mood.date, models.Mood.id)).all())
+
+            _assert_same_statistics(
+                data_aggregator.calculate_mood_statistics_from_rollup(
+                    session, user_id, since=since.date(), previous_since=previous_since.date()
+                ),
+                data_aggregator.calculate_mood_statistics(period(since), period(previous_since, since)),
+            )
+            until = since + timedelta(days=2)
+            _assert_same_statistics(
+                data_aggregator.calculate_mood_statistics_from_rollup(
+                    session, user_id, since=since.date(), until=until.date()
+                ),
+                data_aggregator.calculate_mood_statistics(period(since, until)),
+            )
+
+
+
+# ========== JOURNAL THEME TESTS ==========
+def test_extract_journal_themes_matches_whole_words():
+    from types import SimpleNamespace
+    from app.services.data_aggregator import extract_journal_themes
+    journals = [
+        SimpleNamespace(title="Sidewalk art", content="Started the day with a WORKOUT, then walking; work."),
+        SimpleNamespace(title="Friends", content="Dinner at a restaurant with my friend (and her brother’s family)."),
+        SimpleNamespace(title="Nothing", content="Smart apartment, heartbeat, rerun."),
+    ]
+    # Entries mentioning each theme, however often
+    assert extract_journal_themes(journals) == {
+        "work": 1,
+        "exercise": 1,
+        "family": 1,
+        "friends": 1,
+        "hobby": 1,
+        "food": 1,
+    }
+    assert extract_journal_themes([]) == {}
+
+
+def test_theme_words_are_whole_keywords_and_inflections():
+    from app.services.data_aggregator import THEME_KEYWORDS, WORD_THEMES
+    for theme, keywords in THEME_KEYWORDS.items():
+        assert all(WORD_THEMES[keyword] == theme for keyword in keywords)
+    inflected = {
+        "workout": "exercise", "workouts": "exercise", "walks": "exercise", "walking": "exercise", "running": "exercise",
+        "exercising": "exercise", "meetings": "work", "stressed": "stress", "stresses": "stress", "parties": "friends",
+        "hobbies": "hobby", "families": "family", "tripped": "travel", "travelling": "travel", "restaurants": "food",
+    }
+    assert {word: WORD_THEMES.get(word) for word in inflected} == inflected
+    # Words that only start with a keyword
+    for word in ("sidewalk", "workshop", "restless", "moment", "moments", "painting", "article", "artificial",
+                 "interesting", "restore", "triple", "runway", "started", "apartment"):
+        assert word not in WORD_THEMES, word
+
+
+def test_correlations_use_theme_keywords_and_shared_masks(monkeypatch):
+    from datetime import datetime
+    from types import SimpleNamespace
+    from app.services import data_aggregator
+    moods = [SimpleNamespace(id=i, mood=mood, date=datetime(2024, 5, 6)) for i, mood in enumerate([2, 3, 4, 8, 9, 6])]
+    journals = [
+        # Keywords, not theme names: no entry says "work" or "exercise"
+        SimpleNamespace(mood_id=0, title="Deadline", content="Long meeting."),
+        SimpleNamespace(mood_id=0, title="Again", content="Another meeting, then a walk."),
+        SimpleNamespace(mood_id=1, title="Office", content="Colleague drama."),
+        SimpleNamespace(mood_id=3, title="Gym", content="Running with a friend."),
+        SimpleNamespace(mood_id=4, title="Sidewalk chat", content="Workout!"),
+        SimpleNamespace(mood_id=5, title="Meeting", content="Fine."),
+        SimpleNamespace(mood_id=99, title="Meeting", content="Another user's mood."),
+    ]
+    masks = data_aggregator.journal_theme_masks(journals)
+    assert masks[0] == data_aggregator.THEME_BITS["work"]
+    assert masks[1] == data_aggregator.THEME_BITS["work"] | data_aggregator.THEME_BITS["exercise"]
+
+    scans = []
+    monkeypatch.setattr(data_aggregator, "journal_words", lambda journal: scans.append(journal) or [])
+    themes = data_aggregator.extract_journal_themes(journals, masks)
+    assert themes == {"work": 5, "exercise": 3, "friends": 1}
+    correlations = data_aggregator.identify_correlations(moods, journals, themes, masks)
+    assert scans == []
+    observed = {(c["type"], c["description"].rsplit("'", 2)[1]): c["frequency"] for c in correlations if "frequency" in c}
+    # Moods 0 and 1 are low with work; 3 and 4 are high with exercise; mood 0's two journals count once
+    assert observed == {("negative_correlation", "work"): 2, ("positive_correlation", "exercise"): 2}
+